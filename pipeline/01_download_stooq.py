@@ -1,5 +1,5 @@
 """
-Step 1: Download ticker lists from NASDAQ and fetch historical data via yfinance.
+Step 1: Download ticker lists from NASDAQ.
 
 Sources:
 - NASDAQ-listed symbols: ftp.nasdaqtrader.com/symboldirectory/nasdaqlisted.txt
@@ -7,101 +7,60 @@ Sources:
 - Historical OHLCV data: yfinance
 
 The script:
-1. Downloads ticker lists from NASDAQ's public FTP
+1. Downloads ticker lists from NASDAQ's public FTP (via the data provider,
+   see providers.py), at most once per REFRESH_AFTER_HOURS unless --refresh
 2. Parses into a unified ticker list with exchange info
-3. Saves to pipeline/raw/tickers.csv
+3. Diffs it against the previous listing snapshot (raw/universe.csv) and
+   writes raw/universe_diff.json with added/removed/changed/renamed symbols
+   for steps 02, 04 and 05 (see universe.py)
+4. Saves to pipeline/raw/tickers.csv: the current listing plus symbols that
+   left it but still have a data file, so delisted tickers keep their names
+
+Usage:
+  python 01_download_stooq.py              # refresh if the snapshot is stale
+  python 01_download_stooq.py --refresh    # always download the listing
 """
 
 import os
-import csv
-import urllib.request
+import sys
+import time
 
-RAW_DIR = os.path.join(os.path.dirname(__file__), "raw")
-TICKERS_CSV = os.path.join(RAW_DIR, "tickers.csv")
+import instrument
+import paths
+import universe
+from providers import get_provider
+from writer import OutputWriter
 
-NASDAQ_URL = "https://www.nasdaqtrader.com/dynamic/SymDir/nasdaqlisted.txt"
-OTHER_URL = "https://www.nasdaqtrader.com/dynamic/SymDir/otherlisted.txt"
+RAW_DIR = paths.RAW_DIR
+TICKERS_CSV = paths.TICKERS_CSV
+DELISTED_CSV = os.path.join(os.path.dirname(__file__), "delisted_tickers.csv")
 
+# The listing is downloaded again once the snapshot is this old
+REFRESH_AFTER_HOURS = 20
+# A listing this much smaller than the last one is treated as a partial download
+MIN_UNIVERSE_RATIO = 0.9
 
-def download_ticker_list():
+
+def previous_snapshot() -> dict[str, dict]:
+    """The last listing; before the first snapshot, tickers.csv minus the curated delisted symbols."""
+    if os.path.exists(universe.UNIVERSE_CSV):
+        return universe.read_rows(universe.UNIVERSE_CSV)
+    curated = set(universe.read_rows(DELISTED_CSV))
+    return {s: row for s, row in universe.read_rows(TICKERS_CSV).items() if s not in curated}
+
+
+def download_ticker_list(provider=None, refresh: bool = False):
     os.makedirs(RAW_DIR, exist_ok=True)
 
-    if os.path.exists(TICKERS_CSV):
-        # Count lines
-        with open(TICKERS_CSV) as f:
-            count = sum(1 for _ in f) - 1  # minus header
-        if count > 1000:
-            print(f"[01] Ticker list already exists ({count} tickers), skipping download.")
+    if not refresh and os.path.exists(TICKERS_CSV) and os.path.exists(universe.UNIVERSE_CSV):
+        age_hours = (time.time() - os.path.getmtime(universe.UNIVERSE_CSV)) / 3600
+        if age_hours < REFRESH_AFTER_HOURS:
+            count = len(universe.read_rows(TICKERS_CSV))
+            print(f"[01] Ticker list is {age_hours:.1f}h old ({count} tickers), skipping download.")
             return True
 
-    tickers = []
-
-    # Download NASDAQ-listed
-    print("[01] Downloading NASDAQ-listed symbols...")
-    try:
-        req = urllib.request.Request(NASDAQ_URL, headers={"User-Agent": "Mozilla/5.0"})
-        with urllib.request.urlopen(req, timeout=30) as resp:
-            lines = resp.read().decode("utf-8").strip().split("\n")
-
-        # Format: Symbol|Security Name|Market Category|Test Issue|Financial Status|Round Lot Size|ETF|NextShares
-        # Skip header and footer (last line is timestamp)
-        for line in lines[1:]:
-            if line.startswith("File Creation Time"):
-                break
-            fields = line.split("|")
-            if len(fields) >= 7 and fields[3] == "N":  # Not a test issue
-                symbol = fields[0].strip()
-                name = fields[1].strip()
-                is_etf = fields[6].strip() == "Y"
-                tickers.append({
-                    "symbol": symbol,
-                    "name": name,
-                    "exchange": "NASDAQ",
-                    "type": "ETF" if is_etf else "Stock",
-                })
-        print(f"[01] Found {len(tickers)} NASDAQ symbols")
-    except Exception as e:
-        print(f"[01] Error downloading NASDAQ list: {e}")
-
-    # Download other-listed (NYSE, NYSEMKT/AMEX, etc.)
-    print("[01] Downloading other exchange-listed symbols...")
-    other_count = 0
-    try:
-        req = urllib.request.Request(OTHER_URL, headers={"User-Agent": "Mozilla/5.0"})
-        with urllib.request.urlopen(req, timeout=30) as resp:
-            lines = resp.read().decode("utf-8").strip().split("\n")
-
-        # Format: ACT Symbol|Security Name|Exchange|CQS Symbol|ETF|Round Lot Size|Test Issue|NASDAQ Symbol
-        for line in lines[1:]:
-            if line.startswith("File Creation Time"):
-                break
-            fields = line.split("|")
-            if len(fields) >= 7 and fields[6].strip() == "N":  # Not a test issue
-                symbol = fields[0].strip()
-                name = fields[1].strip()
-                exchange_code = fields[2].strip()
-                is_etf = fields[4].strip() == "Y"
-
-                # Map exchange codes
-                exchange_map = {
-                    "N": "NYSE",
-                    "A": "NYSEMKT",
-                    "P": "NYSEARCA",
-                    "Z": "BATS",
-                    "V": "IEXG",
-                }
-                exchange = exchange_map.get(exchange_code, exchange_code)
-
-                tickers.append({
-                    "symbol": symbol,
-                    "name": name,
-                    "exchange": exchange,
-                    "type": "ETF" if is_etf else "Stock",
-                })
-                other_count += 1
-        print(f"[01] Found {other_count} other-exchange symbols")
-    except Exception as e:
-        print(f"[01] Error downloading other listings: {e}")
+    provider = provider or get_provider()
+    tickers = provider.fetch_symbol_lists()
 
     if not tickers:
         print("[01] ERROR: No tickers downloaded.")
@@ -113,15 +72,42 @@ def download_ticker_list():
     if removed:
         print(f"[01] Filtered out {removed} tickers with special characters")
 
+    current = {t["symbol"]: {field: t.get(field, "") for field in universe.FIELDS} for t in clean_tickers}
+    previous = previous_snapshot()
+    if previous and len(current) < MIN_UNIVERSE_RATIO * len(previous):
+        print(f"[01] WARNING: listing shrank from {len(previous)} to {len(current)} symbols; "
+              "looks like a partial download, keeping the previous list.")
+        return True
+
+    diff = universe.diff_universe(previous, current)
+    writer = OutputWriter()
+    if diff["added"] or diff["removed"] or diff["changed"] or diff["renamed"]:
+        if os.path.exists(universe.UNIVERSE_CSV):
+            os.replace(universe.UNIVERSE_CSV, universe.PREVIOUS_CSV)
+        saved = universe.save_diff(diff, time.strftime("%Y%m%dT%H%M%S"), previous, current)
+        print(f"[01] Universe diff: {universe.describe(diff)}")
+        if saved.get("merged"):
+            print(f"[01] Folded into unconsumed diff {saved['merged'][-1]}: {universe.describe(saved)}")
+    else:
+        print("[01] Universe unchanged")
+    universe.write_rows(universe.UNIVERSE_CSV, list(current.values()), writer)
+    # Marks the snapshot as fresh even when its content did not change
+    os.utime(universe.UNIVERSE_CSV)
+
+    # Symbols that left the listing keep their row while they have data
+    carried = [
+        row for symbol, row in universe.read_rows(TICKERS_CSV).items()
+        if symbol not in current and os.path.exists(os.path.join(paths.TICKERS_DIR, f"{symbol}.json"))
+    ]
+
     # Write CSV
-    with open(TICKERS_CSV, "w", newline="") as f:
-        writer = csv.DictWriter(f, fieldnames=["symbol", "name", "exchange", "type"])
-        writer.writeheader()
-        writer.writerows(clean_tickers)
+    with instrument.timer("01.write") as t:
+        universe.write_rows(TICKERS_CSV, clean_tickers + carried, writer)
+        t.bytes_out = os.path.getsize(TICKERS_CSV)
 
-    print(f"[01] Saved {len(clean_tickers)} tickers to {TICKERS_CSV}")
+    print(f"[01] Saved {len(clean_tickers)} listed + {len(carried)} delisted tickers to {TICKERS_CSV} ({writer.summary()})")
     return True
 
 
 if __name__ == "__main__":
-    download_ticker_list()
+    download_ticker_list(refresh="--refresh" in sys.argv[1:])
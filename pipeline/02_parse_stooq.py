@@ -1,184 +1,314 @@
 from __future__ import annotations
 
 """
-Step 2: Download historical OHLCV data for each ticker via yfinance.
+Step 2: Download historical OHLCV data for each ticker via yfinance
+(or any other data provider, see providers.py).
 
 Reads the ticker list from step 01, downloads max history for each,
-and saves as compact per-ticker JSON files.
-
-Uses yfinance batch download for efficiency.
+and saves as compact per-ticker JSON files (plus columnar copies, see
+columnar.py). Batches run concurrently under a shared rate limiter, and
+per-symbol outcomes are journaled (see journal.py). Design notes are in
+Docs/ARCHITECTURE.md.
+
+Usage:
+  python 02_parse_stooq.py                  # resume
+  python 02_parse_stooq.py --retry-failed   # re-download only the failures
 """
 
 import os
+import sys
 import csv
-import json
-import time
-from datetime import datetime
-
-RAW_DIR = os.path.join(os.path.dirname(__file__), "raw")
-TICKERS_CSV = os.path.join(RAW_DIR, "tickers.csv")
-OUTPUT_DIR = os.path.join(os.path.dirname(__file__), "..", "public", "data", "tickers")
-PROGRESS_FILE = os.path.join(RAW_DIR, "download_progress.json")
+from functools import partial
+
+import instrument
+import paths
+from columnar import columnar_path, write_columnar
+from convert import frame_to_rows
+from journal import EMPTY, ERROR, OK, Journal
+from landing import Landing
+from providers import get_provider
+from ratelimit import TokenBucket, is_throttle_error, run_throttled
+from recent import write_series
+from universe import UNIVERSE_CSV, mark_consumed, pending_diff, read_rows
+from writer import OutputWriter
+
+RAW_DIR = paths.RAW_DIR
+TICKERS_CSV = paths.TICKERS_CSV
+OUTPUT_DIR = paths.TICKERS_DIR
 
 # How many tickers to download per yfinance batch call
 BATCH_SIZE = 50
-DELAY_BETWEEN_BATCHES = 1.0  # seconds
+# How many batches may be in flight at once
+CONCURRENCY = 4
+# Starting batch-request rate; backs off on throttling, recovers on success
+REQUESTS_PER_SECOND = 1.0
+# Provider frames of all batches in flight are kept within this many MB;
+# BATCH_SIZE is the upper bound
+MEMORY_BUDGET_MB = 512
+# Frame bytes per symbol-bar until a batch is measured (5 float64 columns + index)
+BYTES_PER_BAR = 48
+# History length assumed for a symbol not seen before, until batches are measured
+DEFAULT_BARS = 10_000
+# A fetched batch is held about twice: the frames and the landing copy
+OVERHEAD = 2
+# Weight of the latest batch in the running estimates
+SMOOTHING = 0.3
+# Throttled retries of a bisected part before its symbols are left for the next run
+MAX_THROTTLE_RETRIES = 3
 
 
 def load_tickers() -> list[dict]:
+    """Listed tickers from tickers.csv; delisted rows kept there by step 01 are step 05's."""
+    listed = set(read_rows(UNIVERSE_CSV))
     tickers = []
     with open(TICKERS_CSV, "r") as f:
         reader = csv.DictReader(f)
         for row in reader:
-            tickers.append(row)
+            if not listed or row["symbol"] in listed:
+                tickers.append(row)
     return tickers
 
 
-def load_progress() -> set:
-    if os.path.exists(PROGRESS_FILE):
-        with open(PROGRESS_FILE, "r") as f:
-            return set(json.load(f))
-    return set()
-
-
-def save_progress(done: set):
-    with open(PROGRESS_FILE, "w") as f:
-        json.dump(list(done), f)
-
-
-def download_ticker_data(symbol: str) -> dict | None:
-    """Download max historical data for a single ticker."""
-    import yfinance as yf
-
+class BatchSizer:
+    """Cuts the download queue into batches that fit the memory budget.
+
+    A batch costs about len(batch) x its longest history x bytes per bar: the
+    live provider aligns a batch on the union of its dates, so short histories
+    are padded to the longest one. History lengths come from the journal for
+    symbols downloaded before and otherwise from the batches seen so far; the
+    bytes per bar are measured on every fetched batch. Batches are cut lazily,
+    so each one is sized with the estimates current when it is submitted.
+    """
+
+    def __init__(self, budget_bytes: float, concurrency: int, max_size: int, known_bars: dict[str, int] | None = None):
+        # Every batch in flight gets an equal share of the budget
+        self.budget = budget_bytes / max(1, concurrency)
+        self.max_size = max_size
+        self.known_bars = known_bars or {}
+        self.typical_bars = DEFAULT_BARS
+        self.bytes_per_bar = BYTES_PER_BAR
+
+    def observe(self, symbols: int, longest: int, frame_bytes: int):
+        """Fold in one fetched batch: symbols with data, its longest history, frame bytes."""
+        if not symbols or not longest:
+            return
+        self.typical_bars = (1 - SMOOTHING) * self.typical_bars + SMOOTHING * longest
+        self.bytes_per_bar = (1 - SMOOTHING) * self.bytes_per_bar + SMOOTHING * frame_bytes / (symbols * longest)
+
+    def fits(self, size: int, longest: float) -> bool:
+        return size * longest * self.bytes_per_bar * OVERHEAD <= self.budget
+
+    def size_hint(self) -> int:
+        """Batch size for symbols of typical history length."""
+        size = 1
+        while size < self.max_size and self.fits(size + 1, self.typical_bars):
+            size += 1
+        return size
+
+    def batches(self, symbols: list[str]):
+        i = 0
+        while i < len(symbols):
+            batch = [symbols[i]]
+            longest = self.known_bars.get(symbols[i]) or self.typical_bars
+            i += 1
+            while i < len(symbols) and len(batch) < self.max_size:
+                bars = max(longest, self.known_bars.get(symbols[i]) or self.typical_bars)
+                if not self.fits(len(batch) + 1, bars):
+                    break
+                batch.append(symbols[i])
+                longest = bars
+                i += 1
+            yield batch
+
+
+def write_ticker(symbol: str, frame, writer: OutputWriter) -> tuple[str, str, int, str | None]:
+    """Convert and write one symbol's frame. Returns its journal entry."""
+    if frame is None or frame.empty:
+        return symbol, EMPTY, 0, None
     try:
-        ticker = yf.Ticker(symbol)
-        hist = ticker.history(period="max")
-
-        if hist.empty:
-            return None
-
-        rows = []
-        for idx, row in hist.iterrows():
-            ts = int(idx.timestamp())
-            o = round(float(row["Open"]), 6)
-            h = round(float(row["High"]), 6)
-            l = round(float(row["Low"]), 6)
-            c = round(float(row["Close"]), 6)
-            v = int(row["Volume"])
-            rows.append([ts, o, h, l, c, v])
-
+        with instrument.timer("02.convert"):
+            rows = frame_to_rows(frame)
         if not rows:
-            return None
-
-        rows.sort(key=lambda r: r[0])
-        return {"symbol": symbol, "data": rows}
-
-    except Exception:
-        return None
-
-
-def download_batch(symbols: list[str]) -> dict[str, dict]:
-    """Download historical data for a batch of tickers using yfinance."""
-    import yfinance as yf
-
-    results = {}
-    try:
-        data = yf.download(
-            symbols,
-            period="max",
-            group_by="ticker",
-            auto_adjust=True,
-            threads=True,
-        )
-
-        if data.empty:
-            return results
-
-        for symbol in symbols:
-            try:
-                if len(symbols) == 1:
-                    ticker_data = data
+            return symbol, EMPTY, 0, None
+        with instrument.timer("02.write"):
+            write_series(os.path.join(OUTPUT_DIR, f"{symbol}.json"), symbol, rows, writer)
+            write_columnar(columnar_path(symbol), symbol, rows)
+    except Exception as e:
+        return symbol, ERROR, 0, str(e)
+    return symbol, OK, len(rows), None
+
+
+def download_batch(
+    symbols: list[str],
+    provider=None,
+    landing: Landing | None = None,
+    limiter: TokenBucket | None = None,
+) -> tuple[list[tuple], OutputWriter, dict, list[str]]:
+    """Download a batch of tickers, writing each symbol as soon as its frame is converted.
+
+    Frames are released one by one as they are written, so a batch never holds
+    more than its provider frames plus one symbol's rows. A failed request is
+    split in half and both halves retried (each taking a token from `limiter`)
+    down to single symbols, so one bad symbol costs a few extra requests rather
+    than a request per symbol. Throttling of the whole batch propagates so the
+    scheduler can back off and retry it. A throttled part is never split: it
+    is re-queued after backing `limiter` off, and after MAX_THROTTLE_RETRIES
+    its symbols are deferred (not journaled, so the next run picks them up).
+
+    Returns (entries, writer, observed, deferred): a journal entry (symbol,
+    status, bars, error) per symbol, the writer holding this batch's counts,
+    the BatchSizer.observe() arguments for the fetched frames, and the
+    deferred symbols.
+    """
+    provider = provider or get_provider()
+    writer = OutputWriter()
+    entries = []
+    deferred = []
+    observed = {"symbols": 0, "longest": 0, "frame_bytes": 0}
+
+    parts = [(symbols, 0)]
+    while parts:
+        part, throttled = parts.pop()
+        if part is not symbols and limiter is not None:
+            limiter.acquire()
+        try:
+            with instrument.timer("02.fetch") as t:
+                frames = provider.fetch_history(part)
+                t.bytes_in = instrument.frames_nbytes(frames)
+        except Exception as e:
+            if part is symbols and is_throttle_error(e):
+                raise
+            if is_throttle_error(e):
+                if limiter is not None:
+                    limiter.on_throttle()
+                if limiter is not None and throttled < MAX_THROTTLE_RETRIES:
+                    # Retried last, after the other parts
+                    parts.insert(0, (part, throttled + 1))
                 else:
-                    ticker_data = data[symbol]
-
-                ticker_data = ticker_data.dropna(subset=["Open", "Close"])
-                if ticker_data.empty:
-                    continue
-
-                rows = []
-                for idx, row in ticker_data.iterrows():
-                    ts = int(idx.timestamp())
-                    o = round(float(row["Open"]), 6)
-                    h = round(float(row["High"]), 6)
-                    l = round(float(row["Low"]), 6)
-                    c = round(float(row["Close"]), 6)
-                    v = int(row["Volume"]) if not str(row["Volume"]) == "nan" else 0
-                    rows.append([ts, o, h, l, c, v])
-
-                if rows:
-                    rows.sort(key=lambda r: r[0])
-                    results[symbol] = {"symbol": symbol, "data": rows}
-            except Exception:
+                    deferred.extend(part)
                 continue
-
-    except Exception as e:
-        print(f"  Batch download error: {e}")
-        # Fallback: try one by one
-        for symbol in symbols:
-            result = download_ticker_data(symbol)
-            if result:
-                results[symbol] = result
-            time.sleep(0.2)
-
-    return results
-
-
-def download_all():
+            if len(part) == 1:
+                entries.append((part[0], ERROR, 0, str(e)))
+                continue
+            print(f"  Batch error for {len(part)} symbols ({part[0]}...{part[-1]}), splitting: {e}")
+            instrument.count("02.bisect")
+            mid = len(part) // 2
+            parts.extend([(part[mid:], 0), (part[:mid], 0)])
+            continue
+        if part is not symbols and limiter is not None:
+            limiter.on_success()
+
+        if landing is not None:
+            landing.save(frames)
+        lengths = [len(frame) for frame in frames.values() if frame is not None]
+        observed["symbols"] += len(lengths)
+        observed["longest"] = max([observed["longest"]] + lengths)
+        observed["frame_bytes"] += t.bytes_in
+
+        for symbol in part:
+            entries.append(write_ticker(symbol, frames.pop(symbol, None), writer))
+        del frames
+
+    return entries, writer, observed, deferred
+
+
+def download_all(
+    batch_size: int = BATCH_SIZE,
+    concurrency: int = CONCURRENCY,
+    rate: float = REQUESTS_PER_SECOND,
+    provider=None,
+    retry_failed: bool = False,
+    memory_budget_mb: float = MEMORY_BUDGET_MB,
+):
+    """Download all remaining tickers from `provider` (yfinance by default).
+
+    With `retry_failed`, download only the symbols whose last attempt failed.
+    """
     os.makedirs(OUTPUT_DIR, exist_ok=True)
 
     tickers = load_tickers()
-    done = load_progress()
-
-    # Filter out already-done tickers
-    remaining = [t for t in tickers if t["symbol"] not in done]
-    print(f"[02] {len(tickers)} total tickers, {len(done)} already done, {len(remaining)} remaining")
+    journal = Journal()
+    migrated = journal.migrate_legacy()
+    if migrated:
+        print(f"[02] Imported {migrated} symbols from download_progress.json into the progress journal")
+
+    diff = None
+    if retry_failed:
+        failed = journal.failed()
+        remaining = [t for t in tickers if t["symbol"] in failed]
+        print(f"[02] {len(tickers)} total tickers, retrying {len(remaining)} failed")
+    else:
+        attempted = journal.statuses()
+        diff = pending_diff("02")
+        listed = set()
+        if diff is not None:
+            listed = {row["symbol"] for row in diff["added"]} | {r["to"]["symbol"] for r in diff["renamed"]}
+            print(f"[02] Universe diff {diff['id']}: {len(listed)} new listings")
+        remaining = [t for t in tickers if t["symbol"] not in attempted or t["symbol"] in listed]
+        print(f"[02] {len(tickers)} total tickers, {len(tickers) - len(remaining)} already attempted, {len(remaining)} remaining")
 
     if not remaining:
-        print("[02] All tickers already downloaded.")
-        return load_tickers()
-
+        print("[02] Nothing to download.")
+        journal.close()
+        if diff is not None:
+            mark_consumed("02", diff)
+        return tickers
+
+    sizer = BatchSizer(memory_budget_mb * 1024 * 1024, concurrency, batch_size, journal.bars())
+    queue = [t["symbol"] for t in remaining]
+    print(f"[02] Batches of up to {batch_size} within {memory_budget_mb:g} MB "
+          f"(~{sizer.size_hint()} to start), {concurrency} in flight, {rate:g} req/s")
+
+    provider = provider or get_provider()
+    landing = Landing("02", provider.name)
+    limiter = TokenBucket(rate)
+    download_fn = partial(download_batch, provider=provider, landing=landing, limiter=limiter)
+    writer = OutputWriter()
     total_new = 0
     errors = 0
-
-    for i in range(0, len(remaining), BATCH_SIZE):
-        batch = remaining[i:i + BATCH_SIZE]
-        symbols = [t["symbol"] for t in batch]
-
-        print(f"[02] Batch {i // BATCH_SIZE + 1}/{(len(remaining) + BATCH_SIZE - 1) // BATCH_SIZE}: {symbols[0]}...{symbols[-1]} ({len(symbols)} tickers)")
-
-        results = download_batch(symbols)
-
-        for symbol in symbols:
-            if symbol in results:
-                ticker_data = results[symbol]
-                out_path = os.path.join(OUTPUT_DIR, f"{symbol}.json")
-                with open(out_path, "w") as f:
-                    json.dump(ticker_data, f, separators=(",", ":"))
-                total_new += 1
-            else:
-                errors += 1
-
-            done.add(symbol)
-
-        # Save progress every batch
-        save_progress(done)
-
-        if i + BATCH_SIZE < len(remaining):
-            time.sleep(DELAY_BETWEEN_BATCHES)
-
-    print(f"[02] Downloaded {total_new} new tickers ({errors} failed/empty)")
+    unfinished = 0
+    deferred_total = 0
+    empty = 0
+    completed = 0
+    done = 0
+
+    for symbols, outcome, error in run_throttled(sizer.batches(queue), download_fn, limiter, concurrency):
+        completed += 1
+        done += len(symbols)
+        if error is not None:
+            # Throttled even after retries: leave the batch for the next run
+            print(f"[02] Batch {completed}: {symbols[0]}...{symbols[-1]} failed: {error}")
+            errors += len(symbols)
+            unfinished += 1
+            continue
+
+        entries, batch_writer, observed, deferred = outcome
+        if deferred:
+            # Still throttled: not journaled, so the next run retries them
+            print(f"[02] Batch {completed}: {len(deferred)} throttled symbols left for the next run")
+            deferred_total += len(deferred)
+            unfinished += 1
+        sizer.observe(**observed)
+        writer.add(batch_writer)
+        journal.record(entries)
+        ok = sum(1 for entry in entries if entry[1] == OK)
+        total_new += ok
+        empty += sum(1 for entry in entries if entry[1] == EMPTY)
+        errors += sum(1 for entry in entries if entry[1] == ERROR)
+
+        print(f"[02] Batch {completed}: {symbols[0]}...{symbols[-1]} ({ok}/{len(symbols)} tickers, "
+              f"{done}/{len(queue)} done, next ~{sizer.size_hint()}, {limiter.rate:.2f} req/s)")
+
+    counts = journal.counts()
+    journal.close()
+    # Batches that never completed would lose their new listings otherwise
+    if diff is not None and not unfinished:
+        mark_consumed("02", diff)
+    print(f"[02] Downloaded {total_new} new tickers ({empty} empty, {errors} failed, {deferred_total} deferred)")
+    print(f"[02] Output: {writer.summary()}, {landing.summary()}")
+    print(f"[02] Journal: {counts.get(OK, 0)} ok, {counts.get(EMPTY, 0)} empty, {counts.get(ERROR, 0)} failed (re-run with --retry-failed)")
     return tickers
 
 
 if __name__ == "__main__":
-    download_all()
+    download_all(retry_failed="--retry-failed" in sys.argv[1:])
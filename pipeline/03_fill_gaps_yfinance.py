@@ -3,105 +3,183 @@ from __future__ import annotations
 """
 Step 3: Fill gaps in ticker data using yfinance.
 
-For each parsed ticker, checks if yfinance has more recent data
-and appends any missing days. Rate-limited to avoid API throttling.
+For each listed ticker, checks if yfinance has more recent data and appends
+any missing days to its recent tail file (see recent.py). Stale tickers are
+fetched in multi-symbol buckets under the shared rate limiter. Design notes
+are in Docs/ARCHITECTURE.md.
 
 This step is optional/skippable — Stooq data alone is sufficient for MVP.
 """
 
 import os
-import json
-import time
 from datetime import datetime, timedelta
+from functools import partial
+
+import instrument
+import paths
+from convert import frame_to_rows
+from landing import Landing
+from providers import get_provider
+from ratelimit import TokenBucket, run_throttled
+from recent import append_recent, series_meta
+from universe import UNIVERSE_CSV, load_diff, read_rows
+from writer import OutputWriter
+
+OUTPUT_DIR = paths.TICKERS_DIR
+DELISTED_CSV = os.path.join(os.path.dirname(__file__), "delisted_tickers.csv")
+
+# Symbols per multi-symbol history request
+BATCH_SIZE = 50
+# How many requests may be in flight at once
+CONCURRENCY = 4
+# Starting request rate; backs off on throttling, recovers on success
+REQUESTS_PER_SECOND = 2.0
+# Tickers whose last bar is at most this many days old are left alone
+STALE_AFTER_DAYS = 3
+# Stale tickers whose last bars are at most this many days apart share a request
+BUCKET_WINDOW_DAYS = 7
+
+
+def step05_symbols() -> set[str]:
+    """Symbols step 05 may write: the curated delisted list and the diff's removed symbols."""
+    symbols = set(read_rows(DELISTED_CSV))
+    diff = load_diff()
+    if diff is not None:
+        symbols.update(row["symbol"] for row in diff["removed"])
+    return symbols
+
+
+def find_stale(tickers: list[dict]) -> dict[str, int]:
+    """symbol -> last timestamp for stale tickers."""
+    stale = {}
+    now = datetime.now()
+    for t in tickers:
+        symbol = t["symbol"]
+        filepath = os.path.join(OUTPUT_DIR, f"{symbol}.json")
+        if not os.path.exists(filepath):
+            continue
+        try:
+            meta = series_meta(filepath)
+        except Exception as e:
+            print(f"  Error reading {symbol}: {e}")
+            continue
+        if meta is None:
+            continue
 
-OUTPUT_DIR = os.path.join(os.path.dirname(__file__), "..", "public", "data", "tickers")
-DELAY = 0.2  # seconds between yfinance requests
-
-
-def fill_gaps(tickers: list[dict] | None = None):
-    try:
-        import yfinance as yf
-    except ImportError:
-        print("[03] yfinance not installed, skipping gap-fill.")
-        return
+        # Skip if data is recent enough
+        if (now - datetime.utcfromtimestamp(meta["last_ts"])).days <= STALE_AFTER_DAYS:
+            continue
+        stale[symbol] = meta["last_ts"]
+    return stale
+
+
+def bucket_stale(stale: dict[str, int], window_days: int = BUCKET_WINDOW_DAYS) -> dict[str, list[str]]:
+    """Group stale tickers into buckets keyed on their earliest last date.
+
+    A bucket takes every ticker whose last bar is at most `window_days` after
+    the bucket's first one, so a spread of last dates costs a few requests
+    instead of one per date.
+    """
+    buckets = {}
+    window_end = None
+    for symbol, last_ts in sorted(stale.items(), key=lambda item: (item[1], item[0])):
+        if window_end is None or last_ts > window_end:
+            key = datetime.utcfromtimestamp(last_ts).strftime("%Y-%m-%d")
+            buckets[key] = []
+            window_end = last_ts + window_days * 86400
+        buckets[key].append(symbol)
+    return buckets
+
+
+def fetch_bucket(job: tuple[str, list[str]], provider, end: str, landing: Landing | None = None) -> dict:
+    last_date, symbols = job
+    start = (datetime.strptime(last_date, "%Y-%m-%d") + timedelta(days=1)).strftime("%Y-%m-%d")
+    with instrument.timer("03.fetch") as t:
+        frames = provider.fetch_history(symbols, start=start, end=end)
+        t.bytes_in = instrument.frames_nbytes(frames)
+    if landing is not None:
+        landing.save(frames, start=start, end=end)
+    return frames
+
+
+def fill_gaps(
+    tickers: list[dict] | None = None,
+    provider=None,
+    batch_size: int = BATCH_SIZE,
+    concurrency: int = CONCURRENCY,
+    rate: float = REQUESTS_PER_SECOND,
+):
+    if provider is None:
+        try:
+            import yfinance  # noqa: F401
+        except ImportError:
+            print("[03] yfinance not installed, skipping gap-fill.")
+            return
+        provider = get_provider()
 
     if tickers is None:
-        # Load from existing files
+        # Load from existing files, limited to the current listing if there is one
+        listed = set(read_rows(UNIVERSE_CSV))
+        step05 = step05_symbols()
         tickers = []
         if os.path.exists(OUTPUT_DIR):
             for f in os.listdir(OUTPUT_DIR):
-                if f.endswith(".json"):
-                    tickers.append({"symbol": f.replace(".json", "")})
+                symbol = f.replace(".json", "")
+                if f.endswith(".json") and (not listed or symbol in listed) and symbol not in step05:
+                    tickers.append({"symbol": symbol})
 
     if not tickers:
         print("[03] No tickers to process.")
         return
 
+    print(f"[03] Checking {len(tickers)} tickers for recent data gaps...")
+    last_ts = find_stale(tickers)
+    buckets = bucket_stale(last_ts)
+
+    jobs = [
+        (last_date, symbols[i:i + batch_size])
+        for last_date, symbols in sorted(buckets.items())
+        for i in range(0, len(symbols), batch_size)
+    ]
+    stale = sum(len(symbols) for symbols in buckets.values())
+    print(f"[03] {stale} stale tickers in {len(buckets)} last-date buckets ({BUCKET_WINDOW_DAYS}-day windows), {len(jobs)} requests")
+
     today = datetime.now().strftime("%Y-%m-%d")
+    landing = Landing("03", provider.name)
+    fetch = partial(fetch_bucket, provider=provider, end=today, landing=landing)
+    limiter = TokenBucket(rate)
+    writer = OutputWriter()
     updated = 0
     errors = 0
 
-    print(f"[03] Checking {len(tickers)} tickers for recent data gaps...")
-
-    for i, t in enumerate(tickers):
-        symbol = t["symbol"]
-        filepath = os.path.join(OUTPUT_DIR, f"{symbol}.json")
-
-        if not os.path.exists(filepath):
+    for i, ((last_date, symbols), frames, error) in enumerate(run_throttled(jobs, fetch, limiter, concurrency)):
+        if error is not None:
+            errors += len(symbols)
+            if errors <= 5 * batch_size:
+                print(f"  Error fetching {len(symbols)} tickers after {last_date}: {error}")
             continue
 
-        try:
-            with open(filepath, "r") as f:
-                data = json.load(f)
-
-            if not data["data"]:
-                continue
-
-            last_ts = data["data"][-1][0]
-            last_date = datetime.utcfromtimestamp(last_ts)
-
-            # Skip if data is recent enough (within 3 days)
-            if (datetime.now() - last_date).days <= 3:
-                continue
-
-            # Fetch from yfinance
-            start = (last_date + timedelta(days=1)).strftime("%Y-%m-%d")
-            ticker = yf.Ticker(symbol)
-            hist = ticker.history(start=start, end=today)
-
-            if hist.empty:
-                continue
-
-            new_rows = []
-            for idx, row in hist.iterrows():
-                ts = int(idx.timestamp())
-                o = round(float(row["Open"]), 6)
-                h = round(float(row["High"]), 6)
-                l = round(float(row["Low"]), 6)
-                c = round(float(row["Close"]), 6)
-                v = int(row["Volume"])
-                new_rows.append([ts, o, h, l, c, v])
-
-            if new_rows:
-                data["data"].extend(new_rows)
-                data["data"].sort(key=lambda r: r[0])
-
-                with open(filepath, "w") as f:
-                    json.dump(data, f, separators=(",", ":"))
-
-                updated += 1
-
-            time.sleep(DELAY)
-
-        except Exception as e:
-            errors += 1
-            if errors <= 5:
-                print(f"  Error on {symbol}: {e}")
-
-        if (i + 1) % 500 == 0:
-            print(f"[03] Progress: {i + 1}/{len(tickers)} ({updated} updated, {errors} errors)")
+        for symbol, hist in frames.items():
+            try:
+                with instrument.timer("03.convert"):
+                    new_rows = frame_to_rows(hist)
+                # A bucket starts at its earliest last date; keep only bars this ticker lacks
+                new_rows = [row for row in new_rows if row[0] > last_ts.get(symbol, 0)]
+                if not new_rows:
+                    continue
+                with instrument.timer("03.write"):
+                    if append_recent(os.path.join(OUTPUT_DIR, f"{symbol}.json"), symbol, new_rows, writer):
+                        updated += 1
+            except Exception as e:
+                errors += 1
+                if errors <= 5:
+                    print(f"  Error on {symbol}: {e}")
+
+        if (i + 1) % 20 == 0:
+            print(f"[03] Progress: {i + 1}/{len(jobs)} requests ({updated} updated, {errors} errors)")
 
     print(f"[03] Gap-fill complete: {updated} updated, {errors} errors")
+    print(f"[03] Output: {writer.summary()}, {landing.summary()}")
 
 
 if __name__ == "__main__":
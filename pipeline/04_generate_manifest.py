@@ -6,18 +6,41 @@ Step 4: Generate manifest.json from parsed ticker files.
 Scans all ticker JSON files and builds a manifest with:
 - symbol, name, exchange, date range, active/delisted status
 
-Uses the ticker list from step 01 for names and exchange info.
+Uses the ticker list from step 01 for names and exchange info. Also writes
+the search index (see searchindex.py) and stats.json (see tickerstats.py).
+Builds are incremental via raw/manifest_cache.json; design notes are in
+Docs/ARCHITECTURE.md.
+
+Usage:
+  python 04_generate_manifest.py          # incremental
+  python 04_generate_manifest.py --full   # ignore the cache
 """
 
 import os
+import sys
 import csv
 import json
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
 
-RAW_DIR = os.path.join(os.path.dirname(__file__), "raw")
-TICKERS_CSV = os.path.join(RAW_DIR, "tickers.csv")
-OUTPUT_DIR = os.path.join(os.path.dirname(__file__), "..", "public", "data", "tickers")
-MANIFEST_PATH = os.path.join(os.path.dirname(__file__), "..", "public", "data", "manifest.json")
+import instrument
+import paths
+from recent import scan_series, series_hash
+from searchindex import write_search_index
+from tickerstats import FIELDS, scan_stats
+from universe import UNIVERSE_CSV, mark_consumed, pending_diff, read_rows
+from writer import OutputWriter
+
+RAW_DIR = paths.RAW_DIR
+TICKERS_CSV = paths.TICKERS_CSV
+OUTPUT_DIR = paths.TICKERS_DIR
+MANIFEST_PATH = paths.MANIFEST_PATH
+STATS_PATH = paths.STATS_PATH
+CACHE_PATH = os.path.join(RAW_DIR, "manifest_cache.json")
+CACHE_VERSION = 2
+
+# Below this many files a process pool costs more than it saves
+PARALLEL_THRESHOLD = 500
 
 
 def load_ticker_info() -> dict[str, dict]:
@@ -34,52 +57,157 @@ def load_ticker_info() -> dict[str, dict]:
     return info
 
 
-def generate_manifest(parsed_tickers: list[dict] | None = None):
+def load_cache() -> dict[str, dict]:
+    if os.path.exists(CACHE_PATH):
+        try:
+            with open(CACHE_PATH, "r") as f:
+                cache = json.load(f)
+            if cache.get("version") == CACHE_VERSION:
+                return cache["files"]
+        except (OSError, ValueError, KeyError):
+            print("[04] Manifest cache unreadable, rebuilding from scratch")
+    return {}
+
+
+def save_cache(files: dict[str, dict]):
+    os.makedirs(RAW_DIR, exist_ok=True)
+    tmp_path = CACHE_PATH + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"version": CACHE_VERSION, "files": files}, f, separators=(",", ":"))
+    os.replace(tmp_path, CACHE_PATH)
+
+
+def scan_files(filepaths: list[str], workers: int | None = None):
+    """Yield (path, meta, error) with content hashes and stats for the given files."""
+    if workers == 1 or len(filepaths) < PARALLEL_THRESHOLD:
+        yield from map(scan_stats, filepaths)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(scan_stats, filepaths, chunksize=64)
+
+
+def patch_manifest(diff: dict) -> dict | None:
+    """Apply a universe diff to today's manifest in place (None if there is none to patch)."""
+    if not os.path.exists(MANIFEST_PATH):
+        return None
+    with open(MANIFEST_PATH, "r") as f:
+        manifest = json.load(f)
+    # Active flags of an older manifest are stale; that needs a full pass
+    if manifest.get("updated") != datetime.now().strftime("%Y-%m-%d"):
+        return None
+
+    entries = {t["s"]: t for t in manifest["tickers"]}
+    patched = 0
+    for row in [c["after"] for c in diff["changed"]] + [r["to"] for r in diff["renamed"]]:
+        entry = entries.get(row["symbol"])
+        if entry is not None:
+            entry["n"] = row["name"]
+            entry["e"] = row["exchange"]
+            patched += 1
+    for row in diff["removed"]:
+        entry = entries.get(row["symbol"])
+        if entry is not None and entry["a"]:
+            entry["a"] = False
+            patched += 1
+
+    writer = OutputWriter()
+    with instrument.timer("04.write"):
+        writer.write_json(MANIFEST_PATH, manifest)
+    with instrument.timer("04.search_index"):
+        write_search_index(manifest["tickers"], manifest["updated"], writer=writer)
+    print(f"[04] Patched {patched} manifest entries from universe diff {diff['id']} ({writer.summary()})")
+    return manifest
+
+
+def to_date(ts: int) -> str:
+    return datetime.utcfromtimestamp(ts).strftime("%Y-%m-%d")
+
+
+def generate_manifest(parsed_tickers: list[dict] | None = None, workers: int | None = None, full: bool = False):
     ticker_info = load_ticker_info()
 
     if not os.path.exists(OUTPUT_DIR):
         print("[04] ERROR: No ticker data directory found.")
         return
 
-    files = [f for f in os.listdir(OUTPUT_DIR) if f.endswith(".json")]
-    print(f"[04] Building manifest from {len(files)} ticker files...")
-
-    tickers = []
-    for filename in sorted(files):
+    stats = scan_series(OUTPUT_DIR)
+    print(f"[04] Building manifest from {len(stats)} ticker files...")
+
+    cache = {} if full else load_cache()
+    files = {}
+    to_scan = []
+    for symbol, (size, mtime_ns) in stats.items():
+        cached = cache.get(symbol)
+        if cached and cached["size"] == size:
+            if cached["mtime_ns"] == mtime_ns:
+                files[symbol] = cached
+                continue
+            # Touched but maybe not changed: a hash check is cheaper than a rescan
+            filepath = os.path.join(OUTPUT_DIR, f"{symbol}.json")
+            if series_hash(filepath) == cached["hash"]:
+                files[symbol] = dict(cached, mtime_ns=mtime_ns)
+                continue
+        to_scan.append(symbol)
+
+    removed = len(set(cache) - set(stats))
+    print(f"[04] {len(files)} unchanged, {len(to_scan)} new/changed, {removed} removed")
+
+    diff = pending_diff("04")
+    if diff is not None and not full and not to_scan and not removed:
+        manifest = patch_manifest(diff)
+        if manifest is not None:
+            mark_consumed("04", diff)
+            return manifest
+
+    filepaths = [os.path.join(OUTPUT_DIR, f"{symbol}.json") for symbol in to_scan]
+    with instrument.timer("04.scan") as t:
+        scanned = list(scan_files(filepaths, workers))
+        t.bytes_in = sum(stats[symbol][0] for symbol in to_scan)
+    for filepath, meta, error in scanned:
+        filename = os.path.basename(filepath)
         symbol = filename.replace(".json", "")
-        filepath = os.path.join(OUTPUT_DIR, filename)
 
-        try:
-            with open(filepath, "r") as f:
-                data = json.load(f)
+        if error is not None:
+            print(f"  Error reading {filename}: {error}")
+            continue
 
-            if not data.get("data"):
-                continue
+        size, mtime_ns = stats[symbol]
+        files[symbol] = {
+            "size": size,
+            "mtime_ns": mtime_ns,
+            "hash": meta["hash"],
+            "from": to_date(meta["first_ts"]) if "first_ts" in meta else None,
+            "to": to_date(meta["last_ts"]) if "last_ts" in meta else None,
+            "stats": meta["stats"],
+        }
+
+    # Determine if active: last data within ~30 days of now, and still listed
+    active_since = (datetime.now() - timedelta(days=30)).strftime("%Y-%m-%d")
+    listed = set(read_rows(UNIVERSE_CSV)) or None
 
-            first_ts = data["data"][0][0]
-            last_ts = data["data"][-1][0]
-            first_date = datetime.utcfromtimestamp(first_ts).strftime("%Y-%m-%d")
-            last_date = datetime.utcfromtimestamp(last_ts).strftime("%Y-%m-%d")
-
-            # Determine if active: last data within ~30 days of now
-            last_dt = datetime.utcfromtimestamp(last_ts)
-            active = (datetime.now() - last_dt) < timedelta(days=30)
-
-            # Get name and exchange from ticker list
-            info = ticker_info.get(symbol, {})
-            name = info.get("name", symbol)
-            exchange = info.get("exchange", "US")
-
-            tickers.append({
-                "s": symbol,
-                "n": name,
-                "e": exchange,
-                "from": first_date,
-                "to": last_date,
-                "a": active,
-            })
-        except Exception as e:
-            print(f"  Error reading {filename}: {e}")
+    tickers = []
+    stats_rows = {}
+    for symbol in sorted(files):
+        entry = files[symbol]
+        if entry["from"] is None:
+            continue
+
+        # Get name and exchange from ticker list
+        info = ticker_info.get(symbol, {})
+        name = info.get("name", symbol)
+        exchange = info.get("exchange", "US")
+
+        tickers.append({
+            "s": symbol,
+            "n": name,
+            "e": exchange,
+            "from": entry["from"],
+            "to": entry["to"],
+            "a": entry["to"] > active_since and (listed is None or symbol in listed),
+        })
+        if entry["stats"] is not None:
+            stats_rows[symbol] = entry["stats"]
 
     tickers.sort(key=lambda t: t["s"])
 
@@ -89,14 +217,26 @@ def generate_manifest(parsed_tickers: list[dict] | None = None):
     }
 
     os.makedirs(os.path.dirname(MANIFEST_PATH), exist_ok=True)
-    with open(MANIFEST_PATH, "w") as f:
-        json.dump(manifest, f, separators=(",", ":"))
+    writer = OutputWriter()
+    with instrument.timer("04.write"):
+        writer.write_json(MANIFEST_PATH, manifest)
+        writer.write_json(STATS_PATH, {"updated": manifest["updated"], "fields": FIELDS, "tickers": stats_rows})
+
+    save_cache(files)
 
     size_kb = os.path.getsize(MANIFEST_PATH) / 1024
     print(f"[04] Manifest generated: {len(tickers)} tickers, {size_kb:.0f} KB")
+    print(f"[04] Stats written for {len(stats_rows)} tickers, {os.path.getsize(STATS_PATH) / 1024:.0f} KB")
+
+    with instrument.timer("04.search_index"):
+        shards, shard_bytes = write_search_index(tickers, manifest["updated"], writer=writer)
+    print(f"[04] Search index: {shards} prefix shards, {shard_bytes / 1024:.0f} KB total")
+    print(f"[04] Output: {writer.summary()}")
 
+    if diff is not None:
+        mark_consumed("04", diff)
     return manifest
 
 
 if __name__ == "__main__":
-    generate_manifest()
+    generate_manifest(full="--full" in sys.argv[1:])
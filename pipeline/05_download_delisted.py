@@ -5,7 +5,12 @@ Step 5: Download historical data for curated delisted tickers.
 
 Reads delisted_tickers.csv and downloads OHLCV data via yfinance.
 Appends successful tickers to tickers.csv so manifest generation picks them up.
-Skips tickers that already have data files.
+Skips tickers that already have data files. Raw frames are saved to the
+landing zone (see landing.py).
+
+Symbols that step 01's universe diff reports as removed from the listing (see
+universe.py) get one final full download, even if they have a data file, so
+their history runs up to the delisting.
 
 Usage:
   python 05_download_delisted.py
@@ -13,13 +18,22 @@ Usage:
 
 import os
 import csv
-import json
 import time
 
-RAW_DIR = os.path.join(os.path.dirname(__file__), "raw")
-TICKERS_CSV = os.path.join(RAW_DIR, "tickers.csv")
+import instrument
+import paths
+from columnar import columnar_path, write_columnar
+from convert import frame_to_rows
+from landing import Landing
+from providers import get_provider
+from recent import write_series
+from universe import mark_consumed, pending_diff
+from writer import OutputWriter
+
+RAW_DIR = paths.RAW_DIR
+TICKERS_CSV = paths.TICKERS_CSV
 DELISTED_CSV = os.path.join(os.path.dirname(__file__), "delisted_tickers.csv")
-OUTPUT_DIR = os.path.join(os.path.dirname(__file__), "..", "public", "data", "tickers")
+OUTPUT_DIR = paths.TICKERS_DIR
 
 DELAY_BETWEEN_TICKERS = 0.5  # seconds
 
@@ -44,30 +58,24 @@ def load_existing_tickers_csv() -> dict[str, dict]:
     return existing
 
 
-def download_ticker(symbol: str) -> dict | None:
-    import yfinance as yf
+def download_ticker(symbol: str, provider=None, landing: Landing | None = None) -> dict | None:
+    provider = provider or get_provider()
 
     try:
-        ticker = yf.Ticker(symbol)
-        hist = ticker.history(period="max")
-
-        if hist.empty:
+        with instrument.timer("05.fetch") as t:
+            frames = provider.fetch_history([symbol])
+            t.bytes_in = instrument.frames_nbytes(frames)
+        if landing is not None:
+            landing.save(frames)
+        hist = frames.get(symbol)
+        if hist is None or hist.empty:
             return None
 
-        rows = []
-        for idx, row in hist.iterrows():
-            ts = int(idx.timestamp())
-            o = round(float(row["Open"]), 6)
-            h = round(float(row["High"]), 6)
-            l = round(float(row["Low"]), 6)
-            c = round(float(row["Close"]), 6)
-            v = int(row["Volume"]) if str(row["Volume"]) != "nan" else 0
-            rows.append([ts, o, h, l, c, v])
-
+        with instrument.timer("05.convert"):
+            rows = frame_to_rows(hist)
         if not rows:
             return None
 
-        rows.sort(key=lambda r: r[0])
         return {"symbol": symbol, "data": rows}
 
     except Exception as e:
@@ -75,7 +83,8 @@ def download_ticker(symbol: str) -> dict | None:
         return None
 
 
-def main():
+def main(provider=None):
+    provider = provider or get_provider()
     os.makedirs(OUTPUT_DIR, exist_ok=True)
 
     delisted = load_delisted()
@@ -94,23 +103,34 @@ def main():
     print(f"[05] {len(delisted)} delisted tickers in list")
     print(f"[05] {already_have} already have data files, {len(to_download)} to download")
 
+    diff = pending_diff("05")
+    if diff is not None:
+        queued = {t["symbol"] for t in to_download}
+        newly_delisted = [row for row in diff["removed"] if row["symbol"] not in queued]
+        to_download.extend(newly_delisted)
+        print(f"[05] Universe diff {diff['id']}: {len(newly_delisted)} newly delisted tickers for a final download")
+
     if not to_download:
         print("[05] Nothing to download.")
+        if diff is not None:
+            mark_consumed("05", diff)
         return
 
     success = 0
     failed = 0
     new_csv_rows = []
+    writer = OutputWriter()
+    landing = Landing("05", provider.name)
 
     for i, t in enumerate(to_download):
         symbol = t["symbol"]
         print(f"[05] ({i + 1}/{len(to_download)}) Downloading {symbol}...", end=" ", flush=True)
 
-        result = download_ticker(symbol)
+        result = download_ticker(symbol, provider, landing)
         if result and len(result["data"]) > 5:  # At least a few data points
-            out_path = os.path.join(OUTPUT_DIR, f"{symbol}.json")
-            with open(out_path, "w") as f:
-                json.dump(result, f, separators=(",", ":"))
+            with instrument.timer("05.write"):
+                write_series(os.path.join(OUTPUT_DIR, f"{symbol}.json"), symbol, result["data"], writer)
+                write_columnar(columnar_path(symbol), symbol, result["data"])
             days = len(result["data"])
             print(f"OK ({days} days)")
             success += 1
@@ -122,16 +142,21 @@ def main():
             print("FAILED (no data)")
             failed += 1
 
-        time.sleep(DELAY_BETWEEN_TICKERS)
+        if provider.name == "live":
+            time.sleep(DELAY_BETWEEN_TICKERS)
 
     # Append new tickers to tickers.csv
     if new_csv_rows and os.path.exists(TICKERS_CSV):
         with open(TICKERS_CSV, "a", newline="") as f:
-            writer = csv.DictWriter(f, fieldnames=["symbol", "name", "exchange", "type"])
-            writer.writerows(new_csv_rows)
+            csv_writer = csv.DictWriter(f, fieldnames=["symbol", "name", "exchange", "type"])
+            csv_writer.writerows(new_csv_rows)
         print(f"[05] Appended {len(new_csv_rows)} new entries to tickers.csv")
 
+    if diff is not None:
+        mark_consumed("05", diff)
+
     print(f"\n[05] Done: {success} downloaded, {failed} failed")
+    print(f"[05] Output: {writer.summary()}, {landing.summary()}")
     print("[05] Run 04_generate_manifest.py to rebuild the manifest.")
 
 
@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+"""
+Step 6: Pack all ticker series into one indexed SQLite store.
+
+Runs after step 02 (and 03/05). Reads every per-ticker JSON file and writes
+raw/market.sqlite with a symbols table (name, exchange, date range, row
+count) and a bars table clustered on (symbol_id, ts). See store.py for the
+query API.
+
+Builds are incremental: each symbol row remembers the size and mtime of the
+file it was loaded from, so only new or changed files are re-read and
+tickers whose file disappeared are dropped. A ticker's series is its base
+file plus its recent tail (see recent.py); both count towards size and mtime.
+
+Usage:
+  python 06_build_store.py          # incremental
+  python 06_build_store.py --full   # rebuild from scratch
+"""
+
+import os
+import sys
+import csv
+from concurrent.futures import ProcessPoolExecutor
+
+import paths
+from recent import load_series, scan_series
+from store import STORE_PATH, connect
+
+TICKERS_CSV = paths.TICKERS_CSV
+OUTPUT_DIR = paths.TICKERS_DIR
+
+# Symbols inserted per transaction
+COMMIT_EVERY = 200
+
+
+def load_ticker_info() -> dict[str, dict]:
+    info = {}
+    if os.path.exists(TICKERS_CSV):
+        with open(TICKERS_CSV, "r") as f:
+            for row in csv.DictReader(f):
+                info[row["symbol"]] = row
+    return info
+
+
+def load_rows(filepath: str) -> tuple[str, list | None, str | None]:
+    """Process-pool worker: (path, rows, error)."""
+    try:
+        return filepath, load_series(filepath), None
+    except Exception as e:
+        return filepath, None, str(e)
+
+
+def build_store(full: bool = False, workers: int | None = None):
+    if not os.path.exists(OUTPUT_DIR):
+        print("[06] ERROR: No ticker data directory found.")
+        return
+
+    if full:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(STORE_PATH + suffix):
+                os.remove(STORE_PATH + suffix)
+    os.makedirs(os.path.dirname(STORE_PATH), exist_ok=True)
+
+    ticker_info = load_ticker_info()
+    stats = scan_series(OUTPUT_DIR)
+
+    conn = connect(STORE_PATH)
+    conn.isolation_level = None  # explicit transactions below
+    known = {
+        symbol: (symbol_id, size, mtime_ns)
+        for symbol_id, symbol, size, mtime_ns in conn.execute("SELECT id, symbol, size, mtime_ns FROM symbols")
+    }
+
+    removed = [symbol for symbol in known if symbol not in stats]
+    changed = [
+        symbol for symbol, fingerprint in stats.items()
+        if symbol not in known or known[symbol][1:] != fingerprint
+    ]
+    print(f"[06] {len(stats)} ticker files: {len(changed)} new/changed, {len(removed)} removed")
+
+    conn.execute("BEGIN")
+    for symbol in removed:
+        symbol_id = known[symbol][0]
+        conn.execute("DELETE FROM bars WHERE symbol_id = ?", (symbol_id,))
+        conn.execute("DELETE FROM symbols WHERE id = ?", (symbol_id,))
+    conn.execute("COMMIT")
+
+    filepaths = [os.path.join(OUTPUT_DIR, f"{symbol}.json") for symbol in sorted(changed)]
+    loaded = errors = total_rows = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        conn.execute("BEGIN")
+        for filepath, rows, error in pool.map(load_rows, filepaths, chunksize=32):
+            symbol = os.path.basename(filepath)[:-len(".json")]
+            if error is not None:
+                errors += 1
+                if errors <= 5:
+                    print(f"  Error reading {symbol}: {error}")
+                continue
+
+            info = ticker_info.get(symbol, {})
+            size, mtime_ns = stats[symbol]
+            conn.execute(
+                """
+                INSERT INTO symbols (symbol, name, exchange, first_ts, last_ts, rows, size, mtime_ns)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(symbol) DO UPDATE SET
+                    name = excluded.name, exchange = excluded.exchange,
+                    first_ts = excluded.first_ts, last_ts = excluded.last_ts,
+                    rows = excluded.rows, size = excluded.size, mtime_ns = excluded.mtime_ns
+                """,
+                (
+                    symbol, info.get("name", symbol), info.get("exchange", "US"),
+                    rows[0][0] if rows else None, rows[-1][0] if rows else None,
+                    len(rows), size, mtime_ns,
+                ),
+            )
+            symbol_id = conn.execute("SELECT id FROM symbols WHERE symbol = ?", (symbol,)).fetchone()[0]
+            conn.execute("DELETE FROM bars WHERE symbol_id = ?", (symbol_id,))
+            conn.executemany(
+                "INSERT OR REPLACE INTO bars VALUES (?, ?, ?, ?, ?, ?, ?)",
+                ((symbol_id, *row) for row in rows),
+            )
+
+            loaded += 1
+            total_rows += len(rows)
+            if loaded % COMMIT_EVERY == 0:
+                conn.execute("COMMIT")
+                print(f"[06] Progress: {loaded}/{len(filepaths)} tickers, {total_rows} bars")
+                conn.execute("BEGIN")
+        conn.execute("COMMIT")
+
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.close()
+
+    size_mb = os.path.getsize(STORE_PATH) / 1024 / 1024
+    print(f"[06] Store updated: {loaded} tickers ({total_rows} bars) loaded, {errors} errors, {size_mb:.0f} MB")
+
+
+if __name__ == "__main__":
+    build_store(full="--full" in sys.argv[1:])
@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+"""
+Step 7: Precompute weekly and monthly OHLCV bars for every ticker.
+
+Writes public/data/weekly/{SYMBOL}.json and public/data/monthly/{SYMBOL}.json
+in the same compact format as the daily files, so clients can fetch a few
+hundred aggregated rows instead of rebuilding them from thousands of daily
+bars.
+
+Grouping follows src/utils/aggregation.ts: ISO weeks (Monday start, ISO
+week-numbering year) and calendar months, keyed on the bar's date. Each
+group takes the first open, max high, min low, last close, summed volume and
+the first day's timestamp. Rows are sorted, so groups are contiguous runs
+and are reduced with NumPy reduceat in one pass per column.
+
+Only tickers whose series (base file and recent tail, see recent.py) changed
+since the last build are rebuilt: raw/aggregates_state.json holds the size
+and mtime each was built from. Aggregates come out through writer.py, so an
+identical file is not rewritten and keeps its mtime (and step 10's siblings).
+Aggregates of tickers that no longer have a file are deleted.
+
+Usage:
+  python 07_build_aggregates.py          # incremental
+  python 07_build_aggregates.py --full   # rebuild everything
+"""
+
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import paths
+from recent import load_series, scan_series
+from writer import OutputWriter
+
+OUTPUT_DIR = paths.TICKERS_DIR
+WEEKLY_DIR = paths.WEEKLY_DIR
+MONTHLY_DIR = paths.MONTHLY_DIR
+# symbol -> [size, mtime_ns] of the series its aggregates were built from
+STATE_PATH = os.path.join(paths.RAW_DIR, "aggregates_state.json")
+
+SECONDS_PER_DAY = 86400
+
+
+def week_keys(ts: np.ndarray) -> np.ndarray:
+    """ISO (year, week) of each timestamp's date, packed as year * 100 + week."""
+    days = np.floor_divide(ts, SECONDS_PER_DAY).astype(np.int64)
+    # 1970-01-01 was a Thursday; weekday 0 = Monday
+    weekday = (days + 3) % 7
+    thursday = days - weekday + 3
+    iso_year = thursday.astype("datetime64[D]").astype("datetime64[Y]")
+    year_start = iso_year.astype("datetime64[D]").astype(np.int64)
+    week = (thursday - year_start) // 7 + 1
+    return (iso_year.astype(np.int64) + 1970) * 100 + week
+
+
+def month_keys(ts: np.ndarray) -> np.ndarray:
+    """Calendar month of each timestamp's date, as months since 1970-01."""
+    days = np.floor_divide(ts, SECONDS_PER_DAY).astype("datetime64[D]")
+    return days.astype("datetime64[M]").astype(np.int64)
+
+
+def aggregate(table: np.ndarray, keys: np.ndarray) -> list[list]:
+    """Reduce contiguous runs of equal keys into OHLCV rows."""
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    ends = np.r_[starts[1:], len(keys)] - 1
+
+    ts = table[starts, 0].astype(np.int64)
+    open_ = table[starts, 1]
+    high = np.maximum.reduceat(table[:, 2], starts)
+    low = np.minimum.reduceat(table[:, 3], starts)
+    close = table[ends, 4]
+    volume = np.add.reduceat(np.nan_to_num(table[:, 5]), starts).astype(np.int64)
+
+    return [
+        list(row)
+        for row in zip(ts.tolist(), open_.tolist(), high.tolist(), low.tolist(), close.tolist(), volume.tolist())
+    ]
+
+
+def build_ticker(symbol: str) -> tuple[str, int, OutputWriter | None, str | None]:
+    """Process-pool worker: (symbol, daily rows, writer counters, error)."""
+    try:
+        rows = load_series(os.path.join(OUTPUT_DIR, f"{symbol}.json"))
+        writer = OutputWriter()
+        if not rows:
+            return symbol, 0, writer, None
+
+        table = np.asarray(rows, dtype=np.float64)
+        weekly = aggregate(table, week_keys(table[:, 0]))
+        monthly = aggregate(table, month_keys(table[:, 0]))
+        writer.write_json(os.path.join(WEEKLY_DIR, f"{symbol}.json"), {"symbol": symbol, "data": weekly})
+        writer.write_json(os.path.join(MONTHLY_DIR, f"{symbol}.json"), {"symbol": symbol, "data": monthly})
+        return symbol, len(rows), writer, None
+    except Exception as e:
+        return symbol, 0, None, str(e)
+
+
+def load_state() -> dict[str, list[int]]:
+    if not os.path.exists(STATE_PATH):
+        return {}
+    with open(STATE_PATH, "r") as f:
+        return json.load(f)
+
+
+def is_stale(symbol: str, stat: tuple[int, int], state: dict[str, list[int]]) -> bool:
+    if state.get(symbol) != list(stat):
+        return True
+    return not all(os.path.exists(os.path.join(out_dir, f"{symbol}.json")) for out_dir in (WEEKLY_DIR, MONTHLY_DIR))
+
+
+def remove_orphans(series: dict) -> int:
+    """Delete weekly/monthly files of tickers not in `series`. Returns files removed."""
+    removed = 0
+    for out_dir in (WEEKLY_DIR, MONTHLY_DIR):
+        for entry in os.scandir(out_dir):
+            if entry.name.endswith(".json") and entry.name[:-len(".json")] not in series:
+                os.remove(entry.path)
+                removed += 1
+    return removed
+
+
+def build_aggregates(full: bool = False, workers: int | None = None):
+    if not os.path.exists(OUTPUT_DIR):
+        print("[07] ERROR: No ticker data directory found.")
+        return
+
+    os.makedirs(WEEKLY_DIR, exist_ok=True)
+    os.makedirs(MONTHLY_DIR, exist_ok=True)
+
+    series = scan_series(OUTPUT_DIR)
+    old_state = {} if full else load_state()
+    # Tickers whose file is gone drop out of the state and lose their aggregates
+    state = {symbol: old_state[symbol] for symbol in series if symbol in old_state}
+    orphans = remove_orphans(series)
+    symbols = [symbol for symbol, stat in series.items() if full or is_stale(symbol, stat, old_state)]
+
+    print(f"[07] Aggregating {len(symbols)} tickers to weekly/monthly bars ({orphans} orphaned files removed)...")
+
+    writer = OutputWriter()
+    done = errors = total_rows = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for symbol, rows, counts, error in pool.map(build_ticker, sorted(symbols), chunksize=32):
+            if error is not None:
+                errors += 1
+                state.pop(symbol, None)
+                if errors <= 5:
+                    print(f"  Error on {symbol}: {error}")
+                continue
+            writer.add(counts)
+            state[symbol] = list(series[symbol])
+            done += 1
+            total_rows += rows
+
+    OutputWriter().write_json(STATE_PATH, dict(sorted(state.items())))
+    print(f"[07] Aggregates complete: {done} tickers ({total_rows} daily bars), {errors} errors")
+    print(f"[07] Output: {writer.summary()}")
+
+
+if __name__ == "__main__":
+    build_aggregates(full="--full" in sys.argv[1:])
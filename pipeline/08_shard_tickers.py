@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+"""
+Step 8: Split each ticker series into yearly chunks plus a per-ticker index.
+
+Writes public/data/shards/{SYMBOL}/{YEAR}.json and index.json (see shards.py)
+so date-range views only fetch the years they show. This step (re)shards
+tickers whose series (base file or recent tail, see recent.py) is newer than
+their shard index; unchanged chunks are left untouched, so a daily top-up
+normally rewrites just the current year's chunk. Shard directories of tickers
+that no longer have a file are removed.
+
+Usage:
+  python 08_shard_tickers.py          # incremental
+  python 08_shard_tickers.py --full   # reshard everything
+"""
+
+import os
+import shutil
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import paths
+from recent import load_series, scan_series
+from shards import SHARDS_DIR, shard_dir, write_shards
+
+OUTPUT_DIR = paths.TICKERS_DIR
+
+
+def shard_ticker(symbol: str) -> tuple[str, int, str | None]:
+    """Process-pool worker: (symbol, chunks written, error)."""
+    try:
+        rows = load_series(os.path.join(OUTPUT_DIR, f"{symbol}.json"))
+        if not rows:
+            return symbol, 0, None
+        chunks = write_shards(symbol, rows)
+        # An unchanged index is not rewritten; mark it as checked against this series
+        os.utime(os.path.join(shard_dir(symbol), "index.json"))
+        return symbol, chunks, None
+    except Exception as e:
+        return symbol, 0, str(e)
+
+
+def shard_tickers(full: bool = False, workers: int | None = None):
+    if not os.path.exists(OUTPUT_DIR):
+        print("[08] ERROR: No ticker data directory found.")
+        return
+
+    series = scan_series(OUTPUT_DIR)
+    orphans = 0
+    if os.path.isdir(SHARDS_DIR):
+        for entry in os.scandir(SHARDS_DIR):
+            if entry.is_dir() and entry.name not in series:
+                shutil.rmtree(entry.path)
+                orphans += 1
+
+    symbols = []
+    for symbol, (_, mtime_ns) in series.items():
+        index_path = os.path.join(shard_dir(symbol), "index.json")
+        if full or not os.path.exists(index_path) or os.stat(index_path).st_mtime_ns < mtime_ns:
+            symbols.append(symbol)
+
+    print(f"[08] Sharding {len(symbols)} tickers by year ({orphans} orphaned shard directories removed)...")
+
+    done = errors = total_chunks = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for symbol, chunks, error in pool.map(shard_ticker, sorted(symbols), chunksize=32):
+            if error is not None:
+                errors += 1
+                if errors <= 5:
+                    print(f"  Error on {symbol}: {error}")
+                continue
+            done += 1
+            total_chunks += chunks
+
+    print(f"[08] Sharding complete: {done} tickers, {total_chunks} chunks, {errors} errors")
+
+
+if __name__ == "__main__":
+    shard_tickers(full="--full" in sys.argv[1:])
@@ -0,0 +1,267 @@
+from __future__ import annotations
+
+"""
+Step 9: Build the date-aligned close/volume panel (raw/panel/, see panel.py).
+
+Updated incrementally from the ticker files changed, added or removed since
+the last build; design notes are in Docs/ARCHITECTURE.md.
+
+Usage:
+  python 09_build_panel.py          # incremental
+  python 09_build_panel.py --full   # rebuild from scratch
+"""
+
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import paths
+from columnar import load_bars
+from panel import (DTYPE, PANEL_DIR, SPARE_COLUMNS, create_matrix, grow_matrix, load_meta, load_symbols,
+                   move_columns, save_sidecars, widen_matrix)
+from recent import scan_series, series_stat
+
+OUTPUT_DIR = paths.TICKERS_DIR
+META_VERSION = 1
+
+# Tickers assembled in memory per block during a full build
+BLOCK_SYMBOLS = 256
+
+
+def load_series(json_path: str) -> tuple[str, np.ndarray | None, np.ndarray | None, np.ndarray | None, str | None]:
+    """Process-pool worker: (symbol, day, close, volume, error)."""
+    symbol = os.path.basename(json_path)[:-len(".json")]
+    try:
+        bars = load_bars(json_path)
+        return symbol, np.array(bars.day), np.array(bars.close, dtype=DTYPE), np.array(bars.volume, dtype=DTYPE), None
+    except Exception as e:
+        return symbol, None, None, None, str(e)
+
+
+def load_days(json_path: str) -> tuple[str, np.ndarray | None, str | None]:
+    """Process-pool worker: (symbol, day, error)."""
+    symbol, day, _, _, error = load_series(json_path)
+    return symbol, day, error
+
+
+def full_build(symbols: list[str], pool: ProcessPoolExecutor) -> tuple[np.ndarray, dict, list[str]]:
+    json_paths = [os.path.join(OUTPUT_DIR, f"{symbol}.json") for symbol in symbols]
+
+    # Pass 1: the calendar
+    calendar = np.empty(0, dtype=np.int32)
+    pending = []
+    for symbol, day, error in pool.map(load_days, json_paths, chunksize=64):
+        if error is not None:
+            print(f"  Error reading {symbol}: {error}")
+            continue
+        pending.append(day)
+        if len(pending) >= BLOCK_SYMBOLS:
+            calendar = np.union1d(calendar, np.concatenate(pending))
+            pending = []
+    if pending:
+        calendar = np.union1d(calendar, np.concatenate(pending))
+    calendar = calendar.astype(np.int32)
+    print(f"[09] Calendar: {len(calendar)} trading days x {len(symbols)} tickers")
+
+    # Pass 2: fill the matrices a block of columns at a time
+    os.makedirs(PANEL_DIR, exist_ok=True)
+    close_path = os.path.join(PANEL_DIR, "close.npy")
+    volume_path = os.path.join(PANEL_DIR, "volume.npy")
+    close = create_matrix(close_path + ".tmp", len(calendar), len(symbols) + SPARE_COLUMNS)
+    volume = create_matrix(volume_path + ".tmp", len(calendar), len(symbols) + SPARE_COLUMNS)
+
+    state = {}
+    retry = []
+    for block_start in range(0, len(symbols), BLOCK_SYMBOLS):
+        block_paths = json_paths[block_start:block_start + BLOCK_SYMBOLS]
+        close_block = np.full((len(calendar), len(block_paths)), np.nan, dtype=DTYPE)
+        volume_block = np.full_like(close_block, np.nan)
+        for j, (symbol, day, c, v, error) in enumerate(pool.map(load_series, block_paths, chunksize=16)):
+            if error is not None or len(day) == 0:
+                state[symbol] = None
+                if error is not None:
+                    retry.append(symbol)
+                continue
+            rows = np.searchsorted(calendar, day)
+            close_block[rows, j] = c
+            volume_block[rows, j] = v
+            state[symbol] = [int(day[0]), int(day[-1]), len(day)]
+        close[:, block_start:block_start + len(block_paths)] = close_block
+        volume[:, block_start:block_start + len(block_paths)] = volume_block
+        print(f"[09] Progress: {min(block_start + BLOCK_SYMBOLS, len(symbols))}/{len(symbols)} tickers")
+
+    close.flush()
+    volume.flush()
+    del close, volume
+    os.replace(close_path + ".tmp", close_path)
+    os.replace(volume_path + ".tmp", volume_path)
+    return calendar, state, retry
+
+
+def load_tail(job: tuple[str, list | None]) -> tuple:
+    """Process-pool worker for incremental updates.
+
+    Returns (symbol, day, close, volume, new state, full, error). When the
+    bars before the recorded last date are unchanged only the tail from that
+    date on is returned (full=False); otherwise the whole series.
+    """
+    json_path, recorded = job
+    symbol, day, c, v, error = load_series(json_path)
+    if error is not None:
+        return symbol, None, None, None, None, True, error
+    if len(day) == 0:
+        return symbol, day, c, v, None, True, None
+    state = [int(day[0]), int(day[-1]), len(day)]
+    if recorded is not None:
+        first_day, last_day, rows = recorded
+        start = int(np.searchsorted(day, last_day, side="left"))
+        if int(day[0]) == first_day and start == rows - 1 and start < len(day) and day[start] == last_day:
+            return symbol, day[start:], c[start:], v[start:], state, False, None
+    return symbol, day, c, v, state, True, None
+
+
+def incremental_update(symbols: list[str], meta: dict, pool: ProcessPoolExecutor) -> tuple[list[str], int, int, int, int] | None:
+    """Apply changed, added and removed ticker files to the panel.
+
+    Returns (column order, tickers updated, new days, tickers added, tickers
+    removed), or None if a full build is needed.
+    """
+    calendar = np.load(os.path.join(PANEL_DIR, "dates.npy"))
+    close_path = os.path.join(PANEL_DIR, "close.npy")
+    volume_path = os.path.join(PANEL_DIR, "volume.npy")
+    columns = load_symbols()
+    height, capacity = np.load(close_path, mmap_mode="r").shape
+    if height != len(calendar) or capacity < len(columns) or sorted(meta["symbols"]) != sorted(columns):
+        print("[09] Panel files out of step with the calendar (interrupted update?)")
+        return None
+
+    if len(calendar) == 0:
+        return None
+
+    current = set(symbols)
+    removed = [symbol for symbol in columns if symbol not in current]
+    added = [symbol for symbol in symbols if symbol not in meta["symbols"]]
+
+    built_ns = meta["built_ns"]
+    retry = set(meta.get("retry", []))
+    jobs = []
+    for symbol in symbols:
+        json_path = os.path.join(OUTPUT_DIR, f"{symbol}.json")
+        if symbol not in meta["symbols"]:
+            jobs.append((json_path, None))
+        elif symbol in retry or series_stat(json_path)[1] > built_ns:
+            jobs.append((json_path, meta["symbols"][symbol]))
+    print(f"[09] {len(jobs)} ticker files changed since the last build ({len(added)} added, {len(removed)} removed)")
+
+    updates = []
+    meta["retry"] = []
+    for symbol, day, c, v, state, full, error in pool.map(load_tail, jobs, chunksize=64):
+        if error is not None:
+            # Picked up again on the next run even if the file is not touched
+            print(f"  Error reading {symbol}: {error}")
+            meta["retry"].append(symbol)
+            meta["symbols"].setdefault(symbol, None)
+            continue
+        updates.append((symbol, day, c, v, full))
+        meta["symbols"][symbol] = state
+
+    last_day = calendar[-1]
+    new_days = np.unique(np.concatenate([day[day > last_day] for _, day, _, _, _ in updates] or [np.empty(0, np.int32)]))
+    for _, day, _, _, _ in updates:
+        old_days = day[day <= last_day]
+        rows = np.searchsorted(calendar, old_days)
+        if np.any(rows >= len(calendar)) or np.any(calendar[np.minimum(rows, len(calendar) - 1)] != old_days):
+            print("[09] New bars on dates missing from the calendar")
+            return None
+
+    # The matrices are modified in place from here on: without meta.json an
+    # interrupted update is followed by a full build
+    os.remove(os.path.join(PANEL_DIR, "meta.json"))
+
+    if removed:
+        # Compact: the last kept columns move into the removed tickers' slots
+        # and the freed columns at the end become spare
+        kept = len(columns) - len(removed)
+        holes = [j for j in range(kept) if columns[j] not in current]
+        movers = [j for j in range(kept, len(columns)) if columns[j] in current]
+        for path in (close_path, volume_path):
+            matrix = np.load(path, mmap_mode="r+")
+            move_columns(matrix, movers, holes, list(range(kept, len(columns))))
+            matrix.flush()
+            del matrix
+        for hole, mover in zip(holes, movers):
+            columns[hole] = columns[mover]
+        del columns[kept:]
+        for symbol in removed:
+            del meta["symbols"][symbol]
+
+    if len(columns) + len(added) > capacity:
+        widen_matrix(close_path, len(columns) + len(added) + SPARE_COLUMNS)
+        widen_matrix(volume_path, len(columns) + len(added) + SPARE_COLUMNS)
+    # New tickers take over spare columns, which are NaN-filled
+    columns.extend(added)
+
+    calendar = np.concatenate([calendar, new_days]).astype(np.int32)
+    if len(new_days):
+        close = grow_matrix(close_path, len(new_days))
+        volume = grow_matrix(volume_path, len(new_days))
+    else:
+        close = np.load(close_path, mmap_mode="r+")
+        volume = np.load(volume_path, mmap_mode="r+")
+
+    positions = {symbol: i for i, symbol in enumerate(columns)}
+    for symbol, day, c, v, full in updates:
+        j = positions[symbol]
+        rows = np.searchsorted(calendar, day)
+        if full:
+            # Whole series: clear the column first so removed bars disappear
+            close[:, j] = np.nan
+            volume[:, j] = np.nan
+        close[rows, j] = c
+        volume[rows, j] = v
+
+    close.flush()
+    volume.flush()
+    meta["calendar"] = calendar
+    return columns, len(updates), len(new_days), len(added), len(removed)
+
+
+def build_panel(full: bool = False, workers: int | None = None):
+    if not os.path.exists(OUTPUT_DIR):
+        print("[09] ERROR: No ticker data directory found.")
+        return
+
+    symbols = sorted(scan_series(OUTPUT_DIR))
+    started_ns = time.time_ns()
+
+    meta = None if full else load_meta()
+    if meta is not None and meta.get("version") != META_VERSION:
+        print("[09] Panel format changed, rebuilding the panel")
+        meta = None
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        result = None
+        if meta is not None:
+            result = incremental_update(symbols, meta, pool)
+            if result is not None:
+                symbols = result[0]
+                calendar = meta.pop("calendar")
+                print(f"[09] Updated {result[1]} tickers ({result[3]} added, {result[4]} removed), "
+                      f"{result[2]} new trading days")
+        if result is None:
+            print(f"[09] Building panel for {len(symbols)} tickers...")
+            calendar, state, retry = full_build(symbols, pool)
+            meta = {"version": META_VERSION, "symbols": state, "retry": retry}
+
+    meta["built_ns"] = started_ns
+    save_sidecars(PANEL_DIR, calendar, symbols, meta)
+
+    size_mb = sum(os.path.getsize(os.path.join(PANEL_DIR, name)) for name in ("close.npy", "volume.npy")) / 1024 / 1024
+    print(f"[09] Panel complete: {len(calendar)} days x {len(symbols)} tickers, {size_mb:.0f} MB")
+
+
+if __name__ == "__main__":
+    build_panel(full="--full" in sys.argv[1:])
@@ -0,0 +1,226 @@
+from __future__ import annotations
+
+"""
+Step 10: Write pre-compressed .gz and .br siblings for every JSON file under
+public/data (ticker files, manifest, search index, stats, aggregates,
+shards, analytics), so static hosts can serve them without compressing on
+the fly (nginx gzip_static/brotli_static, S3/CloudFront with
+Content-Encoding, etc.).
+
+Each sibling gets its source's mtime. A file is recompressed only when a
+sibling is missing or its mtime differs from the source's, which pairs with
+writer.py leaving unchanged files untouched. Siblings of deleted files and
+of files now under MIN_SIZE are removed, and so are siblings that would not
+be smaller than the source; such a skip is recorded in
+raw/compress_skipped.json with the source's size and mtime, so the file is
+not compressed again until it changes.
+
+Brotli needs the optional `brotli` package; without it only .gz is written.
+A summary per directory (ratios, time spent) is printed and saved to
+raw/compress_report.json.
+
+Usage:
+  python 10_compress.py                 # incremental
+  python 10_compress.py --full          # recompress everything
+  python 10_compress.py --brotli-quality 11 --workers 8
+"""
+
+import argparse
+import gzip
+import json
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+import paths
+from writer import OutputWriter
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+DATA_DIR = paths.DATA_DIR
+REPORT_PATH = os.path.join(paths.RAW_DIR, "compress_report.json")
+# path under public/data -> {ext: [source size, source mtime_ns]} for siblings not worth writing
+SKIPPED_PATH = os.path.join(paths.RAW_DIR, "compress_skipped.json")
+
+GZIP_LEVEL = 9
+# 11 is the maximum but several times slower; ticker files change daily
+BROTLI_QUALITY = 9
+# Below this a compressed copy saves less than a packet
+MIN_SIZE = 512
+
+
+def load_skipped() -> dict[str, dict[str, list[int]]]:
+    if not os.path.exists(SKIPPED_PATH):
+        return {}
+    with open(SKIPPED_PATH, "r") as f:
+        return json.load(f)
+
+
+def compress_file(job: tuple[str, list[str], int, int]) -> tuple[str, int, int, dict[str, int], float, str | None]:
+    """Process-pool worker: (path, source bytes, source mtime_ns, {ext: compressed bytes}, seconds, error).
+
+    A format missing from the sizes was skipped because it would not be smaller.
+    """
+    path, formats, gzip_level, brotli_quality = job
+    start = time.perf_counter()
+    sizes = {}
+    try:
+        # Before the read, so a concurrent rewrite leaves a stale mtime rather than a wrong skip
+        st = os.stat(path)
+        with open(path, "rb") as f:
+            data = f.read()
+        for ext in formats:
+            if ext == ".gz":
+                payload = gzip.compress(data, compresslevel=gzip_level, mtime=0)
+            else:
+                payload = brotli.compress(data, quality=brotli_quality)
+
+            sibling = path + ext
+            if len(payload) >= len(data):
+                if os.path.exists(sibling):
+                    os.remove(sibling)
+                continue
+            tmp_path = f"{sibling}.tmp{os.getpid()}"
+            with open(tmp_path, "wb") as f:
+                f.write(payload)
+            os.utime(tmp_path, ns=(st.st_atime_ns, st.st_mtime_ns))
+            os.replace(tmp_path, sibling)
+            sizes[ext] = len(payload)
+        return path, len(data), st.st_mtime_ns, sizes, time.perf_counter() - start, None
+    except Exception as e:
+        return path, 0, 0, sizes, time.perf_counter() - start, str(e)
+
+
+def group_of(path: str) -> str:
+    """Report bucket: the first directory under public/data, or "(root)"."""
+    rel = os.path.relpath(path, DATA_DIR)
+    return rel.split(os.sep, 1)[0] if os.sep in rel else "(root)"
+
+
+def scan(formats: list[str], full: bool, skipped: dict) -> tuple[list[str], int, int]:
+    """(files to compress, up-to-date files, orphaned or stale siblings removed).
+
+    Entries of `skipped` whose file is gone (or now below MIN_SIZE) are dropped from it.
+    """
+    todo = []
+    fresh = removed = 0
+    seen = set()
+    for root, _, files in os.walk(DATA_DIR):
+        names = set(files)
+        for name in files:
+            path = os.path.join(root, name)
+            if name.endswith((".gz", ".br")):
+                if name[:-3] not in names:
+                    os.remove(path)
+                    removed += 1
+                continue
+            if not name.endswith(".json"):
+                continue
+
+            st = os.stat(path)
+            if st.st_size < MIN_SIZE:
+                # Shrunk below the threshold: older siblings would be served stale
+                for ext in (".gz", ".br"):
+                    if name + ext in names:
+                        os.remove(path + ext)
+                        removed += 1
+                continue
+            rel = os.path.relpath(path, DATA_DIR)
+            skips = skipped.get(rel, {})
+            if skips:
+                seen.add(rel)
+            stale = full
+            for ext in formats:
+                sibling = path + ext
+                if stale or skips.get(ext) == [st.st_size, st.st_mtime_ns]:
+                    continue
+                if name + ext not in names or os.stat(sibling).st_mtime_ns != st.st_mtime_ns:
+                    stale = True
+            if stale:
+                todo.append(path)
+            else:
+                fresh += 1
+    for rel in set(skipped) - seen:
+        del skipped[rel]
+    return todo, fresh, removed
+
+
+def compress_all(full: bool = False, workers: int | None = None,
+                 gzip_level: int = GZIP_LEVEL, brotli_quality: int = BROTLI_QUALITY):
+    if not os.path.exists(DATA_DIR):
+        print("[10] ERROR: No data directory found.")
+        return
+
+    formats = [".gz"]
+    if brotli is not None:
+        formats.append(".br")
+    else:
+        print("[10] brotli not installed (pip install brotli); writing .gz only")
+
+    start = time.time()
+    skipped = load_skipped()
+    todo, fresh, removed = scan(formats, full, skipped)
+    print(f"[10] {len(todo)} files to compress, {fresh} up to date, {removed} orphaned or stale siblings removed")
+
+    groups = defaultdict(lambda: {"files": 0, "bytes": 0, ".gz": 0, ".br": 0, "cpu_s": 0.0})
+    errors = 0
+    jobs = [(path, formats, gzip_level, brotli_quality) for path in sorted(todo)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for i, (path, size, mtime_ns, sizes, seconds, error) in enumerate(pool.map(compress_file, jobs, chunksize=16)):
+            if error is not None:
+                errors += 1
+                if errors <= 5:
+                    print(f"  Error compressing {os.path.relpath(path, DATA_DIR)}: {error}")
+                continue
+            skips = {ext: [size, mtime_ns] for ext in formats if ext not in sizes}
+            rel = os.path.relpath(path, DATA_DIR)
+            if skips:
+                skipped[rel] = skips
+            else:
+                skipped.pop(rel, None)
+            group = groups[group_of(path)]
+            group["files"] += 1
+            group["bytes"] += size
+            group["cpu_s"] += seconds
+            for ext in formats:
+                # A skipped sibling (not smaller) is served uncompressed
+                group[ext] += sizes.get(ext, size)
+            if (i + 1) % 2000 == 0:
+                print(f"[10] Progress: {i + 1}/{len(jobs)} files")
+
+    elapsed = time.time() - start
+    print(f"[10] {'directory':<12} {'files':>7} {'source MB':>10} " + " ".join(f"{ext + ' ratio':>9}" for ext in formats) + f" {'cpu s':>8}")
+    for name in sorted(groups):
+        g = groups[name]
+        ratios = " ".join(f"{g[ext] / g['bytes']:>9.3f}" if g["bytes"] else f"{'-':>9}" for ext in formats)
+        print(f"[10] {name:<12} {g['files']:>7} {g['bytes'] / 1024 / 1024:>10.1f} {ratios} {g['cpu_s']:>8.1f}")
+
+    report = {
+        "finished": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "wall_s": round(elapsed, 2),
+        "formats": formats,
+        "compressed": len(todo) - errors,
+        "up_to_date": fresh,
+        "orphans_removed": removed,
+        "errors": errors,
+        "groups": {name: dict(g, cpu_s=round(g["cpu_s"], 2)) for name, g in sorted(groups.items())},
+    }
+    os.makedirs(os.path.dirname(REPORT_PATH), exist_ok=True)
+    OutputWriter().write_json(SKIPPED_PATH, dict(sorted(skipped.items())))
+    with open(REPORT_PATH, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"[10] Compression complete in {elapsed:.1f}s: {len(todo) - errors} files, {errors} errors")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write .gz/.br siblings for every JSON file under public/data")
+    parser.add_argument("--full", action="store_true", help="recompress every file")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--gzip-level", type=int, default=GZIP_LEVEL)
+    parser.add_argument("--brotli-quality", type=int, default=BROTLI_QUALITY)
+    args = parser.parse_args()
+    compress_all(args.full, args.workers, args.gzip_level, args.brotli_quality)
@@ -0,0 +1,310 @@
+from __future__ import annotations
+
+"""
+Universe-wide analytics over the date-aligned panel (see panel.py / step 09).
+
+Writes to public/data/analytics/:
+
+  summary.json      {"updated", "from", "to", "fields", "tickers": {SYMBOL: [...]}}
+                    per-ticker return, CAGR, volatility (full period and the
+                    21/63-day windows ending at the ticker's last bar), max
+                    drawdown with its peak and trough dates, and the drawdown
+                    at the last bar
+  correlation.npy   float32[n, n] correlation of daily returns
+  correlation.json  {"symbols", "from", "to"} for correlation.npy
+
+Everything is computed with NumPy on blocks of panel columns spread over a
+process pool. Blocks are sized so that each worker's working set stays under
+its share of --memory-mb. Correlation first builds standardized returns for
+the chosen tickers, then computes the matrix tile by tile. Gaps are filled
+with the ticker's mean return, which keeps the matrix positive semi-definite
+at the cost of pulling sparse pairs slightly towards zero.
+
+Usage:
+  python analytics.py                              # all tickers, full history
+  python analytics.py --from 2015-01-01 --corr-top 1000
+  python analytics.py --corr AAPL MSFT NVDA --memory-mb 512 --workers 4
+"""
+
+import argparse
+import json
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+from numpy.lib import format as npy
+
+import paths
+from panel import PANEL_DIR, Panel
+
+ANALYTICS_DIR = os.path.join(paths.DATA_DIR, "analytics")
+
+TRADING_DAYS = 252
+
+FIELDS = [
+    "first", "last", "days",
+    "total_return", "cagr",
+    "vol", "vol_21d", "vol_63d",
+    "max_drawdown", "max_dd_peak", "max_dd_trough", "drawdown",
+]
+
+# float64 arrays of panel height held at once per column while summarizing
+ARRAYS_PER_COLUMN = 8
+
+
+def ffill(a: np.ndarray) -> np.ndarray:
+    """Forward-fill NaNs down each column."""
+    idx = np.where(np.isnan(a), 0, np.arange(len(a))[:, None])
+    np.maximum.accumulate(idx, axis=0, out=idx)
+    return a[idx, np.arange(a.shape[1])]
+
+
+def daily_returns(close: np.ndarray) -> np.ndarray:
+    """Close-to-close returns between consecutive bars; NaN where a column has no bar."""
+    filled = ffill(close)
+    returns = np.full_like(filled, np.nan)
+    returns[1:] = filled[1:] / filled[:-1] - 1
+    returns[np.isnan(close)] = np.nan
+    return returns
+
+
+def rolling_vol(returns: np.ndarray, window: int, min_periods: int | None = None) -> np.ndarray:
+    """Annualized rolling standard deviation of returns over `window` rows."""
+    min_periods = min_periods or window
+    valid = ~np.isnan(returns)
+    r = np.where(valid, returns, 0.0)
+
+    def window_sum(x):
+        c = np.cumsum(x, axis=0)
+        c[window:] = c[window:] - c[:-window]
+        return c
+
+    n = window_sum(valid.astype(np.float64))
+    s = window_sum(r)
+    ss = window_sum(r * r)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        var = (ss - s * s / n) / (n - 1)
+    var[n < max(min_periods, 2)] = np.nan
+    return np.sqrt(np.maximum(var, 0)) * np.sqrt(TRADING_DAYS)
+
+
+def drawdowns(close: np.ndarray) -> np.ndarray:
+    """Drawdown from the running peak (0 at a new high, -0.25 = 25% below it)."""
+    filled = ffill(close)
+    peak = np.fmax.accumulate(filled, axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return filled / peak - 1
+
+
+def summarize(close: np.ndarray, dates: np.ndarray) -> list[list | None]:
+    """One FIELDS row per column of `close` (None for columns without bars)."""
+    returns = daily_returns(close)
+    # Windows may miss a few calendar rows (other exchanges' sessions, halts)
+    vol_21 = rolling_vol(returns, 21, min_periods=15)
+    vol_63 = rolling_vol(returns, 63, min_periods=45)
+    dd = drawdowns(close)
+    valid = ~np.isnan(close)
+
+    rows = []
+    for j in range(close.shape[1]):
+        present = np.flatnonzero(valid[:, j])
+        if len(present) == 0:
+            rows.append(None)
+            continue
+        first, last = present[0], present[-1]
+        start, end = close[first, j], close[last, j]
+        years = (dates[last] - dates[first]) / 365.25
+        total = end / start - 1 if start > 0 else np.nan
+        cagr = (end / start) ** (1 / years) - 1 if start > 0 and end > 0 and years >= 1 else np.nan
+        col_returns = returns[present[1:], j]
+        vol = np.std(col_returns, ddof=1) * np.sqrt(TRADING_DAYS) if len(col_returns) > 1 else np.nan
+
+        col_dd = dd[first:last + 1, j]
+        trough = first + int(np.nanargmin(col_dd))
+        peak = first + int(np.nanargmax(close[first:trough + 1, j]))
+
+        rows.append([
+            _date(dates[first]), _date(dates[last]), len(present),
+            _round(total), _round(cagr),
+            _round(vol), _round(vol_21[last, j]), _round(vol_63[last, j]),
+            _round(col_dd[trough - first]), _date(dates[peak]), _date(dates[trough]),
+            _round(dd[last, j]),
+        ])
+    return rows
+
+
+def _round(value: float) -> float | None:
+    return None if not np.isfinite(value) else round(float(value), 6)
+
+
+def _date(day: int) -> str:
+    return str(np.datetime64(int(day), "D"))
+
+
+def summarize_block(job: tuple[str, int, int, int, int]) -> list[tuple[str, list | None]]:
+    """Process-pool worker: summary rows for panel columns [j0, j1) over rows [lo, hi)."""
+    panel_dir, lo, hi, j0, j1 = job
+    panel = Panel(panel_dir)
+    close = np.asarray(panel.close[lo:hi, j0:j1], dtype=np.float64)
+    return list(zip(panel.symbols[j0:j1], summarize(close, panel.dates[lo:hi])))
+
+
+def standardized_returns(close: np.ndarray, min_coverage: float) -> tuple[np.ndarray, np.ndarray]:
+    """(Z, kept column mask): unit-norm, mean-filled returns so Z.T @ Z is the correlation."""
+    returns = daily_returns(close)[1:]
+    valid = ~np.isnan(returns)
+    keep = (valid.mean(axis=0) >= min_coverage) & (valid.sum(axis=0) >= 2)
+    returns, valid = returns[:, keep], valid[:, keep]
+
+    mean = np.nanmean(returns, axis=0)
+    z = np.where(valid, returns - mean, 0.0)
+    norm = np.sqrt((z * z).sum(axis=0))
+    keep_norm = norm > 0
+    z = z[:, keep_norm] / norm[keep_norm]
+    keep[np.flatnonzero(keep)[~keep_norm]] = False
+    return z, keep
+
+
+def correlation_tile(job: tuple[str, str, int, int, int]) -> int:
+    """Process-pool worker: fill the (i, j) tile of the correlation matrix and its mirror."""
+    z_path, out_path, tile, i0, j0 = job
+    z = np.load(z_path, mmap_mode="r")
+    out = np.load(out_path, mmap_mode="r+")
+    zi = np.asarray(z[:, i0:i0 + tile])
+    zj = zi if i0 == j0 else np.asarray(z[:, j0:j0 + tile])
+    block = np.clip(zi.T @ zj, -1, 1).astype(np.float32)
+    out[i0:i0 + tile, j0:j0 + tile] = block
+    if i0 != j0:
+        out[j0:j0 + tile, i0:i0 + tile] = block.T
+    out.flush()
+    return block.size
+
+
+def write_json(path: str, obj):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        f.write(json.dumps(obj, separators=(",", ":")))
+    os.replace(tmp_path, path)
+
+
+def run_summary(panel: Panel, panel_dir: str, lo: int, hi: int, budget: int, workers: int | None):
+    bytes_per_column = max(hi - lo, 1) * 8 * ARRAYS_PER_COLUMN
+    cols = max(1, min(len(panel.symbols), budget // bytes_per_column))
+    jobs = [(panel_dir, lo, hi, j0, min(j0 + cols, len(panel.symbols))) for j0 in range(0, len(panel.symbols), cols)]
+    print(f"[analytics] Summarizing {len(panel.symbols)} tickers x {hi - lo} days in {len(jobs)} blocks of {cols}")
+
+    tickers = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for rows in pool.map(summarize_block, jobs):
+            for symbol, row in rows:
+                if row is not None:
+                    tickers[symbol] = row
+
+    write_json(os.path.join(ANALYTICS_DIR, "summary.json"), {
+        "updated": datetime.now().strftime("%Y-%m-%d"),
+        "from": _date(panel.dates[lo]),
+        "to": _date(panel.dates[hi - 1]),
+        "fields": FIELDS,
+        "tickers": tickers,
+    })
+    print(f"[analytics] Summary written for {len(tickers)} tickers")
+
+
+def pick_correlation_symbols(panel: Panel, lo: int, hi: int, symbols: list[str] | None, top: int) -> list[int]:
+    """Column indices: the given symbols, or the `top` most traded by dollar volume in the window."""
+    if symbols:
+        missing = [s for s in symbols if s not in panel.symbols]
+        if missing:
+            print(f"[analytics] Not in the panel, skipped: {', '.join(missing)}")
+        return sorted(panel.column(s) for s in symbols if s not in missing)
+
+    dollar_volume = np.zeros(len(panel.symbols))
+    step = 256
+    for start in range(lo, hi, step):
+        block = np.asarray(panel.close[start:min(start + step, hi)], dtype=np.float64)
+        block *= panel.volume[start:min(start + step, hi)]
+        dollar_volume += np.nansum(block, axis=0)
+    return sorted(np.argsort(-dollar_volume)[:top].tolist())
+
+
+def run_correlation(panel: Panel, lo: int, hi: int, columns: list[int], min_coverage: float, budget: int, workers: int | None):
+    close = np.asarray(panel.close[lo:hi, columns], dtype=np.float64)
+    z, keep = standardized_returns(close, min_coverage)
+    del close
+    symbols = [panel.symbols[c] for c, k in zip(columns, keep) if k]
+    n = len(symbols)
+    print(f"[analytics] Correlating {n} tickers over {hi - lo} days ({len(columns) - n} below coverage)")
+    if n == 0:
+        return
+
+    # Per worker: two float64 tiles of Z (16 * rows * t bytes) plus the float64
+    # product and its float32 copy (12 * t * t bytes) must fit in the budget
+    rows = z.shape[0]
+    tile = int((np.sqrt(256 * rows * rows + 48 * budget) - 16 * rows) / 24)
+    tile = max(64, min(n, tile))
+
+    scratch = tempfile.mkdtemp(prefix="mh-analytics-", dir=paths.RAW_DIR)
+    try:
+        z_path = os.path.join(scratch, "z.npy")
+        np.save(z_path, z)
+        del z
+        out_path = os.path.join(ANALYTICS_DIR, "correlation.npy")
+        npy.open_memmap(out_path + ".tmp.npy", mode="w+", dtype=np.float32, shape=(n, n)).flush()
+
+        jobs = [
+            (z_path, out_path + ".tmp.npy", tile, i0, j0)
+            for i0 in range(0, n, tile)
+            for j0 in range(i0, n, tile)
+        ]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for _ in pool.map(correlation_tile, jobs):
+                pass
+        os.replace(out_path + ".tmp.npy", out_path)
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    write_json(os.path.join(ANALYTICS_DIR, "correlation.json"), {
+        "symbols": symbols,
+        "from": _date(panel.dates[lo]),
+        "to": _date(panel.dates[hi - 1]),
+    })
+    print(f"[analytics] Correlation matrix written: {n} x {n}, {len(jobs)} tiles of {tile}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Universe-wide analytics over the date-aligned panel")
+    parser.add_argument("--from", dest="start", help="first date (YYYY-MM-DD, default: panel start)")
+    parser.add_argument("--to", dest="end", help="last date (YYYY-MM-DD, default: panel end)")
+    parser.add_argument("--panel-dir", default=PANEL_DIR)
+    parser.add_argument("--memory-mb", type=int, default=1024, help="working-set ceiling across all workers")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--corr", nargs="+", metavar="SYMBOL", help="correlate these tickers")
+    parser.add_argument("--corr-top", type=int, default=500, help="otherwise correlate the N most traded (0 to skip)")
+    parser.add_argument("--corr-days", type=int, default=TRADING_DAYS, help="correlation window ending at --to")
+    parser.add_argument("--min-coverage", type=float, default=0.9, help="share of window days a ticker must trade")
+    args = parser.parse_args()
+
+    panel = Panel(args.panel_dir)
+    lo = panel.row(args.start) if args.start else 0
+    hi = int(np.searchsorted(panel.dates, np.datetime64(args.end, "D").astype(np.int64), side="right")) if args.end else len(panel.dates)
+    if hi <= lo:
+        print("[analytics] ERROR: empty date range")
+        return
+
+    workers = args.workers or os.cpu_count() or 1
+    budget = args.memory_mb * 1024 * 1024 // workers
+    os.makedirs(ANALYTICS_DIR, exist_ok=True)
+
+    run_summary(panel, args.panel_dir, lo, hi, budget, workers)
+
+    if args.corr or args.corr_top:
+        corr_lo = max(lo, hi - args.corr_days - 1)
+        columns = pick_correlation_symbols(panel, corr_lo, hi, args.corr, args.corr_top)
+        run_correlation(panel, corr_lo, hi, columns, args.min_coverage, budget, workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+"""
+Micro-benchmark: vectorized frame_to_rows() vs the old per-row iterrows() loop.
+
+Usage:
+  python bench_convert.py                 # 15,000 bars x 5 repeats
+  python bench_convert.py --bars 5000 --repeat 10
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from convert import frame_to_rows
+
+
+def legacy_rows(frame) -> list[list]:
+    """The conversion loop previously copied into steps 02, 03 and 05."""
+    frame = frame.dropna(subset=["Open", "Close"])
+    rows = []
+    for idx, row in frame.iterrows():
+        ts = int(idx.timestamp())
+        o = round(float(row["Open"]), 6)
+        h = round(float(row["High"]), 6)
+        l = round(float(row["Low"]), 6)
+        c = round(float(row["Close"]), 6)
+        v = int(row["Volume"]) if str(row["Volume"]) != "nan" else 0
+        rows.append([ts, o, h, l, c, v])
+    rows.sort(key=lambda r: r[0])
+    return rows
+
+
+def make_frame(bars: int, seed: int = 0) -> pd.DataFrame:
+    """Random-walk OHLCV frame shaped like a yfinance history() result."""
+    rng = np.random.default_rng(seed)
+    index = pd.bdate_range(end="2025-01-03", periods=bars, tz="America/New_York")
+    close = 50 * np.exp(np.cumsum(rng.normal(0, 0.02, bars)))
+    open_ = close * (1 + rng.normal(0, 0.01, bars))
+    high = np.maximum(open_, close) * (1 + rng.uniform(0, 0.02, bars))
+    low = np.minimum(open_, close) * (1 - rng.uniform(0, 0.02, bars))
+    volume = rng.integers(1_000, 10_000_000, bars).astype(np.float64)
+    volume[rng.random(bars) < 0.01] = np.nan
+    return pd.DataFrame(
+        {"Open": open_, "High": high, "Low": low, "Close": close, "Volume": volume},
+        index=index,
+    )
+
+
+def best_of(fn, frame, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(frame)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark frame_to_rows against the iterrows loop")
+    parser.add_argument("--bars", type=int, default=15_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    frame = make_frame(args.bars)
+
+    old, new = legacy_rows(frame), frame_to_rows(frame)
+    mismatched = sum(
+        1 for a, b in zip(old, new)
+        if a[0] != b[0] or a[5] != b[5] or any(abs(x - y) > 1e-6 for x, y in zip(a[1:5], b[1:5]))
+    )
+    if len(old) != len(new) or mismatched:
+        print(f"[bench] WARNING: outputs differ ({len(old)} vs {len(new)} rows, {mismatched} mismatched)")
+
+    legacy_s = best_of(legacy_rows, frame, args.repeat)
+    vector_s = best_of(frame_to_rows, frame, args.repeat)
+
+    print(f"[bench] {args.bars} bars, best of {args.repeat}")
+    print(f"[bench] iterrows loop:  {legacy_s * 1000:9.2f} ms  ({args.bars / legacy_s:,.0f} rows/s)")
+    print(f"[bench] frame_to_rows:  {vector_s * 1000:9.2f} ms  ({args.bars / vector_s:,.0f} rows/s)")
+    print(f"[bench] speedup: {legacy_s / vector_s:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
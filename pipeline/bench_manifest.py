@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+"""
+Benchmark: manifest metadata extraction, full json.load vs head/tail reads.
+
+Usage:
+  python bench_manifest.py                       # 1,000 synthetic files
+  python bench_manifest.py --tickers 5000 --max-bars 15000
+  python bench_manifest.py --dir ../public/data/tickers   # real data, read-only
+"""
+
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from convert import frame_to_rows
+from providers import SyntheticProvider
+from tickerfile import scan_meta
+
+
+def legacy_meta(path: str):
+    """What 04_generate_manifest.py used to do for every file."""
+    with open(path, "r") as f:
+        data = json.load(f)
+    if not data.get("data"):
+        return path, None, None
+    return path, {"first_ts": data["data"][0][0], "last_ts": data["data"][-1][0]}, None
+
+
+def write_universe(out_dir: str, tickers: int, min_bars: int, max_bars: int):
+    provider = SyntheticProvider(n_symbols=tickers, min_bars=min_bars, max_bars=max_bars, empty_rate=0)
+    for t in provider.fetch_symbol_lists():
+        rows = frame_to_rows(provider.history(t["symbol"]))
+        with open(os.path.join(out_dir, f"{t['symbol']}.json"), "w") as f:
+            f.write(json.dumps({"symbol": t["symbol"], "data": rows}, separators=(",", ":")))
+
+
+def timed(label: str, fn, filepaths: list[str]):
+    start = time.perf_counter()
+    results = list(fn(filepaths))
+    elapsed = time.perf_counter() - start
+    print(f"[bench] {label:<22} {elapsed:8.3f} s  ({len(filepaths) / elapsed:,.0f} files/s)")
+    return elapsed, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark manifest metadata extraction")
+    parser.add_argument("--dir", help="existing ticker directory to scan (default: generate one)")
+    parser.add_argument("--tickers", type=int, default=1000)
+    parser.add_argument("--min-bars", type=int, default=5000)
+    parser.add_argument("--max-bars", type=int, default=15000)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    tmp_dir = None
+    ticker_dir = args.dir
+    if ticker_dir is None:
+        tmp_dir = ticker_dir = tempfile.mkdtemp(prefix="mh-bench-manifest-")
+        print(f"[bench] Writing {args.tickers} synthetic ticker files...")
+        write_universe(ticker_dir, args.tickers, args.min_bars, args.max_bars)
+
+    try:
+        filepaths = sorted(
+            os.path.join(ticker_dir, f) for f in os.listdir(ticker_dir) if f.endswith(".json")
+        )
+        total_mb = sum(os.path.getsize(p) for p in filepaths) / 1024 / 1024
+        print(f"[bench] {len(filepaths)} files, {total_mb:.0f} MB")
+
+        legacy_s, legacy = timed("json.load (old)", lambda ps: map(legacy_meta, ps), filepaths)
+        serial_s, serial = timed("head/tail, serial", lambda ps: map(scan_meta, ps), filepaths)
+
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            pooled_s, pooled = timed(
+                "head/tail, process pool",
+                lambda ps: pool.map(scan_meta, ps, chunksize=256),
+                filepaths,
+            )
+
+        if not (legacy == serial == pooled):
+            print("[bench] WARNING: results differ between implementations")
+
+        print(f"[bench] speedup: {legacy_s / serial_s:.1f}x serial, {legacy_s / pooled_s:.1f}x pooled")
+    finally:
+        if tmp_dir:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
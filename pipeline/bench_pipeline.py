@@ -0,0 +1,218 @@
+from __future__ import annotations
+
+"""
+End-to-end pipeline benchmark against a synthetic universe.
+
+Generates a deterministic universe with the synthetic provider (no network)
+and runs the pipeline stages against it, each in a fresh process so peak RSS
+is per stage:
+
+  02_download  — fetch, convert and write every ticker file
+  03_gap_fill  — top up files that are `--gap-days` business days stale
+  04_manifest  — build manifest.json from the ticker files
+
+Prints a machine-readable JSON report (tickers/s, rows/s, bytes written, peak
+RSS, wall time per stage) so runs can be compared between commits.
+
+Usage:
+  python bench_pipeline.py --tickers 1000
+  python bench_pipeline.py --tickers 11000 --min-bars 5000 --max-bars 15000 --out bench.json
+"""
+
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+STAGES = ["02_download", "03_gap_fill", "04_manifest"]
+
+
+def io_write_bytes() -> int | None:
+    """Bytes this process has passed to write() so far (Linux only)."""
+    try:
+        with open("/proc/self/io") as f:
+            for line in f:
+                if line.startswith("wchar:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def dir_stats(path: str) -> tuple[int, int, int]:
+    """(files, rows, bytes) of the compact JSON ticker files under `path`.
+
+    Rows and bytes include the recent tail files (path/recent/, see recent.py);
+    files counts tickers, i.e. base files only.
+    """
+    files = rows = size = 0
+    for directory in (path, os.path.join(path, "recent")):
+        if not os.path.exists(directory):
+            continue
+        for entry in os.scandir(directory):
+            if not (entry.name.endswith(".json") and entry.is_file()):
+                continue
+            with open(entry.path, "rb") as f:
+                content = f.read()
+            if directory == path:
+                files += 1
+            size += len(content)
+            if b"[[" in content:
+                rows += content.count(b"],[") + 1
+    return files, rows, size
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KB on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_stage(stage: str, provider_options: dict, gap_days: int, queue):
+    """Child-process entry point: run one stage and report its metrics."""
+    # Keep stdout clean for the JSON report
+    sys.stdout = sys.stderr
+
+    from providers import SyntheticProvider
+    from run_pipeline import load_module
+
+    import paths
+
+    before_files, before_rows, before_bytes = dir_stats(paths.TICKERS_DIR)
+    wchar_start = io_write_bytes()
+    start = time.perf_counter()
+
+    if stage == "02_download":
+        # Universe as of `gap_days` business days ago, so 03 has work to do
+        import pandas as pd
+
+        as_of = (pd.Timestamp.now().normalize() - pd.offsets.BDay(gap_days)).strftime("%Y-%m-%d")
+        provider = SyntheticProvider(as_of=as_of, **provider_options)
+        step02 = load_module("02", "02_parse_stooq.py")
+        step02.download_all(concurrency=os.cpu_count() or 4, rate=0, provider=provider)
+    elif stage == "03_gap_fill":
+        provider = SyntheticProvider(**provider_options)
+        step03 = load_module("03", "03_fill_gaps_yfinance.py")
+        step03.fill_gaps(provider=provider)
+    elif stage == "04_manifest":
+        step04 = load_module("04", "04_generate_manifest.py")
+        step04.generate_manifest()
+    else:
+        raise ValueError(f"Unknown stage: {stage}")
+
+    wall = time.perf_counter() - start
+    wchar_end = io_write_bytes()
+    files, rows, size = dir_stats(paths.TICKERS_DIR)
+
+    if stage == "02_download":
+        tickers, stage_rows = files - before_files, rows - before_rows
+    elif stage == "03_gap_fill":
+        tickers, stage_rows = files, rows - before_rows
+    else:
+        tickers, stage_rows = files, rows
+
+    if wchar_start is not None and wchar_end is not None:
+        bytes_written = wchar_end - wchar_start
+    elif stage == "04_manifest":
+        bytes_written = os.path.getsize(paths.MANIFEST_PATH)
+    else:
+        bytes_written = max(0, size - before_bytes)
+
+    queue.put({
+        "stage": stage,
+        "wall_s": round(wall, 3),
+        "tickers": tickers,
+        "rows": stage_rows,
+        "tickers_per_s": round(tickers / wall, 1) if wall else None,
+        "rows_per_s": round(stage_rows / wall, 1) if wall else None,
+        "bytes_written": bytes_written,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    })
+
+
+def git_commit() -> str | None:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, check=True,
+        )
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pipeline stages on a synthetic universe")
+    parser.add_argument("--tickers", type=int, default=1000, help="universe size")
+    parser.add_argument("--min-bars", type=int, default=5000)
+    parser.add_argument("--max-bars", type=int, default=15000)
+    parser.add_argument("--gap-days", type=int, default=5, help="business days of staleness for 03")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--stages", default=",".join(STAGES), help="comma-separated subset of stages")
+    parser.add_argument("--workdir", help="directory for generated data (default: temp dir, removed after)")
+    parser.add_argument("--out", help="also write the JSON report to this file")
+    args = parser.parse_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="mh-bench-")
+    os.environ["MARKET_HISTORY_RAW_DIR"] = os.path.join(workdir, "raw")
+    os.environ["MARKET_HISTORY_DATA_DIR"] = os.path.join(workdir, "data")
+
+    from providers import SyntheticProvider
+    from run_pipeline import load_module
+
+    provider_options = {
+        "n_symbols": args.tickers,
+        "seed": args.seed,
+        "min_bars": args.min_bars,
+        "max_bars": args.max_bars,
+    }
+
+    print(f"[bench] Generating {args.tickers}-ticker universe in {workdir}", file=sys.stderr)
+    step01 = load_module("01", "01_download_stooq.py")
+    with contextlib.redirect_stdout(sys.stderr):
+        step01.download_ticker_list(SyntheticProvider(**provider_options))
+
+    ctx = multiprocessing.get_context("spawn")
+    results = []
+    try:
+        for stage in args.stages.split(","):
+            print(f"[bench] Running {stage}...", file=sys.stderr)
+            queue = ctx.Queue()
+            proc = ctx.Process(target=run_stage, args=(stage, provider_options, args.gap_days, queue))
+            proc.start()
+            proc.join()
+            if proc.exitcode != 0:
+                raise RuntimeError(f"Stage {stage} failed (exit code {proc.exitcode})")
+            results.append(queue.get())
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "universe": {k: v for k, v in vars(args).items() if k in ("tickers", "min_bars", "max_bars", "gap_days", "seed")},
+        "stages": results,
+    }
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
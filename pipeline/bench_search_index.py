@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+"""
+Benchmark: build the prefix-sharded search index and compare its payloads
+and per-query work with scanning the monolithic manifest.
+
+Usage:
+  python bench_search_index.py                    # 11,000 synthetic tickers
+  python bench_search_index.py --tickers 20000
+  python bench_search_index.py --manifest ../public/data/manifest.json   # real data, read-only
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import time
+
+from providers import SyntheticProvider
+from searchindex import FILLER_WORDS, LIMIT, build_search_index, shard_name, write_search_index
+
+
+def synthetic_manifest(tickers: int) -> dict:
+    provider = SyntheticProvider(n_symbols=tickers)
+    entries = [
+        {"s": t["symbol"], "n": t["name"], "e": t["exchange"], "from": "2000-01-03", "to": "2024-12-31", "a": True}
+        for t in provider.fetch_symbol_lists()
+    ]
+    entries.sort(key=lambda t: t["s"])
+    return {"tickers": entries, "updated": "2024-12-31"}
+
+
+def rank(ticker: dict, q: str) -> int | None:
+    """Rank of a ticker for a lowercased query, or None if it does not match."""
+    if ticker["s"].lower().startswith(q):
+        return 0
+    name = ticker["n"].lower()
+    if name.startswith(q):
+        return 1
+    pos = name.find(" " + q)
+    while pos != -1:
+        if name[pos + 1:].split(" ", 1)[0] not in FILLER_WORDS:
+            return 2
+        pos = name.find(" " + q, pos + 1)
+    return None
+
+
+def scan_search(tickers: list[dict], q: str) -> list[str]:
+    """Reference: rank the whole manifest for one query."""
+    matches = sorted((r, t["s"]) for t in tickers if (r := rank(t, q)) is not None)
+    return [s for _, s in matches[:LIMIT]]
+
+
+def shard_search(index: dict[str, list[dict]], q: str) -> list[str]:
+    """What the frontend does: one shard, filtered and ranked."""
+    shard = index.get(q[:2], [])
+    if len(q) <= 2:
+        return [t["s"] for t in shard[:LIMIT]]
+    matches = sorted((r, t["s"]) for t in shard if (r := rank(t, q)) is not None)
+    return [s for _, s in matches[:LIMIT]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the sharded search index builder")
+    parser.add_argument("--manifest", help="existing manifest.json to index (default: generate one)")
+    parser.add_argument("--tickers", type=int, default=11000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=500)
+    args = parser.parse_args()
+
+    if args.manifest:
+        with open(args.manifest, "r") as f:
+            manifest = json.load(f)
+    else:
+        manifest = synthetic_manifest(args.tickers)
+    tickers = manifest["tickers"]
+    manifest_bytes = len(json.dumps(manifest, separators=(",", ":")))
+    print(f"[bench] {len(tickers)} tickers, manifest {manifest_bytes / 1024:.0f} KB")
+
+    times = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        index = build_search_index(tickers)
+        times.append(time.perf_counter() - start)
+    print(f"[bench] build_search_index   {min(times) * 1000:8.1f} ms  (best of {args.repeat})")
+
+    out_dir = tempfile.mkdtemp(prefix="mh-bench-search-")
+    try:
+        start = time.perf_counter()
+        shards, total = write_search_index(tickers, manifest["updated"], out_dir)
+        elapsed = time.perf_counter() - start
+        print(f"[bench] write_search_index   {elapsed * 1000:8.1f} ms  ({shards} shards, {total / 1024:.0f} KB)")
+
+        sizes = sorted(
+            os.path.getsize(os.path.join(out_dir, f"{shard_name(key)}.json")) for key in index if len(key) == 2
+        )
+        index_kb = os.path.getsize(os.path.join(out_dir, "index.json")) / 1024
+        print(f"[bench] startup payload      {index_kb:8.1f} KB  (index.json vs {manifest_bytes / 1024:.0f} KB manifest)")
+        print(
+            f"[bench] 2-char shard size    median {statistics.median(sizes) / 1024:.1f} KB, "
+            f"p95 {sizes[int(len(sizes) * 0.95)] / 1024:.1f} KB, max {sizes[-1] / 1024:.1f} KB"
+        )
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
+
+    # Queries: prefixes of real symbols and name words, 1-6 characters
+    rng = random.Random(0)
+    queries = []
+    for _ in range(args.queries):
+        t = rng.choice(tickers)
+        text = t["s"] if rng.random() < 0.5 else rng.choice(t["n"].split() or [t["s"]])
+        queries.append(text[:rng.randint(1, 6)].lower())
+
+    start = time.perf_counter()
+    expected = [scan_search(tickers, q) for q in queries]
+    scan_s = time.perf_counter() - start
+    start = time.perf_counter()
+    actual = [shard_search(index, q) for q in queries]
+    shard_s = time.perf_counter() - start
+
+    print(f"[bench] full scan per query  {scan_s / len(queries) * 1000:8.3f} ms")
+    print(f"[bench] shard per query      {shard_s / len(queries) * 1000:8.3f} ms  ({scan_s / shard_s:.0f}x)")
+    mismatches = sum(a != e for a, e in zip(actual, expected))
+    if mismatches:
+        print(f"[bench] WARNING: {mismatches}/{len(queries)} queries differ from a full scan")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+from __future__ import annotations
+
+"""
+Fixed-layout columnar binary ticker files (raw/columnar/{SYMBOL}.bin).
+
+The JSON files stay the format for the web app; these are for Python-side
+consumers that want bars without parse cost. Layout (little-endian):
+
+  header   64 bytes: magic "MHCB", version u16, price width u16 (4 or 8),
+           rows u64, first day i32, last day i32, symbol (16 bytes, ASCII)
+  day      int32[rows]    days since 1970-01-01 (UTC date of the bar)
+  open     float[rows]    float32 or float64, per the header
+  high     float[rows]
+  low      float[rows]
+  close    float[rows]
+  volume   uint64[rows]
+
+Each column starts on an 8-byte boundary. open_columnar() memory-maps the
+file and returns NumPy views into it, so reading is zero-copy.
+
+A copy mirrors the ticker's base file only. The recent tail (see recent.py)
+is small and is merged in when bars are loaded, so a daily top-up leaves the
+copy alone and it is rewritten only when its base is.
+
+Usage:
+  python columnar.py          # backfill .bin files for new/changed JSON files
+"""
+
+import os
+import struct
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple
+
+import numpy as np
+
+import paths
+from recent import base_rows, tail_rows
+
+COLUMNAR_DIR = paths.COLUMNAR_DIR
+
+MAGIC = b"MHCB"
+VERSION = 1
+HEADER = struct.Struct("<4sHHQii16s24x")
+PRICE_DTYPE = "<f8"
+SECONDS_PER_DAY = 86400
+
+
+class Bars(NamedTuple):
+    symbol: str
+    day: np.ndarray
+    open: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+    volume: np.ndarray
+
+    @property
+    def timestamps(self) -> np.ndarray:
+        """Bar dates as int64 epoch seconds (UTC midnight)."""
+        return self.day.astype(np.int64) * SECONDS_PER_DAY
+
+
+def columnar_path(symbol: str) -> str:
+    return os.path.join(COLUMNAR_DIR, f"{symbol}.bin")
+
+
+def _pad8(n: int) -> int:
+    return (n + 7) & ~7
+
+
+def _layout(rows: int, price_width: int) -> list[tuple[str, str, int]]:
+    """(name, dtype, byte offset) for every column."""
+    price_dtype = "<f4" if price_width == 4 else "<f8"
+    columns = [("day", "<i4"), ("open", price_dtype), ("high", price_dtype),
+               ("low", price_dtype), ("close", price_dtype), ("volume", "<u8")]
+    layout = []
+    offset = HEADER.size
+    for name, dtype in columns:
+        layout.append((name, dtype, offset))
+        offset += _pad8(rows * np.dtype(dtype).itemsize)
+    return layout
+
+
+def encode(symbol: str, day, open_, high, low, close, volume, price_dtype: str = PRICE_DTYPE) -> bytes:
+    price_width = np.dtype(price_dtype).itemsize
+    rows = len(day)
+    header = HEADER.pack(
+        MAGIC, VERSION, price_width, rows,
+        int(day[0]) if rows else 0, int(day[-1]) if rows else 0,
+        symbol.encode("ascii")[:16],
+    )
+    parts = [header]
+    for (name, dtype, _), values in zip(_layout(rows, price_width), (day, open_, high, low, close, volume)):
+        column = np.ascontiguousarray(values, dtype=dtype).tobytes()
+        parts.append(column + b"\0" * (_pad8(len(column)) - len(column)))
+    return b"".join(parts)
+
+
+def rows_to_columns(rows: list[list]) -> tuple[np.ndarray, ...]:
+    """Compact [ts, o, h, l, c, v] rows -> (day, open, high, low, close, volume) arrays."""
+    table = np.asarray(rows, dtype=np.float64).reshape(-1, 6)
+    day = np.floor_divide(table[:, 0], SECONDS_PER_DAY).astype(np.int32)
+    volume = np.nan_to_num(table[:, 5], nan=0.0).astype(np.uint64)
+    return day, table[:, 1], table[:, 2], table[:, 3], table[:, 4], volume
+
+
+def _write_atomic(path: str, payload: bytes):
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    # A unique temp file, so concurrent writers of one symbol never share it
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def write_columnar(path: str, symbol: str, rows: list[list], price_dtype: str = PRICE_DTYPE):
+    """Write compact rows as a columnar file (atomically)."""
+    _write_atomic(path, encode(symbol, *rows_to_columns(rows), price_dtype=price_dtype))
+
+
+def open_columnar(path: str) -> Bars:
+    """Memory-map a columnar file; the returned arrays are read-only views into it."""
+    raw = np.memmap(path, dtype=np.uint8, mode="r")
+    magic, version, price_width, rows, _, _, symbol = HEADER.unpack(raw[:HEADER.size].tobytes())
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{path}: not a columnar ticker file (version {VERSION})")
+
+    columns = {}
+    for name, dtype, offset in _layout(rows, price_width):
+        size = rows * np.dtype(dtype).itemsize
+        columns[name] = raw[offset:offset + size].view(dtype)
+    return Bars(symbol=symbol.rstrip(b"\0").decode("ascii"), **columns)
+
+
+def _base_bars(json_path: str, write: bool) -> Bars:
+    """Bars of a ticker's base file, from its columnar copy when that is current.
+
+    With `write`, a missing or stale copy is rewritten from the JSON first.
+    """
+    symbol = os.path.basename(json_path)[:-len(".json")]
+    bin_path = columnar_path(symbol)
+    if os.path.exists(bin_path) and os.stat(bin_path).st_mtime_ns >= os.stat(json_path).st_mtime_ns:
+        return open_columnar(bin_path)
+    rows = base_rows(json_path)
+    if write and rows:
+        write_columnar(bin_path, symbol, rows)
+        return open_columnar(bin_path)
+    return Bars(symbol, *rows_to_columns(rows))
+
+
+def merge_tail(bars: Bars, rows: list[list]) -> Bars:
+    """`bars` with recent-tail rows merged in (tail values win on equal days)."""
+    if not rows:
+        return bars
+    new = rows_to_columns(rows)
+
+    # Base bars strictly before the first tail day are kept as they are
+    keep = int(np.searchsorted(bars.day, new[0][0], side="left"))
+    tail_day = np.concatenate([np.asarray(bars.day[keep:]), new[0]])
+    order = np.argsort(tail_day, kind="stable")
+    # For duplicate days keep the last occurrence, i.e. the tail row
+    sorted_day = tail_day[order]
+    pick = order[np.append(sorted_day[1:] != sorted_day[:-1], True)]
+
+    columns = []
+    for old_col, new_col in zip(bars[1:], new):
+        merged = np.concatenate([np.asarray(old_col[keep:]), np.asarray(new_col, dtype=old_col.dtype)])
+        columns.append(np.concatenate([np.asarray(old_col[:keep]), merged[pick]]))
+    return Bars(bars.symbol, *columns)
+
+
+def load_bars(json_path: str) -> Bars:
+    """Bars for a ticker's series (base and recent tail), from its columnar copy when that is current."""
+    return merge_tail(_base_bars(json_path, write=False), tail_rows(json_path))
+
+
+def ensure_bars(json_path: str) -> Bars:
+    """Like load_bars(), but a missing or stale columnar copy is (re)written from the base JSON first."""
+    return merge_tail(_base_bars(json_path, write=True), tail_rows(json_path))
+
+
+def convert_file(json_path: str) -> str | None:
+    """Process-pool worker: base JSON ticker file -> columnar file. Returns an error or None."""
+    symbol = os.path.basename(json_path)[:-len(".json")]
+    try:
+        rows = base_rows(json_path)
+        if rows:
+            write_columnar(columnar_path(symbol), symbol, rows)
+        return None
+    except Exception as e:
+        return f"{os.path.basename(json_path)}: {e}"
+
+
+def backfill(workers: int | None = None):
+    """Build .bin files for every base JSON ticker file that is newer than its .bin."""
+    if not os.path.exists(paths.TICKERS_DIR):
+        print("[columnar] No ticker data directory found.")
+        return
+
+    todo = []
+    for entry in os.scandir(paths.TICKERS_DIR):
+        if not (entry.name.endswith(".json") and entry.is_file()):
+            continue
+        bin_path = columnar_path(entry.name[:-len(".json")])
+        if not os.path.exists(bin_path) or os.stat(bin_path).st_mtime_ns < entry.stat().st_mtime_ns:
+            todo.append(entry.path)
+
+    print(f"[columnar] Converting {len(todo)} ticker files...")
+    errors = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for error in pool.map(convert_file, todo, chunksize=64):
+            if error:
+                errors += 1
+                if errors <= 5:
+                    print(f"  Error: {error}")
+    print(f"[columnar] Done: {len(todo) - errors} written, {errors} errors")
+
+
+if __name__ == "__main__":
+    backfill()
@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+"""
+Shared conversion from yfinance OHLCV frames to compact ticker rows.
+
+Every download step produces the same [timestamp, open, high, low, close, volume]
+rows. Doing the conversion with per-column NumPy operations instead of
+iterrows() keeps it off the hot path of a full 11k-ticker run.
+"""
+
+import numpy as np
+
+PRICE_COLUMNS = ["Open", "High", "Low", "Close"]
+PRICE_DECIMALS = 6
+
+
+def index_to_epoch(index) -> np.ndarray:
+    """Convert a DatetimeIndex (naive = UTC, or tz-aware) to int64 epoch seconds."""
+    if getattr(index, "tz", None) is not None:
+        index = index.tz_convert("UTC").tz_localize(None)
+    return np.asarray(index.values, dtype="datetime64[s]").astype(np.int64)
+
+
+def frame_to_rows(frame) -> list[list]:
+    """Convert an OHLCV DataFrame into compact rows sorted by timestamp.
+
+    Rows without an Open or Close are dropped, prices are rounded to
+    PRICE_DECIMALS and a missing volume becomes 0.
+    """
+    if frame is None or frame.empty:
+        return []
+
+    frame = frame.dropna(subset=["Open", "Close"])
+    if frame.empty:
+        return []
+
+    if not frame.index.is_monotonic_increasing:
+        frame = frame.sort_index(kind="stable")
+
+    ts = index_to_epoch(frame.index)
+    prices = [
+        np.round(frame[col].to_numpy(dtype=np.float64), PRICE_DECIMALS)
+        for col in PRICE_COLUMNS
+    ]
+    volume = np.nan_to_num(frame["Volume"].to_numpy(dtype=np.float64), nan=0.0)
+    volume = volume.astype(np.int64)
+
+    return [
+        list(row)
+        for row in zip(
+            ts.tolist(),
+            prices[0].tolist(),
+            prices[1].tolist(),
+            prices[2].tolist(),
+            prices[3].tolist(),
+            volume.tolist(),
+        )
+    ]
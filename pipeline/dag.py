@@ -0,0 +1,202 @@
+from __future__ import annotations
+
+"""
+Dependency-aware step scheduler for run_pipeline.py.
+
+Each Step declares the steps it depends on and the files/directories it
+reads and writes. After a step succeeds, fingerprints of its inputs and
+outputs are saved to raw/pipeline_state.json; on the next run a step whose
+inputs and outputs still match is skipped. Fingerprints are (size, mtime)
+based, which works because writer.py leaves unchanged files untouched. They
+are taken after the step, so a step that updates its own input (05 appends to
+tickers.csv) does not invalidate itself; steps only run once everything they
+depend on has finished, so nothing else writes their inputs meanwhile.
+
+Steps whose work depends on the outside world (ticker lists, new bars) are
+marked `always` and run whenever selected; their outputs then decide whether
+the steps downstream have anything to do. A step's `pending` callable can
+force a run even when the fingerprints match (e.g. symbols not attempted yet).
+
+Ready steps run concurrently on a thread pool. At most one `cpu_bound` step
+(one that starts a process pool over all cores) runs at a time; the network
+steps overlap with each other and with it.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import instrument
+import paths
+
+STATE_PATH = os.path.join(paths.RAW_DIR, "pipeline_state.json")
+
+# .gz/.br siblings (step 10) and in-flight temp files are not content
+IGNORED_SUFFIXES = (".gz", ".br")
+
+
+class Step:
+    def __init__(self, step_id: str, title: str, run, deps=(), inputs=(), outputs=(),
+                 always: bool = False, cpu_bound: bool = False, pending=None):
+        self.id = step_id
+        self.title = title
+        self.run = run
+        self.deps = list(deps)
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.always = always
+        self.cpu_bound = cpu_bound
+        self.pending = pending
+
+
+def fingerprint(targets: list[str]) -> str:
+    """Hash of (path, size, mtime) for every file under `targets` (files or directories)."""
+    h = hashlib.blake2b(digest_size=16)
+    for target in targets:
+        if os.path.isdir(target):
+            entries = []
+            for root, _, files in os.walk(target):
+                for name in files:
+                    if name.endswith(IGNORED_SUFFIXES) or ".tmp" in name:
+                        continue
+                    path = os.path.join(root, name)
+                    try:
+                        st = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    entries.append(f"{os.path.relpath(path, target)}\0{st.st_size}\0{st.st_mtime_ns}")
+            entries.sort()
+            h.update(f"{target}\0dir\0{len(entries)}\n".encode())
+            for entry in entries:
+                h.update(entry.encode() + b"\n")
+        elif os.path.exists(target):
+            st = os.stat(target)
+            h.update(f"{target}\0{st.st_size}\0{st.st_mtime_ns}\n".encode())
+        else:
+            h.update(f"{target}\0missing\n".encode())
+    return h.hexdigest()
+
+
+def load_state(path: str = STATE_PATH) -> dict:
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            return json.load(f)
+    return {}
+
+
+def save_state(state: dict, path: str = STATE_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def descendants(steps: dict[str, Step], roots: list[str]) -> set[str]:
+    """`roots` and every step that (transitively) depends on them."""
+    found = set(roots)
+    changed = True
+    while changed:
+        changed = False
+        for step in steps.values():
+            if step.id not in found and any(dep in found for dep in step.deps):
+                found.add(step.id)
+                changed = True
+    return found
+
+
+def is_up_to_date(step: Step, state: dict) -> tuple[bool, str]:
+    """(up to date, reason) for a step, from its saved fingerprints."""
+    if step.always:
+        return False, "always runs"
+    if step.pending is not None and step.pending():
+        return False, "has pending work"
+    saved = state.get(step.id)
+    if saved is None:
+        return False, "never run"
+    if saved.get("inputs") != fingerprint(step.inputs):
+        return False, "inputs changed"
+    if saved.get("outputs") != fingerprint(step.outputs):
+        return False, "outputs changed"
+    return True, "up to date"
+
+
+def run_dag(steps: list[Step], selected: set[str], force: bool = False,
+            max_parallel: int = 4, state_path: str = STATE_PATH) -> dict[str, str]:
+    """Run the `selected` steps in dependency order. Returns step id -> outcome.
+
+    Unselected dependencies count as satisfied. A failed step (exception or a
+    False return value) causes the steps downstream of it to be skipped.
+    """
+    by_id = {step.id: step for step in steps}
+    state = load_state(state_path)
+    state_lock = threading.Lock()
+    outcome = {}
+    remaining = [step for step in steps if step.id in selected]
+
+    def execute(step: Step) -> str:
+        up_to_date, reason = (False, "forced") if force else is_up_to_date(step, state)
+        if up_to_date:
+            print(f"\n[pipeline] Step {step.id} ({step.title}): up to date, skipped")
+            return "skipped"
+
+        print(f"\n--- Step {step.id}: {step.title} ({reason}) ---")
+        start = time.time()
+        try:
+            result = step.run()
+        finally:
+            elapsed = time.time() - start
+            instrument.step_finished(step.id, elapsed)
+        if result is False:
+            return "failed"
+
+        with state_lock:
+            state[step.id] = {
+                "inputs": fingerprint(step.inputs),
+                "outputs": fingerprint(step.outputs),
+                "finished": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "seconds": round(elapsed, 1),
+            }
+            save_state(state, state_path)
+        print(f"[pipeline] Step {step.id} done in {elapsed:.1f}s")
+        return "ran"
+
+    running = {}
+    cpu_busy = False
+    with ThreadPoolExecutor(max_workers=max_parallel) as pool:
+        while remaining or running:
+            for step in list(remaining):
+                deps = [dep for dep in step.deps if dep in selected and dep in by_id]
+                if any(outcome.get(dep) in ("failed", "blocked") for dep in deps):
+                    outcome[step.id] = "blocked"
+                    remaining.remove(step)
+                    print(f"\n[pipeline] Step {step.id} ({step.title}): blocked by a failed dependency")
+                    continue
+                if not all(dep in outcome for dep in deps):
+                    continue
+                if step.cpu_bound and cpu_busy:
+                    continue
+                if len(running) >= max_parallel:
+                    break
+                cpu_busy = cpu_busy or step.cpu_bound
+                running[pool.submit(execute, step)] = step
+                remaining.remove(step)
+
+            if not running:
+                if remaining:
+                    raise RuntimeError(f"Unsatisfiable dependencies: {[step.id for step in remaining]}")
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                step = running.pop(future)
+                if step.cpu_bound:
+                    cpu_busy = False
+                try:
+                    outcome[step.id] = future.result()
+                except Exception as e:
+                    print(f"\n[!] Step {step.id} ({step.title}) failed: {e}")
+                    outcome[step.id] = "failed"
+    return outcome
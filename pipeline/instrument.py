@@ -0,0 +1,275 @@
+from __future__ import annotations
+
+"""
+Lightweight run instrumentation: timers, counters, latency histograms and
+bytes in/out, plus optional cProfile and tracemalloc modes.
+
+Metrics are process-wide and thread-safe, so the download threads of steps
+02/03 all record into the same table. Work done inside process pools (04, 06-10
+workers) is only visible through the timers around the pool.
+
+Metric names are "<step>.<phase>" at the step call sites (02.fetch,
+02.convert, 02.write, ...) and plain phase names inside the shared modules
+(serialize, write.file, landing.save, journal.record). Timers nest: 02.write
+includes the serialize and write.file time of the same files.
+
+Usage:
+  with instrument.timer("02.fetch") as t:
+      frames = provider.fetch_history(symbols)
+      t.bytes_in = instrument.frames_nbytes(frames)
+  instrument.count("02.symbols_ok", len(results))
+
+  instrument.start(profile=True, trace_memory=True)
+  ...
+  instrument.write_report(instrument.report_path())
+"""
+
+import cProfile
+import io
+import json
+import math
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+
+import paths
+
+REPORTS_DIR = os.path.join(paths.RAW_DIR, "reports")
+
+# Latency histogram bucket upper bounds in milliseconds (last bucket is open)
+BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000, 60000]
+# Functions / allocation sites listed in the report
+TOP_N = 30
+
+_lock = threading.Lock()
+_metrics: dict[str, dict] = {}
+_counters: dict[str, int] = {}
+_steps: dict[str, dict] = {}
+_profiles: list[cProfile.Profile] = []
+_started = time.time()
+_profiling = False
+
+
+def _new_metric() -> dict:
+    return {"count": 0, "seconds": 0.0, "min": math.inf, "max": 0.0,
+            "bytes_in": 0, "bytes_out": 0, "hist": [0] * (len(BUCKETS_MS) + 1)}
+
+
+def record(name: str, seconds: float, bytes_in: int = 0, bytes_out: int = 0):
+    """Add one timed event to metric `name`."""
+    ms = seconds * 1000
+    bucket = 0
+    while bucket < len(BUCKETS_MS) and ms > BUCKETS_MS[bucket]:
+        bucket += 1
+    with _lock:
+        m = _metrics.get(name)
+        if m is None:
+            m = _metrics[name] = _new_metric()
+        m["count"] += 1
+        m["seconds"] += seconds
+        m["min"] = min(m["min"], seconds)
+        m["max"] = max(m["max"], seconds)
+        m["bytes_in"] += bytes_in
+        m["bytes_out"] += bytes_out
+        m["hist"][bucket] += 1
+
+
+def count(name: str, n: int = 1):
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+
+class timer:
+    """Context manager timing one event; set .bytes_in / .bytes_out inside the block."""
+
+    __slots__ = ("name", "bytes_in", "bytes_out", "_start")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        record(self.name, time.perf_counter() - self._start, self.bytes_in, self.bytes_out)
+        if exc_type is not None:
+            count(f"{self.name}.errors")
+        return False
+
+
+def frames_nbytes(frames: dict) -> int:
+    """In-memory size of {symbol: DataFrame}, as a stand-in for bytes received."""
+    return sum(int(frame.memory_usage(index=True).sum()) for frame in frames.values() if frame is not None)
+
+
+def _percentile(hist: list[int], total: int, q: float) -> float | None:
+    """Upper bound (ms) of the bucket holding the q-quantile; None for the open bucket."""
+    if not total:
+        return None
+    seen = 0
+    for bucket, n in enumerate(hist):
+        seen += n
+        if seen >= q * total:
+            return BUCKETS_MS[bucket] if bucket < len(BUCKETS_MS) else None
+    return None
+
+
+def _thread_profiler(*_):
+    """threading.setprofile hook: give each new thread its own profiler."""
+    profile = cProfile.Profile()
+    with _lock:
+        _profiles.append(profile)
+    profile.enable()
+
+
+def start(profile: bool = False, trace_memory: bool = False):
+    """Reset the metrics and optionally start cProfile (all threads) and tracemalloc."""
+    global _started, _profiling
+    with _lock:
+        _metrics.clear()
+        _counters.clear()
+        _steps.clear()
+        _profiles.clear()
+    _started = time.time()
+    _profiling = profile
+    if profile:
+        threading.setprofile(_thread_profiler)
+        main_profile = cProfile.Profile()
+        _profiles.append(main_profile)
+        main_profile.enable()
+    if trace_memory:
+        tracemalloc.start(10)
+
+
+def step_finished(step_id: str, seconds: float):
+    """Record a pipeline step's wall time (and the traced memory peak since the last step)."""
+    entry = {"seconds": round(seconds, 3)}
+    if tracemalloc.is_tracing():
+        current, peak = tracemalloc.get_traced_memory()
+        entry["memory_current_mb"] = round(current / 1024 / 1024, 1)
+        # Approximate when steps overlap: the peak is process-wide
+        entry["memory_peak_mb"] = round(peak / 1024 / 1024, 1)
+        tracemalloc.reset_peak()
+    with _lock:
+        _steps[step_id] = entry
+
+
+def _profile_section(prof_path: str | None) -> dict:
+    global _profiling
+    threading.setprofile(None)
+    for profile in _profiles:
+        profile.disable()
+    _profiling = False
+
+    stats = None
+    for profile in _profiles:
+        try:
+            if stats is None:
+                stats = pstats.Stats(profile)
+            else:
+                stats.add(profile)
+        except TypeError:
+            continue  # profiler that never saw a call
+    if stats is None:
+        return {}
+    if prof_path:
+        stats.dump_stats(prof_path)
+
+    rows = []
+    stats.sort_stats("cumulative")
+    for func in stats.fcn_list[:TOP_N]:
+        calls, primitive, tottime, cumtime, _ = stats.stats[func]
+        filename, line, name = func
+        rows.append({
+            "function": f"{os.path.basename(filename)}:{line}({name})",
+            "calls": calls,
+            "tottime": round(tottime, 4),
+            "cumtime": round(cumtime, 4),
+        })
+    text = io.StringIO()
+    stats.stream = text
+    stats.sort_stats("tottime").print_stats(TOP_N)
+    return {"file": prof_path, "top_cumulative": rows, "top_tottime_text": text.getvalue()}
+
+
+def _memory_section() -> dict:
+    snapshot = tracemalloc.take_snapshot()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    top = snapshot.statistics("lineno")[:TOP_N]
+    return {
+        "current_mb": round(current / 1024 / 1024, 1),
+        "peak_mb": round(peak / 1024 / 1024, 1),
+        "top_allocations": [
+            {"site": str(stat.traceback[0]), "size_kb": round(stat.size / 1024, 1), "blocks": stat.count}
+            for stat in top
+        ],
+    }
+
+
+def report(prof_path: str | None = None) -> dict:
+    """Snapshot of everything recorded so far; stops profiling/tracing if active."""
+    with _lock:
+        metrics = {}
+        for name, m in sorted(_metrics.items()):
+            metrics[name] = {
+                "count": m["count"],
+                "seconds": round(m["seconds"], 4),
+                "mean_ms": round(m["seconds"] * 1000 / m["count"], 3) if m["count"] else None,
+                "min_ms": round(m["min"] * 1000, 3) if m["count"] else None,
+                "max_ms": round(m["max"] * 1000, 3),
+                "p50_ms": _percentile(m["hist"], m["count"], 0.5),
+                "p95_ms": _percentile(m["hist"], m["count"], 0.95),
+                "p99_ms": _percentile(m["hist"], m["count"], 0.99),
+                "bytes_in": m["bytes_in"],
+                "bytes_out": m["bytes_out"],
+                "histogram_ms": {
+                    (f"<={BUCKETS_MS[i]}" if i < len(BUCKETS_MS) else f">{BUCKETS_MS[-1]}"): n
+                    for i, n in enumerate(m["hist"]) if n
+                },
+            }
+        result = {
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(_started)),
+            "wall_s": round(time.time() - _started, 3),
+            "steps": dict(_steps),
+            "metrics": metrics,
+            "counters": dict(sorted(_counters.items())),
+        }
+    if _profiling:
+        result["profile"] = _profile_section(prof_path)
+    if tracemalloc.is_tracing():
+        result["memory"] = _memory_section()
+    return result
+
+
+def report_path(kind: str = "run") -> str:
+    return os.path.join(REPORTS_DIR, f"{kind}-{time.strftime('%Y%m%dT%H%M%S', time.localtime(_started))}.json")
+
+
+def write_report(path: str) -> dict:
+    """Write the report (and a .prof next to it when profiling) and a copy as latest.json."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    data = report(os.path.splitext(path)[0] + ".prof" if _profiling else None)
+    payload = json.dumps(data, indent=2)
+    for target in (path, os.path.join(os.path.dirname(path), "latest.json")):
+        with open(target, "w") as f:
+            f.write(payload)
+    return data
+
+
+def summary(data: dict, limit: int = 12) -> str:
+    """The slowest metrics of a report as a few printable lines."""
+    lines = []
+    ranked = sorted(data["metrics"].items(), key=lambda item: item[1]["seconds"], reverse=True)
+    for name, m in ranked[:limit]:
+        io_text = ""
+        if m["bytes_in"] or m["bytes_out"]:
+            io_text = f", in {m['bytes_in'] / 1024 / 1024:.1f} MB, out {m['bytes_out'] / 1024 / 1024:.1f} MB"
+        p50, p95 = (f"<={m[q]}" if m[q] is not None else f">{BUCKETS_MS[-1]}" for q in ("p50_ms", "p95_ms"))
+        lines.append(f"  {name:<20} {m['seconds']:>9.2f}s  {m['count']:>8} x  p50 {p50} ms  p95 {p95} ms{io_text}")
+    return "\n".join(lines)
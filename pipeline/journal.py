@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+"""
+Per-symbol download journal for step 02 (raw/progress.sqlite).
+
+One row per symbol that has been attempted:
+
+  symbol, status ("ok" | "empty" | "error"), attempts, last_attempt (epoch
+  seconds), bars, error
+
+Each batch is recorded with one upsert per symbol in a single transaction, so
+the cost of a batch does not grow with the run and an interrupted run loses
+at most the batch in flight. "ok" and "empty" symbols are skipped on the next
+run; "error" symbols are only re-queued with --retry-failed.
+
+The old download_progress.json (a flat list of finished symbols, failures
+included) is imported once and renamed to download_progress.json.migrated.
+Imported symbols count as "ok" if their ticker file exists and as "error"
+otherwise, so --retry-failed picks the old failures up again.
+"""
+
+import json
+import os
+import sqlite3
+import time
+
+import instrument
+import paths
+
+JOURNAL_PATH = os.path.join(paths.RAW_DIR, "progress.sqlite")
+LEGACY_PROGRESS_FILE = os.path.join(paths.RAW_DIR, "download_progress.json")
+
+OK, EMPTY, ERROR = "ok", "empty", "error"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS progress (
+    symbol TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_attempt INTEGER,
+    bars INTEGER NOT NULL DEFAULT 0,
+    error TEXT
+) WITHOUT ROWID;
+"""
+
+
+class Journal:
+    def __init__(self, path: str = JOURNAL_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def statuses(self) -> dict[str, str]:
+        """symbol -> status for every attempted symbol."""
+        return dict(self.conn.execute("SELECT symbol, status FROM progress"))
+
+    def bars(self) -> dict[str, int]:
+        """symbol -> bar count of the last successful download."""
+        return dict(self.conn.execute("SELECT symbol, bars FROM progress WHERE status = ? AND bars > 0", (OK,)))
+
+    def failed(self) -> set[str]:
+        return {symbol for (symbol,) in self.conn.execute("SELECT symbol FROM progress WHERE status = ?", (ERROR,))}
+
+    def counts(self) -> dict[str, int]:
+        return dict(self.conn.execute("SELECT status, COUNT(*) FROM progress GROUP BY status"))
+
+    def record(self, results: list[tuple[str, str, int, str | None]]):
+        """Record one batch of (symbol, status, bars, error) in a single transaction."""
+        now = int(time.time())
+        with instrument.timer("journal.record"):
+            self.conn.execute("BEGIN")
+            self.conn.executemany(
+                """
+                INSERT INTO progress (symbol, status, attempts, last_attempt, bars, error)
+                VALUES (?, ?, 1, ?, ?, ?)
+                ON CONFLICT(symbol) DO UPDATE SET
+                    status = excluded.status, attempts = attempts + 1,
+                    last_attempt = excluded.last_attempt, bars = excluded.bars, error = excluded.error
+                """,
+                [(symbol, status, now, bars, error) for symbol, status, bars, error in results],
+            )
+            self.conn.execute("COMMIT")
+
+    def migrate_legacy(self, tickers_dir: str = paths.TICKERS_DIR, legacy_path: str = LEGACY_PROGRESS_FILE) -> int:
+        """Import download_progress.json if present. Returns the number of symbols imported."""
+        if not os.path.exists(legacy_path):
+            return 0
+        with open(legacy_path, "r") as f:
+            done = json.load(f)
+
+        mtime = int(os.path.getmtime(legacy_path))
+        rows = []
+        for symbol in done:
+            if os.path.exists(os.path.join(tickers_dir, f"{symbol}.json")):
+                rows.append((symbol, OK, 1, mtime, 0, None))
+            else:
+                rows.append((symbol, ERROR, 1, mtime, 0, "no data file (imported from download_progress.json)"))
+
+        self.conn.execute("BEGIN")
+        # Rows already in the journal are newer than the legacy file
+        self.conn.executemany("INSERT OR IGNORE INTO progress VALUES (?, ?, ?, ?, ?, ?)", rows)
+        self.conn.execute("COMMIT")
+        os.replace(legacy_path, legacy_path + ".migrated")
+        return len(rows)
@@ -0,0 +1,247 @@
+from __future__ import annotations
+
+"""
+Raw landing zone: every frame a provider returns, as it was returned.
+
+Steps 02, 03 and 05 save each fetch (one multi-symbol request, or one
+single-symbol fallback) to raw/landing/ before converting it, so derived
+outputs can be regenerated offline after a change to rounding, row format or
+adjustments, without downloading again (`run_pipeline.py rebuild`).
+
+Layout:
+  raw/landing/<step>-<YYYYmmddTHHMMSS>-<pid>-<seq>.npz  (zip-deflated)
+      symbols (str), offsets (int64, len(symbols) + 1), ts (int64 epoch
+      seconds), columns (str) and one float64 array per column, unrounded,
+      NaN kept. Symbol i owns rows offsets[i]:offsets[i + 1].
+  raw/landing/catalog.jsonl
+      one line per file: {file, step, provider, fetched_at, start, end,
+      symbols, bars}. start/end are null for full-history fetches.
+
+A symbol's series is rebuilt from its latest full-history fetch with every
+later ranged fetch (step 03 top-ups) merged on top, in catalog order.
+
+Anything older is superseded: prune_landing() (run by `run_pipeline.py
+rebuild` and `compact`) deletes files that no symbol's rebuild reads any
+more and drops them from the catalog.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+import instrument
+import paths
+from columnar import columnar_path, write_columnar
+from convert import frame_to_rows, index_to_epoch
+from recent import write_series
+from tickerfile import merge_rows
+from writer import OutputWriter
+
+LANDING_DIR = paths.LANDING_DIR
+CATALOG_PATH = os.path.join(LANDING_DIR, "catalog.jsonl")
+
+# Step 05 only keeps delisted tickers with more bars than this
+MIN_BARS = {"05": 5}
+
+
+class Landing:
+    """Thread-safe writer for landing files and the catalog."""
+
+    def __init__(self, step: str, provider: str = "live", landing_dir: str = LANDING_DIR):
+        self.step = step
+        self.provider = provider
+        self.landing_dir = landing_dir
+        self.catalog_path = os.path.join(landing_dir, "catalog.jsonl")
+        self.files = 0
+        self.bytes = 0
+        self._seq = 0
+        self._lock = threading.Lock()
+        os.makedirs(landing_dir, exist_ok=True)
+
+    def save(self, frames: dict, start: str | None = None, end: str | None = None) -> str | None:
+        """Persist {symbol: OHLCV DataFrame} from one fetch. Returns the file name (None if empty)."""
+        frames = {symbol: frame for symbol, frame in frames.items() if frame is not None and not frame.empty}
+        if not frames:
+            return None
+
+        symbols = sorted(frames)
+        columns = sorted({col for frame in frames.values() for col in frame.columns})
+        offsets = np.zeros(len(symbols) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(frames[s]) for s in symbols])
+        arrays = {
+            "symbols": np.array(symbols),
+            "offsets": offsets,
+            "ts": np.concatenate([index_to_epoch(frames[s].index) for s in symbols]),
+            "columns": np.array(columns),
+        }
+        for i, col in enumerate(columns):
+            arrays[f"c{i}"] = np.concatenate([
+                frames[s][col].to_numpy(dtype=np.float64) if col in frames[s].columns
+                else np.full(len(frames[s]), np.nan)
+                for s in symbols
+            ])
+
+        with self._lock:
+            self._seq += 1
+            seq = self._seq
+        name = f"{self.step}-{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}-{seq:05d}.npz"
+        path = os.path.join(self.landing_dir, name)
+        tmp_path = f"{path}.tmp{os.getpid()}"
+        with instrument.timer("landing.save") as t:
+            with open(tmp_path, "wb") as f:
+                np.savez_compressed(f, **arrays)
+            os.replace(tmp_path, path)
+            t.bytes_out = os.path.getsize(path)
+
+        entry = {
+            "file": name,
+            "step": self.step,
+            "provider": self.provider,
+            "fetched_at": int(time.time()),
+            "start": start,
+            "end": end,
+            "symbols": symbols,
+            "bars": int(offsets[-1]),
+        }
+        with self._lock:
+            with open(self.catalog_path, "a") as f:
+                f.write(json.dumps(entry, separators=(",", ":")) + "\n")
+            self.files += 1
+            self.bytes += os.path.getsize(path)
+        return name
+
+    def summary(self) -> str:
+        return f"{self.files} landing files ({self.bytes / 1024 / 1024:.1f} MB)"
+
+
+def load_catalog(catalog_path: str = CATALOG_PATH) -> list[dict]:
+    entries = []
+    if os.path.exists(catalog_path):
+        with open(catalog_path, "r") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    entries.append(json.loads(line))
+    return entries
+
+
+@lru_cache(maxsize=16)
+def load_file(name: str, landing_dir: str = LANDING_DIR) -> tuple[dict[str, int], np.ndarray, np.ndarray, pd.DataFrame]:
+    """(symbol -> position, offsets, ts, columns frame) for one landing file."""
+    with np.load(os.path.join(landing_dir, name)) as npz:
+        symbols = npz["symbols"].tolist()
+        columns = npz["columns"].tolist()
+        data = pd.DataFrame({col: npz[f"c{i}"] for i, col in enumerate(columns)})
+        return {s: i for i, s in enumerate(symbols)}, npz["offsets"], npz["ts"], data
+
+
+def load_frame(name: str, symbol: str, landing_dir: str = LANDING_DIR) -> pd.DataFrame:
+    """One symbol's frame from a landing file, indexed by naive UTC timestamps."""
+    position, offsets, ts, data = load_file(name, landing_dir)
+    i = position[symbol]
+    lo, hi = offsets[i], offsets[i + 1]
+    frame = data.iloc[lo:hi].copy()
+    frame.index = pd.to_datetime(ts[lo:hi], unit="s")
+    return frame
+
+
+def plan_rebuild(entries: list[dict]) -> dict[str, list[tuple[str, str]]]:
+    """symbol -> [(step, file)]: its latest full-history fetch, then later ranged fetches."""
+    plan = defaultdict(list)
+    for entry in entries:
+        full = entry["start"] is None and entry["end"] is None
+        for symbol in entry["symbols"]:
+            if full:
+                plan[symbol] = []
+            plan[symbol].append((entry["step"], entry["file"], full))
+    # Symbols with only ranged fetches have no base to rebuild from
+    return {
+        symbol: [(step, name) for step, name, _ in fetches]
+        for symbol, fetches in plan.items()
+        if fetches[0][2]
+    }
+
+
+def prune_landing(landing_dir: str = LANDING_DIR) -> int:
+    """Delete landing files plan_rebuild() no longer reads. Returns files removed."""
+    catalog_path = os.path.join(landing_dir, "catalog.jsonl")
+    entries = load_catalog(catalog_path)
+    needed = {name for fetches in plan_rebuild(entries).values() for _, name in fetches}
+    kept = [entry for entry in entries if entry["file"] in needed]
+    if len(kept) == len(entries):
+        return 0
+
+    # Catalog first: an interrupted prune leaves unlisted files, never missing ones
+    tmp_path = f"{catalog_path}.tmp{os.getpid()}"
+    with open(tmp_path, "w") as f:
+        for entry in kept:
+            f.write(json.dumps(entry, separators=(",", ":")) + "\n")
+    os.replace(tmp_path, catalog_path)
+
+    freed = 0
+    for entry in entries:
+        path = os.path.join(landing_dir, entry["file"])
+        if entry["file"] not in needed and os.path.exists(path):
+            freed += os.path.getsize(path)
+            os.remove(path)
+    removed = len(entries) - len(kept)
+    print(f"[landing] Pruned {removed} superseded landing files ({freed / 1024 / 1024:.1f} MB), {len(kept)} kept")
+    return removed
+
+
+def rebuild_symbol(job: tuple[str, list[tuple[str, str]]]) -> tuple[str, int, OutputWriter | None, str | None]:
+    """Process-pool worker: (symbol, bars, writer counters, error) after rewriting one ticker file."""
+    symbol, fetches = job
+    try:
+        base_step = fetches[0][0]
+        rows = []
+        for _, name in fetches:
+            rows = merge_rows(rows, frame_to_rows(load_frame(name, symbol)))
+        if len(rows) <= MIN_BARS.get(base_step, 0):
+            return symbol, 0, None, None
+
+        writer = OutputWriter()
+        write_series(os.path.join(paths.TICKERS_DIR, f"{symbol}.json"), symbol, rows, writer)
+        write_columnar(columnar_path(symbol), symbol, rows)
+        return symbol, len(rows), writer, None
+    except Exception as e:
+        return symbol, 0, None, str(e)
+
+
+def rebuild_tickers(workers: int | None = None) -> int:
+    """Regenerate every ticker JSON (and columnar copy) from the landing zone. Returns tickers rebuilt."""
+    entries = load_catalog()
+    if not entries:
+        print("[landing] No landing zone catalog found; nothing to rebuild.")
+        return 0
+
+    plan = plan_rebuild(entries)
+    # Keep symbols from the same file together so each worker reuses its cached load
+    jobs = sorted(plan.items(), key=lambda item: (item[1][0][1], item[0]))
+    print(f"[landing] Rebuilding {len(jobs)} tickers from {len(entries)} landing files...")
+    os.makedirs(paths.TICKERS_DIR, exist_ok=True)
+
+    writer = OutputWriter()
+    rebuilt = skipped = errors = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for symbol, bars, counts, error in pool.map(rebuild_symbol, jobs, chunksize=32):
+            if error is not None:
+                errors += 1
+                if errors <= 5:
+                    print(f"  Error on {symbol}: {error}")
+            elif counts is None:
+                skipped += 1
+            else:
+                writer.add(counts)
+                rebuilt += 1
+
+    print(f"[landing] Rebuilt {rebuilt} tickers ({skipped} too short, {errors} errors)")
+    print(f"[landing] Output: {writer.summary()}")
+    return rebuilt
@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+"""
+Date-aligned close/volume panel over the whole universe (raw/panel/).
+
+  close.npy     float32[dates, columns]  split-adjusted close, NaN where no bar
+  volume.npy    float32[dates, columns]  volume, NaN where no bar
+  dates.npy     int32[dates]             trading days (days since 1970-01-01)
+  symbols.json  [symbols]                column order
+  meta.json     build state used by 09_build_panel.py for incremental updates
+
+The calendar is the union of every ticker's bar dates. Matrices are row-major
+(one row per date), so new trading days are appended to the end of the files
+without rewriting them, and one ticker's column is a strided, zero-copy view.
+The first len(symbols) columns are in use; the rest are spare, NaN-filled
+columns that new tickers take over without the matrices being rewritten.
+float32 keeps the universe at about 4 bytes per cell; volumes above 2**24 lose
+precision in the last digits, which is fine for analytics.
+
+Usage:
+  from panel import Panel
+
+  panel = Panel()
+  closes = panel.closes("AAPL")                      # view, no copy
+  pct = panel.normalized(["AAPL", "MSFT"], start="2020-01-01")
+"""
+
+import io
+import json
+import os
+
+import numpy as np
+from numpy.lib import format as npy
+
+import paths
+
+PANEL_DIR = paths.PANEL_DIR
+DTYPE = np.float32
+
+# Rows filled per block when initialising or growing a matrix
+FILL_ROWS = 4096
+
+# Spare columns reserved whenever a matrix is created or widened
+SPARE_COLUMNS = 256
+
+
+def day_of(date: str) -> int:
+    """'YYYY-MM-DD' -> days since 1970-01-01."""
+    return int(np.datetime64(date, "D").astype(np.int64))
+
+
+def create_matrix(path: str, rows: int, cols: int) -> np.memmap:
+    """New NaN-filled .npy matrix, memory-mapped for writing."""
+    matrix = npy.open_memmap(path, mode="w+", dtype=DTYPE, shape=(rows, cols))
+    for start in range(0, rows, FILL_ROWS):
+        matrix[start:start + FILL_ROWS] = np.nan
+    return matrix
+
+
+def grow_matrix(path: str, new_rows: int) -> np.memmap:
+    """Append NaN rows to a .npy matrix and return it memory-mapped for writing.
+
+    The .npy header is padded, so a longer shape nearly always fits in place
+    and only the new rows are written; otherwise the file is rewritten.
+    """
+    with open(path, "r+b") as f:
+        version = npy.read_magic(f)
+        read_header = npy.read_array_header_1_0 if version == (1, 0) else npy.read_array_header_2_0
+        shape, _, dtype = read_header(f)
+        data_offset = f.tell()
+        rows, cols = shape
+
+        header = io.BytesIO()
+        write_header = npy.write_array_header_1_0 if version == (1, 0) else npy.write_array_header_2_0
+        write_header(header, {"descr": npy.dtype_to_descr(dtype), "fortran_order": False, "shape": (rows + new_rows, cols)})
+        if len(header.getvalue()) == data_offset:
+            f.seek(0)
+            f.write(header.getvalue())
+            f.truncate(data_offset + (rows + new_rows) * cols * dtype.itemsize)
+            matrix = np.memmap(path, dtype=dtype, mode="r+", offset=data_offset, shape=(rows + new_rows, cols))
+            for start in range(rows, rows + new_rows, FILL_ROWS):
+                matrix[start:min(start + FILL_ROWS, rows + new_rows)] = np.nan
+            return matrix
+
+    old = np.load(path, mmap_mode="r")
+    tmp_path = path + ".tmp"
+    matrix = create_matrix(tmp_path, rows + new_rows, cols)
+    for start in range(0, rows, FILL_ROWS):
+        matrix[start:start + FILL_ROWS] = old[start:start + FILL_ROWS]
+    matrix.flush()
+    del old
+    os.replace(tmp_path, path)
+    return np.load(path, mmap_mode="r+")
+
+
+def widen_matrix(path: str, cols: int) -> np.memmap:
+    """Rewrite a .npy matrix with `cols` columns (new ones NaN) and return it memory-mapped for writing."""
+    old = np.load(path, mmap_mode="r")
+    rows, old_cols = old.shape
+    tmp_path = path + ".tmp"
+    matrix = create_matrix(tmp_path, rows, cols)
+    for start in range(0, rows, FILL_ROWS):
+        matrix[start:start + FILL_ROWS, :old_cols] = old[start:start + FILL_ROWS]
+    matrix.flush()
+    del old, matrix
+    os.replace(tmp_path, path)
+    return np.load(path, mmap_mode="r+")
+
+
+def move_columns(matrix: np.ndarray, src: list[int], dst: list[int], clear: list[int]):
+    """Copy columns `src` to `dst`, then NaN-fill columns `clear`, a block of rows at a time."""
+    for start in range(0, matrix.shape[0], FILL_ROWS):
+        block = matrix[start:start + FILL_ROWS]
+        if src:
+            block[:, dst] = block[:, src]
+        if clear:
+            block[:, clear] = np.nan
+
+
+def load_symbols(panel_dir: str = PANEL_DIR) -> list[str]:
+    with open(os.path.join(panel_dir, "symbols.json"), "r") as f:
+        return json.load(f)
+
+
+def load_meta(panel_dir: str = PANEL_DIR) -> dict | None:
+    path = os.path.join(panel_dir, "meta.json")
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def save_sidecars(panel_dir: str, dates: np.ndarray, symbols: list[str], meta: dict):
+    """Write dates.npy, symbols.json and meta.json (meta last: it marks the panel complete)."""
+    np.save(os.path.join(panel_dir, "dates.npy"), np.asarray(dates, dtype=np.int32))
+    for name, obj in (("symbols.json", symbols), ("meta.json", meta)):
+        path = os.path.join(panel_dir, name)
+        with open(path + ".tmp", "w") as f:
+            f.write(json.dumps(obj, separators=(",", ":")))
+        os.replace(path + ".tmp", path)
+
+
+class Panel:
+    """Read-only, memory-mapped view of the panel."""
+
+    def __init__(self, panel_dir: str = PANEL_DIR):
+        self.dates = np.load(os.path.join(panel_dir, "dates.npy"))
+        self.symbols = load_symbols(panel_dir)
+        # Spare columns past the last symbol are left out of the views
+        self.close = np.load(os.path.join(panel_dir, "close.npy"), mmap_mode="r")[:, :len(self.symbols)]
+        self.volume = np.load(os.path.join(panel_dir, "volume.npy"), mmap_mode="r")[:, :len(self.symbols)]
+        self._columns = {symbol: i for i, symbol in enumerate(self.symbols)}
+
+    def column(self, symbol: str) -> int:
+        return self._columns[symbol]
+
+    def row(self, date: str) -> int:
+        """Index of the first trading day on or after `date`."""
+        return int(np.searchsorted(self.dates, day_of(date), side="left"))
+
+    def closes(self, symbol: str) -> np.ndarray:
+        return self.close[:, self._columns[symbol]]
+
+    def volumes(self, symbol: str) -> np.ndarray:
+        return self.volume[:, self._columns[symbol]]
+
+    def normalized(self, symbols: list[str] | None = None, start: str | None = None, end: str | None = None) -> np.ndarray:
+        """% change of each close from the ticker's first close in [start, end].
+
+        Returns float32[rows, len(symbols)] (the whole universe if `symbols`
+        is None); rows before a ticker's first bar stay NaN, like the chart's
+        comparison mode.
+        """
+        lo = self.row(start) if start else 0
+        hi = int(np.searchsorted(self.dates, day_of(end), side="right")) if end else len(self.dates)
+        if symbols is None:
+            block = self.close[lo:hi]
+        else:
+            block = self.close[lo:hi, [self._columns[s] for s in symbols]]
+
+        valid = ~np.isnan(block)
+        first = valid.argmax(axis=0)
+        base = block[first, np.arange(block.shape[1])]
+        base[~valid.any(axis=0) | (base <= 0)] = np.nan
+        return (block / base - 1) * 100
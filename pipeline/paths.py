@@ -0,0 +1,31 @@
+"""
+Shared filesystem locations for all pipeline steps.
+
+Defaults point at pipeline/raw and public/data. Set MARKET_HISTORY_RAW_DIR /
+MARKET_HISTORY_DATA_DIR (run_pipeline.py does this for --raw-dir/--data-dir)
+before the steps are loaded to redirect a run, e.g. an offline synthetic run
+that must not overwrite real data.
+"""
+
+import os
+
+PIPELINE_DIR = os.path.dirname(__file__)
+
+RAW_DIR = os.environ.get("MARKET_HISTORY_RAW_DIR") or os.path.join(PIPELINE_DIR, "raw")
+DATA_DIR = os.environ.get("MARKET_HISTORY_DATA_DIR") or os.path.join(PIPELINE_DIR, "..", "public", "data")
+
+TICKERS_CSV = os.path.join(RAW_DIR, "tickers.csv")
+TICKERS_DIR = os.path.join(DATA_DIR, "tickers")
+RECENT_DIR = os.path.join(TICKERS_DIR, "recent")
+MANIFEST_PATH = os.path.join(DATA_DIR, "manifest.json")
+STATS_PATH = os.path.join(DATA_DIR, "stats.json")
+WEEKLY_DIR = os.path.join(DATA_DIR, "weekly")
+MONTHLY_DIR = os.path.join(DATA_DIR, "monthly")
+SHARDS_DIR = os.path.join(DATA_DIR, "shards")
+SEARCH_DIR = os.path.join(DATA_DIR, "search")
+
+# Python-side derived data; kept out of public/ so it is not deployed
+COLUMNAR_DIR = os.path.join(RAW_DIR, "columnar")
+STORE_PATH = os.path.join(RAW_DIR, "market.sqlite")
+PANEL_DIR = os.path.join(RAW_DIR, "panel")
+LANDING_DIR = os.path.join(RAW_DIR, "landing")
@@ -0,0 +1,304 @@
+from __future__ import annotations
+
+"""
+Market data providers used by the pipeline steps.
+
+A provider supplies two things:
+- fetch_symbol_lists(): the listed-symbol universe as [{symbol, name, exchange, type}]
+- fetch_history(symbols, start, end): {symbol: OHLCV DataFrame} for the symbols
+  that have data. start/end are "YYYY-MM-DD" strings (end exclusive); both
+  None means full history.
+
+LiveProvider talks to the NASDAQ symbol directory and yfinance.
+SyntheticProvider generates deterministic random-walk data offline, with
+configurable latency and error rates, so the whole pipeline can be run and
+benchmarked at full scale without the network.
+"""
+
+import random
+import threading
+import time
+import urllib.request
+import zlib
+
+import instrument
+from ratelimit import ThrottledError
+
+NASDAQ_URL = "https://www.nasdaqtrader.com/dynamic/SymDir/nasdaqlisted.txt"
+OTHER_URL = "https://www.nasdaqtrader.com/dynamic/SymDir/otherlisted.txt"
+
+# Map NASDAQ "other listed" exchange codes
+EXCHANGE_MAP = {
+    "N": "NYSE",
+    "A": "NYSEMKT",
+    "P": "NYSEARCA",
+    "Z": "BATS",
+    "V": "IEXG",
+}
+
+
+class ProviderError(Exception):
+    """A (non-throttling) failure reported by a data provider."""
+
+
+class DataProvider:
+    name = "base"
+
+    def fetch_symbol_lists(self) -> list[dict]:
+        raise NotImplementedError
+
+    def fetch_history(self, symbols: list[str], start: str | None = None, end: str | None = None) -> dict:
+        raise NotImplementedError
+
+
+def _download_text(url: str) -> list[str]:
+    req = urllib.request.Request(url, headers={"User-Agent": "Mozilla/5.0"})
+    with instrument.timer("01.fetch") as t:
+        with urllib.request.urlopen(req, timeout=30) as resp:
+            body = resp.read()
+        t.bytes_in = len(body)
+    return body.decode("utf-8").strip().split("\n")
+
+
+def fetch_nasdaq_symbols() -> list[dict]:
+    """Download and parse NASDAQ-listed and other-listed symbol directories."""
+    tickers = []
+
+    # Download NASDAQ-listed
+    print("[01] Downloading NASDAQ-listed symbols...")
+    try:
+        lines = _download_text(NASDAQ_URL)
+
+        # Format: Symbol|Security Name|Market Category|Test Issue|Financial Status|Round Lot Size|ETF|NextShares
+        # Skip header and footer (last line is timestamp)
+        for line in lines[1:]:
+            if line.startswith("File Creation Time"):
+                break
+            fields = line.split("|")
+            if len(fields) >= 7 and fields[3] == "N":  # Not a test issue
+                tickers.append({
+                    "symbol": fields[0].strip(),
+                    "name": fields[1].strip(),
+                    "exchange": "NASDAQ",
+                    "type": "ETF" if fields[6].strip() == "Y" else "Stock",
+                })
+        print(f"[01] Found {len(tickers)} NASDAQ symbols")
+    except Exception as e:
+        print(f"[01] Error downloading NASDAQ list: {e}")
+
+    # Download other-listed (NYSE, NYSEMKT/AMEX, etc.)
+    print("[01] Downloading other exchange-listed symbols...")
+    other_count = 0
+    try:
+        lines = _download_text(OTHER_URL)
+
+        # Format: ACT Symbol|Security Name|Exchange|CQS Symbol|ETF|Round Lot Size|Test Issue|NASDAQ Symbol
+        for line in lines[1:]:
+            if line.startswith("File Creation Time"):
+                break
+            fields = line.split("|")
+            if len(fields) >= 7 and fields[6].strip() == "N":  # Not a test issue
+                exchange_code = fields[2].strip()
+                tickers.append({
+                    "symbol": fields[0].strip(),
+                    "name": fields[1].strip(),
+                    "exchange": EXCHANGE_MAP.get(exchange_code, exchange_code),
+                    "type": "ETF" if fields[4].strip() == "Y" else "Stock",
+                })
+                other_count += 1
+        print(f"[01] Found {other_count} other-exchange symbols")
+    except Exception as e:
+        print(f"[01] Error downloading other listings: {e}")
+
+    return tickers
+
+
+class LiveProvider(DataProvider):
+    """NASDAQ symbol directory + yfinance history (split-adjusted)."""
+
+    name = "live"
+
+    def fetch_symbol_lists(self) -> list[dict]:
+        return fetch_nasdaq_symbols()
+
+    def fetch_history(self, symbols: list[str], start: str | None = None, end: str | None = None) -> dict:
+        import yfinance as yf
+
+        span = {"start": start, "end": end} if start else {"period": "max"}
+
+        if len(symbols) == 1:
+            hist = yf.Ticker(symbols[0]).history(**span)
+            return {} if hist.empty else {symbols[0]: hist}
+
+        data = yf.download(
+            symbols,
+            group_by="ticker",
+            auto_adjust=True,
+            threads=True,
+            progress=False,
+            **span,
+        )
+        if data.empty:
+            return {}
+
+        frames = {}
+        present = set(data.columns.get_level_values(0))
+        for symbol in symbols:
+            if symbol in present:
+                frames[symbol] = data[symbol]
+        return frames
+
+
+class SyntheticProvider(DataProvider):
+    """Deterministic offline provider producing realistic-looking OHLCV data.
+
+    Every symbol's history is derived from (seed, symbol) alone, so repeated
+    runs — and any symbol outside the generated universe — produce identical
+    bars. `latency` is the mean delay per fetch_history() call in seconds;
+    `error_rate` / `throttle_rate` are per-call probabilities of raising a
+    ProviderError / ThrottledError.
+    """
+
+    name = "synthetic"
+
+    EXCHANGES = [("NASDAQ", 0.45), ("NYSE", 0.35), ("NYSEARCA", 0.12), ("NYSEMKT", 0.05), ("BATS", 0.03)]
+    WORDS = [
+        "Acme", "Global", "American", "United", "First", "Pacific", "Atlantic", "Digital",
+        "Energy", "Capital", "Health", "Systems", "Industries", "Holdings", "Networks",
+        "Materials", "Financial", "Bio", "Motors", "Foods", "Realty", "Semiconductor",
+    ]
+
+    def __init__(
+        self,
+        n_symbols: int = 11_880,
+        seed: int = 0,
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+        throttle_rate: float = 0.0,
+        min_bars: int = 250,
+        max_bars: int = 15_000,
+        empty_rate: float = 0.03,
+        delisted_rate: float = 0.05,
+        as_of: str | None = None,
+    ):
+        import pandas as pd
+
+        self.n_symbols = n_symbols
+        self.seed = seed
+        self.latency = latency
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.min_bars = min_bars
+        self.max_bars = max_bars
+        self.empty_rate = empty_rate
+        self.delisted_rate = delisted_rate
+        self.as_of = pd.Timestamp(as_of or pd.Timestamp.now().strftime("%Y-%m-%d"))
+        self._rand = random.Random(seed)
+        self._lock = threading.Lock()
+        self._calendar = None
+
+    def _rng(self, symbol: str):
+        import numpy as np
+
+        return np.random.default_rng([self.seed, zlib.crc32(symbol.encode())])
+
+    def fetch_symbol_lists(self) -> list[dict]:
+        rng = random.Random(self.seed)
+        exchanges, weights = zip(*self.EXCHANGES)
+        letters = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+        seen = set()
+        tickers = []
+        while len(tickers) < self.n_symbols:
+            length = rng.choices([1, 2, 3, 4, 5], weights=[1, 4, 30, 55, 10])[0]
+            symbol = "".join(rng.choice(letters) for _ in range(length))
+            if symbol in seen:
+                continue
+            seen.add(symbol)
+            exchange = rng.choices(exchanges, weights=weights)[0]
+            is_etf = exchange == "NYSEARCA" or rng.random() < 0.03
+            name = " ".join(rng.sample(self.WORDS, 2)) + (" ETF" if is_etf else " Inc.")
+            tickers.append({
+                "symbol": symbol,
+                "name": name,
+                "exchange": exchange,
+                "type": "ETF" if is_etf else "Stock",
+            })
+        print(f"[01] Generated {len(tickers)} synthetic symbols")
+        return tickers
+
+    def calendar(self):
+        """Business-day index long enough for the longest (delisted) history."""
+        import numpy as np
+        import pandas as pd
+
+        with self._lock:
+            if self._calendar is None:
+                end = np.datetime64(self.as_of.strftime("%Y-%m-%d"), "D")
+                days = np.arange(end - (self.max_bars + 2500) * 7 // 5 - 14, end, dtype="datetime64[D]")
+                self._calendar = pd.DatetimeIndex(days[np.is_busday(days)]).tz_localize("America/New_York")
+            return self._calendar
+
+    def history(self, symbol: str):
+        """Full synthetic daily history for one symbol (None if it has no data)."""
+        import numpy as np
+        import pandas as pd
+
+        rng = self._rng(symbol)
+        if rng.random() < self.empty_rate:
+            return None
+
+        bars = int(rng.integers(self.min_bars, self.max_bars + 1))
+        calendar = self.calendar()
+        end = len(calendar)
+        if rng.random() < self.delisted_rate:
+            end -= int(rng.integers(30, 2500))
+        index = calendar[end - bars:end]
+
+        sigma = rng.uniform(0.01, 0.04)
+        close = rng.lognormal(3, 1) * np.exp(np.cumsum(rng.normal(0.0003, sigma, bars)))
+        open_ = np.empty(bars)
+        open_[0] = close[0]
+        open_[1:] = close[:-1] * (1 + rng.normal(0, sigma / 3, bars - 1))
+        high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, sigma / 2, bars)))
+        low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, sigma / 2, bars)))
+        volume = np.round(rng.lognormal(12, 1.5, bars))
+
+        return pd.DataFrame(
+            {"Open": open_, "High": high, "Low": low, "Close": close, "Volume": volume},
+            index=index,
+        )
+
+    def _simulate_request(self):
+        with self._lock:
+            delay = self.latency * self._rand.uniform(0.5, 1.5) if self.latency > 0 else 0.0
+            roll = self._rand.random()
+        if delay:
+            time.sleep(delay)
+        if roll < self.throttle_rate:
+            raise ThrottledError("429 Too Many Requests (synthetic)")
+        if roll < self.throttle_rate + self.error_rate:
+            raise ProviderError("synthetic provider error")
+
+    def fetch_history(self, symbols: list[str], start: str | None = None, end: str | None = None) -> dict:
+        self._simulate_request()
+
+        frames = {}
+        for symbol in symbols:
+            hist = self.history(symbol)
+            if hist is None:
+                continue
+            if start:
+                hist = hist[hist.index >= start]
+            if end:
+                hist = hist[hist.index < end]
+            frames[symbol] = hist
+        return frames
+
+
+def get_provider(name: str = "live", **options) -> DataProvider:
+    """Build a provider by name ("live" or "synthetic")."""
+    if name == "live":
+        return LiveProvider()
+    if name == "synthetic":
+        return SyntheticProvider(**options)
+    raise ValueError(f"Unknown provider: {name}")
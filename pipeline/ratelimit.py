@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+"""
+Shared rate limiting and concurrent job scheduling for download steps.
+
+TokenBucket is an adaptive limiter: it halves its rate when the upstream
+throttles us and creeps back up after a run of successful requests.
+run_throttled() keeps a fixed number of jobs in flight on a thread pool,
+all drawing from one limiter, and yields results as they complete so the
+caller can write output without waiting for the whole run.
+"""
+
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+class ThrottledError(Exception):
+    """Raised when the upstream signals that we are sending too many requests."""
+
+
+# HTTP status of a throttled request
+HTTP_TOO_MANY_REQUESTS = 429
+
+
+def http_status(exc: BaseException) -> int | None:
+    """HTTP status carried by a requests/curl_cffi/urllib error, if any."""
+    response = getattr(exc, "response", None)
+    for status in (getattr(response, "status_code", None), getattr(exc, "status_code", None),
+                   getattr(exc, "status", None), getattr(exc, "code", None)):
+        if isinstance(status, int):
+            return status
+    return None
+
+
+def is_throttle_error(exc: BaseException) -> bool:
+    """Best-effort detection of rate-limit errors from yfinance / HTTP clients."""
+    while exc is not None:
+        if isinstance(exc, ThrottledError) or "RateLimit" in type(exc).__name__:
+            return True
+        if http_status(exc) == HTTP_TOO_MANY_REQUESTS:
+            return True
+        text = str(exc).lower()
+        if "rate limit" in text or "too many requests" in text:
+            return True
+        exc = exc.__cause__
+    return False
+
+
+class TokenBucket:
+    """Thread-safe token bucket with multiplicative backoff and additive recovery.
+
+    A rate of 0 (or less) disables limiting entirely.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: float | None = None,
+        min_rate: float | None = None,
+        max_rate: float | None = None,
+        backoff: float = 0.5,
+        increase_after: int = 10,
+        increase_step: float = 0.1,
+    ):
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1.0, rate)
+        self.min_rate = min_rate if min_rate is not None else rate / 16
+        self.max_rate = max_rate if max_rate is not None else rate * 4
+        self.backoff = backoff
+        self.increase_after = increase_after
+        self.increase_step = increase_step
+
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._successes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def unlimited(self) -> bool:
+        return self.rate <= 0
+
+    def _refill(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self):
+        """Block until a token is available, then consume it."""
+        if self.unlimited:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait_s = (1 - self._tokens) / self.rate
+            time.sleep(wait_s)
+
+    def on_success(self):
+        """Record a successful request; speed up after a run of successes."""
+        if self.unlimited:
+            return
+        with self._lock:
+            self._successes += 1
+            if self._successes >= self.increase_after:
+                self._successes = 0
+                self.rate = min(self.max_rate, self.rate * (1 + self.increase_step))
+
+    def on_throttle(self):
+        """Record a throttling response: cut the rate and drain queued tokens."""
+        if self.unlimited:
+            return
+        with self._lock:
+            self._successes = 0
+            self.rate = max(self.min_rate, self.rate * self.backoff)
+            self._refill(time.monotonic())
+            self._tokens = min(self._tokens, 0.0)
+
+
+def run_throttled(jobs, fn, limiter: TokenBucket, concurrency: int = 4, max_retries: int = 3):
+    """Run fn(job) for every job with at most `concurrency` calls in flight.
+
+    Each call first takes a token from `limiter`. Throttling errors are retried
+    up to `max_retries` times after backing the limiter off. Yields
+    (job, result, error) tuples in completion order; exactly one of result and
+    error is None.
+    """
+
+    def attempt(job):
+        for attempt_no in range(max_retries + 1):
+            limiter.acquire()
+            try:
+                result = fn(job)
+            except Exception as e:
+                if is_throttle_error(e) and attempt_no < max_retries:
+                    limiter.on_throttle()
+                    continue
+                if is_throttle_error(e):
+                    limiter.on_throttle()
+                raise
+            limiter.on_success()
+            return result
+
+    job_iter = iter(jobs)
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        in_flight = {}
+
+        def submit_next() -> bool:
+            for job in job_iter:
+                in_flight[pool.submit(attempt, job)] = job
+                return True
+            return False
+
+        for _ in range(max(1, concurrency)):
+            if not submit_next():
+                break
+
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                job = in_flight.pop(future)
+                error = future.exception()
+                yield job, (None if error else future.result()), error
+                submit_next()
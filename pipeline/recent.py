@@ -0,0 +1,195 @@
+from __future__ import annotations
+
+"""
+Recent-bar tail files next to the per-ticker base files.
+
+  public/data/tickers/{SYMBOL}.json         base: history up to the last compaction
+  public/data/tickers/recent/{SYMBOL}.json  tail: bars added since, same layout
+
+Step 03's daily top-ups only rewrite the small tail, so a base file (and any
+cache or sync holding it) stays valid until the next compaction. A ticker's
+series is its base merged with its tail, the tail winning on equal
+timestamps. Consumers read it with load_series() and detect changes with
+scan_series() / series_stat() / series_hash(), which cover both files.
+
+Steps that write a ticker's whole history (02, 05, the landing rebuild) use
+write_series(), which drops the tail. `run_pipeline.py compact` folds tails
+into their bases once their first bar is COMPACT_AFTER_DAYS old, so a base
+changes about once per period.
+"""
+
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+import paths
+from tickerfile import file_hash, merge_rows, read_meta
+from writer import OutputWriter
+
+RECENT_DIR = paths.RECENT_DIR
+
+# Tails whose first bar is at least this old are folded into the base by `compact`
+COMPACT_AFTER_DAYS = 28
+
+
+def recent_path(json_path: str) -> str:
+    """Tail file of a base ticker file."""
+    return os.path.join(os.path.dirname(json_path), "recent", os.path.basename(json_path))
+
+
+def _load_rows(path: str) -> list[list]:
+    with open(path, "r") as f:
+        return json.load(f).get("data") or []
+
+
+def base_rows(json_path: str) -> list[list]:
+    """Rows of a ticker's base file alone (none if it has no base)."""
+    return _load_rows(json_path) if os.path.exists(json_path) else []
+
+
+def tail_rows(json_path: str) -> list[list]:
+    """Rows of a ticker's recent tail (none if it has no tail)."""
+    tail = recent_path(json_path)
+    return _load_rows(tail) if os.path.exists(tail) else []
+
+
+def load_series(json_path: str) -> list[list]:
+    """A ticker's rows: its base file merged with its tail, if any."""
+    rows = base_rows(json_path)
+    tail = tail_rows(json_path)
+    return merge_rows(rows, tail) if tail else rows
+
+
+def series_meta(json_path: str) -> dict | None:
+    """First/last timestamp of a ticker's series, reading only the file edges."""
+    meta = read_meta(json_path)
+    tail = recent_path(json_path)
+    tail_meta = read_meta(tail) if os.path.exists(tail) else None
+    if meta is None or tail_meta is None:
+        return meta or tail_meta
+    return {
+        "first_ts": min(meta["first_ts"], tail_meta["first_ts"]),
+        "last_ts": max(meta["last_ts"], tail_meta["last_ts"]),
+    }
+
+
+def series_stat(json_path: str) -> tuple[int, int]:
+    """(size, mtime_ns) of a ticker's base and tail together."""
+    st = os.stat(json_path)
+    try:
+        tail = os.stat(recent_path(json_path))
+    except FileNotFoundError:
+        return st.st_size, st.st_mtime_ns
+    return st.st_size + tail.st_size, max(st.st_mtime_ns, tail.st_mtime_ns)
+
+
+def scan_series(tickers_dir: str = paths.TICKERS_DIR) -> dict[str, tuple[int, int]]:
+    """symbol -> series_stat() for every base file in `tickers_dir`, from two directory scans."""
+    series = {}
+    for entry in os.scandir(tickers_dir):
+        if entry.name.endswith(".json") and entry.is_file():
+            st = entry.stat()
+            series[entry.name[:-len(".json")]] = (st.st_size, st.st_mtime_ns)
+
+    recent_dir = os.path.join(tickers_dir, "recent")
+    if os.path.isdir(recent_dir):
+        for entry in os.scandir(recent_dir):
+            symbol = entry.name[:-len(".json")]
+            if entry.name.endswith(".json") and symbol in series:
+                st = entry.stat()
+                size, mtime_ns = series[symbol]
+                series[symbol] = (size + st.st_size, max(mtime_ns, st.st_mtime_ns))
+    return series
+
+
+def series_hash(json_path: str) -> str:
+    """Content hash of base and tail (the base's file_hash() alone when there is no tail)."""
+    tail = recent_path(json_path)
+    if not os.path.exists(tail):
+        return file_hash(json_path)
+    return file_hash(json_path) + file_hash(tail)
+
+
+def write_series(json_path: str, symbol: str, rows: list[list], writer: OutputWriter | None = None) -> bool:
+    """Write a ticker's whole history as its base file and drop its tail. Returns True if the base was written."""
+    writer = writer or OutputWriter()
+    written = writer.write_json(json_path, {"symbol": symbol, "data": rows})
+    tail = recent_path(json_path)
+    if os.path.exists(tail):
+        os.remove(tail)
+    return written
+
+
+def append_recent(json_path: str, symbol: str, new_rows: list[list], writer: OutputWriter | None = None) -> int:
+    """Merge timestamp-sorted `new_rows` into a ticker's tail; the base is not touched.
+
+    Returns the net number of rows added. An unchanged tail is not rewritten.
+    """
+    writer = writer or OutputWriter()
+    if not new_rows:
+        return 0
+    tail = recent_path(json_path)
+    old = _load_rows(tail) if os.path.exists(tail) else []
+    merged = merge_rows(old, new_rows)
+    os.makedirs(os.path.dirname(tail), exist_ok=True)
+    writer.write_json(tail, {"symbol": symbol, "data": merged})
+    return len(merged) - len(old)
+
+
+def compact_file(json_path: str) -> tuple[str, int, OutputWriter | None, str | None]:
+    """Process-pool worker: (symbol, tail rows folded, writer counters, error)."""
+    # columnar imports this module
+    from columnar import columnar_path, write_columnar
+
+    symbol = os.path.basename(json_path)[:-len(".json")]
+    try:
+        tail_rows = _load_rows(recent_path(json_path))
+        rows = load_series(json_path)
+        writer = OutputWriter()
+        write_series(json_path, symbol, rows, writer)
+        if rows:
+            # Same series, but the rewritten base would make the copy look stale
+            write_columnar(columnar_path(symbol), symbol, rows)
+        return symbol, len(tail_rows), writer, None
+    except Exception as e:
+        return symbol, 0, None, str(e)
+
+
+def compact_all(max_age_days: float = COMPACT_AFTER_DAYS, workers: int | None = None) -> int:
+    """Fold tails whose first bar is at least `max_age_days` old (0 = all) into their bases. Returns tickers compacted."""
+    if not os.path.isdir(RECENT_DIR):
+        print("[compact] No tail files found.")
+        return 0
+
+    cutoff = (datetime.now() - timedelta(days=max_age_days)).timestamp()
+    due = []
+    waiting = 0
+    for entry in os.scandir(RECENT_DIR):
+        if not (entry.name.endswith(".json") and entry.is_file()):
+            continue
+        meta = read_meta(entry.path)
+        if max_age_days <= 0 or meta is None or meta["first_ts"] <= cutoff:
+            due.append(os.path.join(paths.TICKERS_DIR, entry.name))
+        else:
+            waiting += 1
+    print(f"[compact] {len(due)} tails due (first bar {max_age_days:g}+ days old), {waiting} not yet")
+    if not due:
+        return 0
+
+    writer = OutputWriter()
+    compacted = folded = errors = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for symbol, rows, counts, error in pool.map(compact_file, sorted(due), chunksize=32):
+            if error is not None:
+                errors += 1
+                if errors <= 5:
+                    print(f"  Error on {symbol}: {error}")
+                continue
+            writer.add(counts)
+            compacted += 1
+            folded += rows
+
+    print(f"[compact] Folded {folded} bars into {compacted} base files ({errors} errors)")
+    print(f"[compact] Output: {writer.summary()}")
+    return compacted
@@ -1,18 +1,58 @@
 """
-Pipeline orchestrator: runs steps 01, 02, 04 in order.
+Pipeline orchestrator: runs the pipeline steps as a dependency graph (see
+dag.py), skipping steps whose inputs and outputs are unchanged since their
+last successful run, rebuilds every derived output offline from the raw
+landing zone, or compacts recent tail files into the ticker base files.
 
 Usage:
-  python run_pipeline.py                # Run all steps
+  python run_pipeline.py                # Run all steps that have work
   python run_pipeline.py --skip-download  # Skip ticker list download (use existing)
+  python run_pipeline.py --batch-size 100 --concurrency 8 --rate 2
+  python run_pipeline.py --skip-download --retry-failed   # re-download only failed symbols
+  python run_pipeline.py --from 04      # step 04 and everything downstream of it
+  python run_pipeline.py --only 07,08 --force   # just these, even if up to date
+  python run_pipeline.py rebuild --workers 8   # regenerate outputs from raw/landing, no network
+  python run_pipeline.py compact        # fold old recent tails into base files (e.g. weekly cron)
+  python run_pipeline.py compact --compact-after 0   # fold every tail
+  python run_pipeline.py --profile --trace-memory   # cProfile + tracemalloc in the run report
 
-Step 01: Download ticker lists from NASDAQ FTP
-Step 02: Download historical OHLCV via yfinance (batched, resumable)
-Step 04: Generate manifest.json
+  # Offline run against the synthetic provider (never touches public/data)
+  python run_pipeline.py --provider synthetic --data-dir /tmp/mh/data --raw-dir /tmp/mh/raw
+  python run_pipeline.py --provider synthetic --data-dir /tmp/mh/data --raw-dir /tmp/mh/raw --latency 0.5 --error-rate 0.01
+
+Steps (dependencies in brackets):
+  01 Download ticker lists from NASDAQ FTP               -> tickers.csv, universe diff
+  02 Download historical OHLCV via yfinance [01]         -> ticker files
+     (batched, concurrent, resumable from the raw/progress.sqlite journal)
+  03 Gap-fill recent bars [02]                           -> recent tail files
+  05 Download curated delisted tickers [02]              -> ticker files, tickers.csv
+  04 Generate manifest, stats, search index [03, 05]
+  06 Pack all series into raw/market.sqlite [03, 05] (with --build-store)
+  07 Weekly/monthly aggregates [03, 05]
+  08 Year shards [03, 05]
+  09 Close/volume panel [03, 05]
+  10 Pre-compressed .gz/.br siblings [04, 07, 08]
+
+03 and 05 run at the same time, on disjoint symbols; the CPU-bound steps
+(04, 06-10) each use all cores and run one at a time. Fingerprints live in raw/pipeline_state.json.
+
+Every run writes a report (step times, per-phase timers with latency
+histograms, bytes in/out, counters; see instrument.py) to
+raw/reports/<command>-<timestamp>.json and raw/reports/latest.json.
+
+rebuild: ticker files from raw/landing (see landing.py), then steps 04,
+         06 (with --build-store), 07, 08, 09 and 10; landing files no
+         longer needed for a rebuild are pruned
+compact: tickers/recent/{SYMBOL}.json tails whose first bar is --compact-after
+         days old are merged into tickers/{SYMBOL}.json (see recent.py),
+         then the same offline steps as rebuild (superseded landing
+         files are pruned first)
 """
 
 import sys
 import os
 import time
+import argparse
 import importlib.util
 
 
@@ -28,42 +68,273 @@ def load_module(step_num, filename):
     return module
 
 
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Market History data pipeline")
+    parser.add_argument("command", nargs="?", choices=["run", "rebuild", "compact"], default="run",
+                        help="run = download and publish, rebuild = regenerate outputs from the landing zone, "
+                             "compact = fold recent tail files into the ticker base files")
+    parser.add_argument("--skip-download", action="store_true",
+                        help="skip ticker list download (use existing tickers.csv)")
+    parser.add_argument("--refresh-universe", action="store_true",
+                        help="download the ticker list even if the snapshot is recent (step 01)")
+    parser.add_argument("--batch-size", type=int, default=None,
+                        help="tickers per batch request in steps 02/03 (an upper bound in step 02)")
+    parser.add_argument("--memory-budget", type=float, default=None, metavar="MB",
+                        help="memory for the batches in flight in step 02; batch sizes adapt to it")
+    parser.add_argument("--concurrency", type=int, default=None,
+                        help="batches in flight at once in step 02")
+    parser.add_argument("--rate", type=float, default=None,
+                        help="starting batch requests per second in step 02 (0 = unlimited)")
+    parser.add_argument("--retry-failed", action="store_true",
+                        help="in step 02, re-download only symbols whose last attempt failed")
+    parser.add_argument("--build-store", action="store_true",
+                        help="also pack all series into the consolidated SQLite store (step 06)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="worker processes for the CPU-bound steps (default: all cores)")
+    parser.add_argument("--compact-after", type=float, default=None, metavar="DAYS",
+                        help="compact: fold tails whose first bar is this many days old (0 = all; default 28)")
+    parser.add_argument("--profile", action="store_true",
+                        help="run under cProfile (all threads); top functions go into the run report")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="trace allocations with tracemalloc; per-step peaks go into the run report")
+
+    steps = parser.add_argument_group("step selection")
+    steps.add_argument("--only", help="comma-separated step ids to run, e.g. 04,07")
+    steps.add_argument("--from", dest="from_step", help="run this step and everything downstream of it")
+    steps.add_argument("--force", action="store_true",
+                       help="run the selected steps even if their inputs are unchanged")
+
+    data = parser.add_argument_group("data provider")
+    data.add_argument("--provider", choices=["live", "synthetic"], default="live",
+                      help="live = NASDAQ + yfinance, synthetic = deterministic offline data")
+    data.add_argument("--data-dir", help="output root instead of public/data")
+    data.add_argument("--raw-dir", help="working directory instead of pipeline/raw")
+    data.add_argument("--synthetic-tickers", type=int, default=11_880,
+                      help="universe size for the synthetic provider")
+    data.add_argument("--seed", type=int, default=0, help="synthetic provider seed")
+    data.add_argument("--latency", type=float, default=0.0,
+                      help="mean synthetic latency per request, seconds")
+    data.add_argument("--error-rate", type=float, default=0.0,
+                      help="synthetic per-request error probability")
+    data.add_argument("--throttle-rate", type=float, default=0.0,
+                      help="synthetic per-request throttling probability")
+    return parser.parse_args(argv)
+
+
+def build_provider(args):
+    from providers import get_provider
+
+    if args.provider == "synthetic":
+        return get_provider(
+            "synthetic",
+            n_symbols=args.synthetic_tickers,
+            seed=args.seed,
+            latency=args.latency,
+            error_rate=args.error_rate,
+            throttle_rate=args.throttle_rate,
+        )
+    return get_provider(args.provider)
+
+
+def download_pending(retry_failed: bool) -> bool:
+    """Step 02 has work if a listed symbol was never attempted, the universe diff has
+    new listings (or, with --retry-failed, any symbol failed)."""
+    import paths
+    from journal import Journal
+    from universe import pending_diff
+
+    if not os.path.exists(paths.TICKERS_CSV):
+        return True
+    diff = pending_diff("02")
+    if diff is not None and (diff["added"] or diff["renamed"]):
+        return True
+    symbols = {t["symbol"] for t in load_module("02", "02_parse_stooq.py").load_tickers()}
+    with Journal() as journal:
+        if retry_failed and journal.failed():
+            return True
+        return not symbols.issubset(journal.statuses())
+
+
+def build_steps(args, provider=None) -> list:
+    """The pipeline graph. `provider` is only needed by the download steps."""
+    import paths
+    from dag import Step
+    from journal import JOURNAL_PATH
+    from universe import DIFF_PATH, UNIVERSE_CSV
+
+    workers = args.workers
+    pipeline_dir = os.path.dirname(os.path.abspath(__file__))
+    delisted_csv = os.path.join(pipeline_dir, "delisted_tickers.csv")
+    tickers = [paths.TICKERS_CSV, paths.TICKERS_DIR]
+
+    def download():
+        step02 = load_module("02", "02_parse_stooq.py")
+        step02.download_all(
+            batch_size=args.batch_size or step02.BATCH_SIZE,
+            concurrency=args.concurrency or step02.CONCURRENCY,
+            rate=step02.REQUESTS_PER_SECOND if args.rate is None else args.rate,
+            provider=provider,
+            retry_failed=args.retry_failed,
+            memory_budget_mb=args.memory_budget or step02.MEMORY_BUDGET_MB,
+        )
+
+    def fill_gaps():
+        step03 = load_module("03", "03_fill_gaps_yfinance.py")
+        step03.fill_gaps(
+            provider=provider,
+            batch_size=args.batch_size or step03.BATCH_SIZE,
+            concurrency=args.concurrency or step03.CONCURRENCY,
+            rate=step03.REQUESTS_PER_SECOND if args.rate is None else args.rate,
+        )
+
+    return [
+        Step("01", "Download Ticker Lists",
+             lambda: load_module("01", "01_download_stooq.py").download_ticker_list(provider, args.refresh_universe),
+             outputs=[paths.TICKERS_CSV], always=True),
+        Step("02", "Download Historical Data", download, deps=["01"],
+             inputs=[paths.TICKERS_CSV], outputs=[JOURNAL_PATH],
+             pending=lambda: download_pending(args.retry_failed)),
+        Step("03", "Fill Recent Gaps", fill_gaps, deps=["02"],
+             outputs=[paths.TICKERS_DIR], always=True),
+        Step("05", "Download Delisted Tickers",
+             lambda: load_module("05", "05_download_delisted.py").main(provider), deps=["02"],
+             inputs=[delisted_csv, paths.TICKERS_CSV, DIFF_PATH], outputs=[paths.TICKERS_CSV]),
+        Step("04", "Generate Manifest",
+             lambda: load_module("04", "04_generate_manifest.py").generate_manifest(workers=workers),
+             deps=["03", "05"], inputs=tickers + [UNIVERSE_CSV, DIFF_PATH],
+             outputs=[paths.MANIFEST_PATH, paths.STATS_PATH, paths.SEARCH_DIR], cpu_bound=True),
+        Step("06", "Build Consolidated Store",
+             lambda: load_module("06", "06_build_store.py").build_store(workers=workers),
+             deps=["03", "05"], inputs=tickers, outputs=[paths.STORE_PATH], cpu_bound=True),
+        Step("07", "Build Aggregates",
+             lambda: load_module("07", "07_build_aggregates.py").build_aggregates(workers=workers),
+             deps=["03", "05"], inputs=[paths.TICKERS_DIR],
+             outputs=[paths.WEEKLY_DIR, paths.MONTHLY_DIR], cpu_bound=True),
+        Step("08", "Shard Tickers",
+             lambda: load_module("08", "08_shard_tickers.py").shard_tickers(workers=workers),
+             deps=["03", "05"], inputs=[paths.TICKERS_DIR], outputs=[paths.SHARDS_DIR], cpu_bound=True),
+        Step("09", "Build Panel",
+             lambda: load_module("09", "09_build_panel.py").build_panel(workers=workers),
+             deps=["03", "05"], inputs=[paths.TICKERS_DIR], outputs=[paths.PANEL_DIR], cpu_bound=True),
+        Step("10", "Compress Static Files",
+             lambda: load_module("10", "10_compress.py").compress_all(workers=workers),
+             deps=["04", "07", "08"], inputs=[paths.DATA_DIR], cpu_bound=True),
+    ]
+
+
+def select_steps(args, steps: list, default: set[str]) -> set[str]:
+    from dag import descendants
+
+    ids = {step.id for step in steps}
+    if args.only:
+        selected = {step_id.strip().zfill(2) for step_id in args.only.split(",")}
+    elif args.from_step:
+        selected = descendants({step.id: step for step in steps}, [args.from_step.zfill(2)]) & default
+    else:
+        selected = default
+    unknown = selected - ids
+    if unknown:
+        print(f"[!] Unknown step(s): {', '.join(sorted(unknown))}")
+        sys.exit(2)
+    return selected
+
+
+def run_steps(args, steps: list, selected: set[str]) -> bool:
+    from dag import run_dag
+
+    order = [step.id for step in steps if step.id in selected]
+    print(f"Steps: {', '.join(order)}{' (forced)' if args.force else ''}")
+    outcome = run_dag(steps, selected, force=args.force)
+
+    print(f"\n[pipeline] {'  '.join(f'{step_id}: {outcome.get(step_id)}' for step_id in order)}")
+    return not any(result in ("failed", "blocked") for result in outcome.values())
+
+
+def rebuild(args) -> bool:
+    """Regenerate ticker files and every downstream artifact from raw/landing."""
+    import landing
+
+    print("\n--- Rebuild Ticker Files From Landing Zone ---")
+    if not landing.rebuild_tickers(args.workers):
+        print("\n[!] Nothing to rebuild.")
+        sys.exit(1)
+    landing.prune_landing()
+
+    return run_offline_steps(args)
+
+
+def compact(args) -> bool:
+    """Fold recent tail files into their base files, then refresh what depends on them."""
+    import landing
+    import recent
+
+    print("\n--- Compact Recent Tails Into Base Files ---")
+    max_age = recent.COMPACT_AFTER_DAYS if args.compact_after is None else args.compact_after
+    landing.prune_landing()
+    if not recent.compact_all(max_age, args.workers):
+        return True
+    return run_offline_steps(args)
+
+
+def run_offline_steps(args) -> bool:
+    """Steps 04 and 06-10, which only read the ticker files."""
+    steps = build_steps(args)
+    offline = {"04", "07", "08", "09", "10"} | ({"06"} if args.build_store else set())
+    return run_steps(args, steps, select_steps(args, steps, offline))
+
+
 def main():
-    args = sys.argv[1:]
-    skip_download = "--skip-download" in args
+    args = parse_args()
+
+    if args.provider == "synthetic" and not (args.data_dir and args.raw_dir):
+        print("[!] --provider synthetic requires --data-dir and --raw-dir (refusing to overwrite real data)")
+        sys.exit(2)
+
+    # Must be set before the step modules (and paths.py) are loaded
+    if args.data_dir:
+        os.environ["MARKET_HISTORY_DATA_DIR"] = os.path.abspath(args.data_dir)
+    if args.raw_dir:
+        os.environ["MARKET_HISTORY_RAW_DIR"] = os.path.abspath(args.raw_dir)
 
+    import instrument
+
+    instrument.start(profile=args.profile, trace_memory=args.trace_memory)
     start = time.time()
     print("=" * 60)
     print("Market History Data Pipeline")
     print("=" * 60)
 
-    # Load modules
-    step01 = load_module("01", "01_download_stooq.py")
-    step02 = load_module("02", "02_parse_stooq.py")
-    step04 = load_module("04", "04_generate_manifest.py")
-
-    # Step 1: Download ticker list
-    if skip_download:
-        print("\n[01] Skipping ticker list download (--skip-download)")
+    if args.command == "rebuild":
+        ok = rebuild(args)
+    elif args.command == "compact":
+        ok = compact(args)
     else:
-        print("\n--- Step 1: Download Ticker Lists ---")
-        success = step01.download_ticker_list()
-        if not success:
-            print("\n[!] Ticker list download failed.")
-            sys.exit(1)
+        provider = build_provider(args)
+        if provider.name != "live":
+            print(f"Using {provider.name} data provider")
 
-    # Step 2: Download historical data via yfinance
-    print("\n--- Step 2: Download Historical Data (yfinance) ---")
-    step02.download_all()
+        steps = build_steps(args, provider)
+        default = {step.id for step in steps} - {"06"}
+        if args.build_store:
+            default.add("06")
+        if args.skip_download:
+            print("[01] Skipping ticker list download (--skip-download)")
+            default.discard("01")
+        ok = run_steps(args, steps, select_steps(args, steps, default))
 
-    # Step 4: Generate manifest
-    print("\n--- Step 4: Generate Manifest ---")
-    step04.generate_manifest()
+    report_path = instrument.report_path(args.command)
+    report = instrument.write_report(report_path)
+    print(f"\n[pipeline] Slowest phases:\n{instrument.summary(report)}")
+    if "memory" in report:
+        print(f"[pipeline] Traced memory peak: {report['memory']['peak_mb']} MB")
+    print(f"[pipeline] Run report: {report_path}")
 
     elapsed = time.time() - start
     print(f"\n{'=' * 60}")
-    print(f"Pipeline complete in {elapsed:.1f}s")
+    print(f"{args.command.capitalize() if args.command != 'run' else 'Pipeline'} {'complete' if ok else 'finished with failures'} in {elapsed:.1f}s")
     print("=" * 60)
+    if not ok:
+        sys.exit(1)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+"""
+Prefix-sharded search index over the manifest.
+
+  public/data/search/index.json   {"updated", "limit", "filler", "keys"}
+  public/data/search/{KEY}.json   ranked manifest entries for one prefix
+
+Keys are the lowercased first one or two characters of a symbol or of a word
+in the ticker name (the name start, or any word after a space that is not a
+filler word like "Inc" or "Common"). A client loads index.json once, then
+fetches the single shard for the first two characters of the query and
+filters it, instead of downloading and scanning the whole manifest.
+
+Entries are ranked the way useManifest.search always has: symbol prefix
+matches first, then name prefix matches, then later-word matches, each group
+in symbol order. One-character shards hold only the top LIMIT entries since a
+one-character query is the key itself; two-character shards are complete so
+longer queries can be filtered from them.
+
+Characters outside [a-z0-9] in a key are written as "_" plus two hex digits
+in the file name ("b." -> "b_2e"); keys with non-ASCII characters are skipped.
+"""
+
+import os
+
+import paths
+from writer import OutputWriter
+
+SEARCH_DIR = paths.SEARCH_DIR
+
+# Results returned per query (matches useManifest)
+LIMIT = 50
+
+# Words that appear in too many names to be worth indexing after the first
+FILLER_WORDS = {
+    "&", "-", "a", "adr", "ads", "and", "class", "co", "co.", "common", "company", "corp", "corp.",
+    "corporation", "depositary", "etf", "fund", "group", "holdings", "inc", "inc.", "limited", "llc",
+    "lp", "ltd", "ltd.", "n.v.", "of", "ordinary", "plc", "preferred", "s.a.", "share", "shares",
+    "stock", "the", "trust", "units", "warrant", "warrants",
+}
+
+SYMBOL_MATCH, NAME_MATCH, WORD_MATCH = 0, 1, 2
+
+
+def shard_name(key: str) -> str:
+    return "".join(c if c.isascii() and c.isalnum() else f"_{ord(c):02x}" for c in key)
+
+
+def word_starts(name: str) -> list[int]:
+    """Offsets of the indexed words in a lowercased name (always including 0)."""
+    starts = [0]
+    for i, c in enumerate(name):
+        if c == " " and i + 1 < len(name) and name[i + 1] != " ":
+            word = name[i + 1:].split(" ", 1)[0]
+            if word not in FILLER_WORDS:
+                starts.append(i + 1)
+    return starts
+
+
+def ticker_keys(ticker: dict) -> dict[str, int]:
+    """Every key a ticker is filed under, with its best rank for that key."""
+    keys = {}
+    symbol = ticker["s"].lower()
+    name = ticker["n"].lower()
+    candidates = [(symbol, SYMBOL_MATCH)]
+    candidates.extend((name[pos:], NAME_MATCH if pos == 0 else WORD_MATCH) for pos in word_starts(name))
+
+    for text, rank in candidates:
+        for size in (1, 2):
+            key = text[:size]
+            if len(key) < size or not key.isascii() or " " in key[:1]:
+                continue
+            if rank < keys.get(key, WORD_MATCH + 1):
+                keys[key] = rank
+    return keys
+
+
+def build_search_index(tickers: list[dict]) -> dict[str, list[dict]]:
+    """Map each key to its ranked entries. `tickers` must be sorted by symbol."""
+    ranked = {}
+    for ticker in tickers:
+        for key, rank in ticker_keys(ticker).items():
+            bucket = ranked.get(key)
+            if bucket is None:
+                bucket = ranked[key] = ([], [], [])
+            bucket[rank].append(ticker)
+
+    index = {}
+    for key, groups in ranked.items():
+        entries = groups[SYMBOL_MATCH] + groups[NAME_MATCH] + groups[WORD_MATCH]
+        index[key] = entries[:LIMIT] if len(key) == 1 else entries
+    return index
+
+
+def write_search_index(
+    tickers: list[dict], updated: str, out_dir: str = SEARCH_DIR, writer: OutputWriter | None = None
+) -> tuple[int, int]:
+    """Write all shards plus index.json and drop shards for keys that vanished.
+
+    Unchanged shards are left untouched. Returns (shard count, total bytes).
+    """
+    writer = writer or OutputWriter()
+    index = build_search_index(tickers)
+    os.makedirs(out_dir, exist_ok=True)
+
+    keep = {"index.json"}
+    before = writer.bytes_written + writer.bytes_skipped
+    for key in sorted(index):
+        filename = f"{shard_name(key)}.json"
+        keep.add(filename)
+        writer.write_json(os.path.join(out_dir, filename), index[key])
+    writer.write_json(os.path.join(out_dir, "index.json"), {
+        "updated": updated,
+        "limit": LIMIT,
+        "filler": sorted(FILLER_WORDS),
+        "keys": sorted(index),
+    })
+
+    for name in os.listdir(out_dir):
+        if name.endswith(".json") and name not in keep:
+            os.remove(os.path.join(out_dir, name))
+
+    return len(index), writer.bytes_written + writer.bytes_skipped - before
@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+"""
+Year-sharded copies of the per-ticker series.
+
+  public/data/shards/{SYMBOL}/index.json   chunk list with date bounds and sizes
+  public/data/shards/{SYMBOL}/{YEAR}.json  {"symbol", "year", "data": [...]}
+
+A client showing a 1Y range reads the index and fetches only the one or two
+chunks that overlap it instead of the full history. Chunks whose content did
+not change are left untouched, so resharding after a daily update normally
+rewrites only the current year's chunk.
+"""
+
+import json
+import os
+from datetime import datetime, timezone
+
+import paths
+from writer import OutputWriter
+
+SHARDS_DIR = paths.SHARDS_DIR
+
+
+def shard_dir(symbol: str) -> str:
+    return os.path.join(SHARDS_DIR, symbol)
+
+
+def year_of(ts: int) -> int:
+    return datetime.fromtimestamp(ts, tz=timezone.utc).year
+
+
+def to_date(ts: int) -> str:
+    return datetime.fromtimestamp(ts, tz=timezone.utc).strftime("%Y-%m-%d")
+
+
+def split_by_year(rows: list[list]) -> dict[int, list[list]]:
+    """Group sorted rows into contiguous per-year lists."""
+    chunks = {}
+    for row in rows:
+        year = year_of(row[0])
+        chunk = chunks.get(year)
+        if chunk is None:
+            chunk = chunks[year] = []
+        chunk.append(row)
+    return chunks
+
+
+def _write(path: str, obj: dict, writer: OutputWriter) -> int:
+    payload = json.dumps(obj, separators=(",", ":")).encode()
+    writer.write_bytes(path, payload)
+    return len(payload)
+
+
+def _write_chunk(symbol: str, year: int, rows: list[list], writer: OutputWriter) -> dict:
+    size = _write(os.path.join(shard_dir(symbol), f"{year}.json"), {"symbol": symbol, "year": year, "data": rows}, writer)
+    return {"year": year, "from": to_date(rows[0][0]), "to": to_date(rows[-1][0]), "rows": len(rows), "bytes": size}
+
+
+def load_index(symbol: str) -> dict | None:
+    path = os.path.join(shard_dir(symbol), "index.json")
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def _write_index(symbol: str, chunks: list[dict], writer: OutputWriter):
+    _write(os.path.join(shard_dir(symbol), "index.json"), {"symbol": symbol, "chunks": chunks}, writer)
+
+
+def write_shards(symbol: str, rows: list[list], writer: OutputWriter | None = None) -> int:
+    """(Re)write all chunks and the index for one ticker. Returns the chunk count.
+
+    Chunks whose content did not change are left untouched.
+    """
+    writer = writer or OutputWriter()
+    os.makedirs(shard_dir(symbol), exist_ok=True)
+    by_year = split_by_year(rows)
+    chunks = [_write_chunk(symbol, year, by_year[year], writer) for year in sorted(by_year)]
+
+    # Drop chunk files for years that no longer have data
+    keep = {f"{year}.json" for year in by_year} | {"index.json"}
+    for name in os.listdir(shard_dir(symbol)):
+        if name.endswith(".json") and name not in keep:
+            os.remove(os.path.join(shard_dir(symbol), name))
+
+    _write_index(symbol, chunks, writer)
+    return len(chunks)
+
+
+def load_range(symbol: str, start: str | None = None, end: str | None = None) -> list[list]:
+    """Rows between two inclusive 'YYYY-MM-DD' dates, reading only overlapping chunks."""
+    index = load_index(symbol)
+    if index is None:
+        return []
+
+    rows = []
+    for chunk in index["chunks"]:
+        if (start and chunk["to"] < start) or (end and chunk["from"] > end):
+            continue
+        with open(os.path.join(shard_dir(symbol), f"{chunk['year']}.json"), "r") as f:
+            data = json.load(f)["data"]
+        rows.extend(r for r in data if (not start or to_date(r[0]) >= start) and (not end or to_date(r[0]) <= end))
+    return rows
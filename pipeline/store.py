@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+"""
+Query API for the consolidated market store (raw/market.sqlite).
+
+The store is built by 06_build_store.py from the per-ticker files. Bars are
+kept in a WITHOUT ROWID table clustered on (symbol_id, ts), so a date slice
+of one ticker is a B-tree range lookup rather than a full file parse.
+
+Usage:
+  from store import MarketStore
+
+  with MarketStore() as store:
+      for info in store.iter_symbols():
+          ...
+      rows = store.get_bars("AAPL", "2020-01-01", "2020-12-31")
+"""
+
+import sqlite3
+from datetime import datetime, timezone
+
+import paths
+
+STORE_PATH = paths.STORE_PATH
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS symbols (
+    id INTEGER PRIMARY KEY,
+    symbol TEXT NOT NULL UNIQUE,
+    name TEXT,
+    exchange TEXT,
+    first_ts INTEGER,
+    last_ts INTEGER,
+    rows INTEGER NOT NULL DEFAULT 0,
+    size INTEGER,
+    mtime_ns INTEGER
+);
+CREATE TABLE IF NOT EXISTS bars (
+    symbol_id INTEGER NOT NULL,
+    ts INTEGER NOT NULL,
+    open REAL,
+    high REAL,
+    low REAL,
+    close REAL,
+    volume INTEGER,
+    PRIMARY KEY (symbol_id, ts)
+) WITHOUT ROWID;
+"""
+
+
+def date_to_ts(date: str, end: bool = False) -> int:
+    """'YYYY-MM-DD' -> epoch seconds at the start (or end) of that UTC day."""
+    ts = int(datetime.strptime(date, "%Y-%m-%d").replace(tzinfo=timezone.utc).timestamp())
+    return ts + 86399 if end else ts
+
+
+def connect(path: str = STORE_PATH, readonly: bool = False) -> sqlite3.Connection:
+    if readonly:
+        return sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+class MarketStore:
+    """Read-only access to the consolidated store."""
+
+    def __init__(self, path: str = STORE_PATH):
+        self.conn = connect(path, readonly=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def iter_symbols(self):
+        """Yield {symbol, name, exchange, first_ts, last_ts, rows} for every ticker, by symbol."""
+        cursor = self.conn.execute(
+            "SELECT symbol, name, exchange, first_ts, last_ts, rows FROM symbols ORDER BY symbol"
+        )
+        for symbol, name, exchange, first_ts, last_ts, rows in cursor:
+            yield {
+                "symbol": symbol,
+                "name": name,
+                "exchange": exchange,
+                "first_ts": first_ts,
+                "last_ts": last_ts,
+                "rows": rows,
+            }
+
+    def date_range(self, symbol: str) -> tuple[int, int] | None:
+        """(first_ts, last_ts) of a ticker, or None if it is not in the store."""
+        row = self.conn.execute(
+            "SELECT first_ts, last_ts FROM symbols WHERE symbol = ?", (symbol,)
+        ).fetchone()
+        return tuple(row) if row else None
+
+    def get_bars(self, symbol: str, start: str | None = None, end: str | None = None) -> list[list]:
+        """Compact [ts, o, h, l, c, v] rows for `symbol` between two inclusive dates."""
+        lo = date_to_ts(start) if start else -(2 ** 62)
+        hi = date_to_ts(end, end=True) if end else 2 ** 62
+        cursor = self.conn.execute(
+            """
+            SELECT b.ts, b.open, b.high, b.low, b.close, b.volume
+            FROM bars b JOIN symbols s ON s.id = b.symbol_id
+            WHERE s.symbol = ? AND b.ts BETWEEN ? AND ?
+            ORDER BY b.ts
+            """,
+            (symbol, lo, hi),
+        )
+        return [list(row) for row in cursor]
@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+"""
+Low-level helpers for the compact per-ticker JSON files.
+
+Files look like {"symbol":"AAPL","data":[[ts,o,h,l,c,v],...]} with rows sorted
+by timestamp. Most consumers only need the first/last timestamp, which can be
+read from a few KB at each end of the file instead of decoding the whole
+array.
+"""
+
+import hashlib
+import json
+import os
+import re
+
+# How many bytes to read at each end of a file when looking for a row
+EDGE_BYTES = 4096
+
+_HEAD_RE = re.compile(rb'"data"\s*:\s*\[\s*(?:\[\s*(-?\d+)|(\]))')
+_TAIL_RE = re.compile(rb'\[\s*(-?\d+)\s*,[^\[\]]*\]\s*\]\s*\}\s*$')
+
+
+def _read_edges(path: str) -> tuple[bytes, bytes]:
+    with open(path, "rb") as f:
+        head = f.read(EDGE_BYTES)
+        size = os.fstat(f.fileno()).st_size
+        if size <= EDGE_BYTES:
+            return head, head
+        f.seek(size - EDGE_BYTES)
+        return head, f.read()
+
+
+def _read_meta_slow(path: str) -> dict | None:
+    with open(path, "r") as f:
+        data = json.load(f).get("data")
+    if not data:
+        return None
+    return {"first_ts": data[0][0], "last_ts": data[-1][0]}
+
+
+def read_meta(path: str) -> dict | None:
+    """First/last timestamp of a ticker file.
+
+    Returns None when the file has no rows. Falls back to a full json.load
+    if the file is not in the expected compact layout.
+    """
+    head, tail = _read_edges(path)
+    head_match = _HEAD_RE.search(head)
+    tail_match = _TAIL_RE.search(tail)
+    if head_match is None or (head_match.group(1) is not None and tail_match is None):
+        return _read_meta_slow(path)
+
+    if head_match.group(2) is not None:
+        return None  # "data":[]
+    return {"first_ts": int(head_match.group(1)), "last_ts": int(tail_match.group(1))}
+
+
+def merge_rows(old: list[list], new: list[list]) -> list[list]:
+    """Linear merge of two timestamp-sorted row lists; `new` wins on equal timestamps."""
+    merged = []
+    i = j = 0
+    while i < len(old) and j < len(new):
+        if old[i][0] < new[j][0]:
+            merged.append(old[i])
+            i += 1
+        else:
+            if old[i][0] == new[j][0]:
+                i += 1
+            merged.append(new[j])
+            j += 1
+    merged.extend(old[i:])
+    merged.extend(new[j:])
+    return merged
+
+
+def file_hash(path: str, chunk_size: int = 1 << 20) -> str:
+    """Hex content hash of a file (BLAKE2b, 128-bit)."""
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def scan_meta(path: str, with_hash: bool = False) -> tuple[str, dict | None, str | None]:
+    """Process-pool worker: (path, meta, error message).
+
+    With `with_hash`, meta also carries the file's content hash (and is a dict
+    even when the file has no rows, so the empty result can be cached).
+    """
+    try:
+        meta = read_meta(path)
+        if with_hash:
+            meta = dict(meta or {}, hash=file_hash(path))
+        return path, meta, None
+    except Exception as e:
+        return path, None, str(e)
@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+"""
+Per-ticker summary stats, computed by step 04 and written to
+public/data/stats.json:
+
+  {"updated": "YYYY-MM-DD", "fields": [...], "tickers": {"AAPL": [...], ...}}
+
+Each ticker row holds the values of FIELDS in order, so the whole universe can
+be ranked or screened from one file instead of loading every series. Prices
+are split-adjusted closes/highs/lows as stored in the ticker files; returns
+are fractions (0.12 = +12%) and are null when the history does not reach back
+far enough.
+
+Windows are anchored on the ticker's own last bar and use the same calendar
+arithmetic as the frontend date presets (JS Date.setMonth/setFullYear), and a
+window's return is measured from its first bar, like calculateGain().
+"""
+
+import calendar
+from datetime import date
+
+import numpy as np
+
+from columnar import ensure_bars
+from recent import series_hash, series_meta
+
+FIELDS = [
+    "last", "prev",
+    "high", "high_date", "low", "low_date",
+    "high_52w", "low_52w",
+    "ret_1m", "ret_1y", "ret_5y",
+    "avg_volume",
+]
+
+# Bars averaged for avg_volume (about three months of sessions)
+AVG_VOLUME_BARS = 63
+
+
+def shift_date(d: date, months: int = 0, years: int = 0) -> date:
+    """Subtract months/years like JS Date: day overflow rolls into the next month."""
+    month_index = (d.year - years) * 12 + (d.month - 1) - months
+    year, month = divmod(month_index, 12)
+    month += 1
+    days_in_month = calendar.monthrange(year, month)[1]
+    if d.day <= days_in_month:
+        return date(year, month, d.day)
+    # e.g. Mar 31 - 1 month -> "Feb 31" -> Mar 3 (or 2 in leap years)
+    year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return date(year, month, d.day - days_in_month)
+
+
+def _day_str(day: int) -> str:
+    return str(np.datetime64(int(day), "D"))
+
+
+def _round(value: float, digits: int) -> float | None:
+    return None if not np.isfinite(value) else round(float(value), digits)
+
+
+def compute_stats(day: np.ndarray, high: np.ndarray, low: np.ndarray, close: np.ndarray, volume: np.ndarray) -> list | None:
+    """One FIELDS row for a ticker's sorted bars, or None if it has none."""
+    if len(day) == 0:
+        return None
+
+    last_date = np.datetime64(int(day[-1]), "D").astype(object)
+
+    def window_start(months: int = 0, years: int = 0) -> int | None:
+        """Index of the first bar on or after the window start, or None if history is too short."""
+        start = (np.datetime64(shift_date(last_date, months, years), "D") - np.datetime64(0, "D")).astype(int)
+        if day[0] > start:
+            return None
+        return int(np.searchsorted(day, start, side="left"))
+
+    def ret(start: int | None) -> float | None:
+        if start is None or not close[start] > 0:
+            return None
+        return _round(close[-1] / close[start] - 1, 6)
+
+    # nanargmax/nanargmin raise on all-NaN columns
+    hi = int(np.nanargmax(high)) if np.isfinite(high).any() else None
+    lo = int(np.nanargmin(low)) if np.isfinite(low).any() else None
+
+    start_52w = window_start(years=1)
+    if start_52w is None:
+        start_52w = 0
+    high_52w = high[start_52w:]
+    low_52w = low[start_52w:]
+
+    return [
+        _round(close[-1], 4),
+        _round(close[-2], 4) if len(close) > 1 else None,
+        _round(high[hi], 4) if hi is not None else None,
+        _day_str(day[hi]) if hi is not None else None,
+        _round(low[lo], 4) if lo is not None else None,
+        _day_str(day[lo]) if lo is not None else None,
+        _round(np.nanmax(high_52w), 4) if np.isfinite(high_52w).any() else None,
+        _round(np.nanmin(low_52w), 4) if np.isfinite(low_52w).any() else None,
+        ret(window_start(months=1)),
+        ret(window_start(years=1)),
+        ret(window_start(years=5)),
+        int(np.mean(volume[-AVG_VOLUME_BARS:], dtype=np.float64)),
+    ]
+
+
+def scan_stats(path: str) -> tuple[str, dict | None, str | None]:
+    """Process-pool worker: (path, meta, error message).
+
+    Like tickerfile.scan_meta(path, with_hash=True) over the base and recent
+    tail (see recent.py): the date range comes from the file edges, without a
+    full parse. The stats row is computed from the memory-mapped columnar copy
+    of the base (rebuilt from the JSON first when it is missing or stale) with
+    the tail merged in.
+    """
+    try:
+        meta = {"hash": series_hash(path), "stats": None}
+        edges = series_meta(path)
+        if edges is not None:
+            meta.update(edges)
+            bars = ensure_bars(path)
+            meta["stats"] = compute_stats(bars.day, bars.high, bars.low, bars.close, bars.volume)
+        return path, meta, None
+    except Exception as e:
+        return path, None, str(e)
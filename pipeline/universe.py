@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+"""
+Listed-symbol universe snapshots and the diff between consecutive ones.
+
+Step 01 keeps the exchange listing it downloaded in raw/universe.csv (the
+one before it in raw/universe.prev.csv) and writes the difference to
+raw/universe_diff.json:
+
+  {"id": "20260101T060000", "previous": 11870, "current": 11880,
+   "added": [row, ...], "removed": [row, ...],
+   "changed": [{"symbol", "before": row, "after": row}, ...],
+   "renamed": [{"from": row, "to": row}, ...]}
+
+Rows are {symbol, name, exchange, type}. A removed and an added symbol with
+the same name and exchange count as one rename. Steps 02, 04 and 05 act on
+the diff once each and record that in raw/universe_diff.consumed.json (kept
+apart so the diff itself only changes when the universe does):
+
+  02 downloads added and renamed-to symbols, even if the journal has them
+  04 patches changed manifest entries and marks removed symbols inactive
+  05 makes a final full download of removed (newly delisted) symbols
+
+A new diff does not overwrite one that some of those steps have not acted on
+yet: the two are folded into a single diff from the older diff's starting
+listing to the new one, with a new id (and the folded ids under "merged"), so
+every step sees the combined change once.
+"""
+
+import csv
+import io
+import json
+import os
+
+import paths
+from writer import OutputWriter
+
+UNIVERSE_CSV = os.path.join(paths.RAW_DIR, "universe.csv")
+PREVIOUS_CSV = os.path.join(paths.RAW_DIR, "universe.prev.csv")
+DIFF_PATH = os.path.join(paths.RAW_DIR, "universe_diff.json")
+CONSUMED_PATH = os.path.join(paths.RAW_DIR, "universe_diff.consumed.json")
+
+FIELDS = ["symbol", "name", "exchange", "type"]
+# Attributes whose change is reported (type flips are listing-feed noise)
+TRACKED = ["name", "exchange"]
+# Steps that act on a diff; it is pending until all of them have
+CONSUMERS = ["02", "04", "05"]
+
+
+def read_rows(path: str) -> dict[str, dict]:
+    """symbol -> row for a universe or tickers CSV (empty if missing)."""
+    rows = {}
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            for row in csv.DictReader(f):
+                rows[row["symbol"]] = {field: row.get(field, "") for field in FIELDS}
+    return rows
+
+
+def write_rows(path: str, rows: list[dict], writer: OutputWriter | None = None) -> bool:
+    """Write rows as CSV; an identical file is left untouched. Returns True if written."""
+    buf = io.StringIO(newline="")
+    csv_writer = csv.DictWriter(buf, fieldnames=FIELDS, extrasaction="ignore")
+    csv_writer.writeheader()
+    csv_writer.writerows(rows)
+    return (writer or OutputWriter()).write_bytes(path, buf.getvalue().encode())
+
+
+def diff_universe(old: dict[str, dict], new: dict[str, dict]) -> dict:
+    added = [new[s] for s in sorted(set(new) - set(old))]
+    removed = [old[s] for s in sorted(set(old) - set(new))]
+    changed = [
+        {"symbol": s, "before": old[s], "after": new[s]}
+        for s in sorted(set(old) & set(new))
+        if any(old[s][field] != new[s][field] for field in TRACKED)
+    ]
+
+    # Pair up renames: same name and exchange, unique on both sides
+    def by_key(rows):
+        keys = {}
+        for row in rows:
+            keys.setdefault((row["name"], row["exchange"]), []).append(row)
+        return keys
+
+    added_by_key, removed_by_key = by_key(added), by_key(removed)
+    renamed = []
+    for key, gone in removed_by_key.items():
+        new_rows = added_by_key.get(key, [])
+        if key[0] and len(gone) == 1 and len(new_rows) == 1:
+            renamed.append({"from": gone[0], "to": new_rows[0]})
+    renamed_from = {r["from"]["symbol"] for r in renamed}
+    renamed_to = {r["to"]["symbol"] for r in renamed}
+
+    return {
+        "previous": len(old),
+        "current": len(new),
+        "added": [row for row in added if row["symbol"] not in renamed_to],
+        "removed": [row for row in removed if row["symbol"] not in renamed_from],
+        "changed": changed,
+        "renamed": renamed,
+    }
+
+
+def undo_diff(diff: dict, rows: dict[str, dict]) -> dict[str, dict]:
+    """The listing `diff` was computed from, given the one it led to (`rows`)."""
+    base = dict(rows)
+    for row in diff["added"]:
+        base.pop(row["symbol"], None)
+    for r in diff["renamed"]:
+        base.pop(r["to"]["symbol"], None)
+        base[r["from"]["symbol"]] = r["from"]
+    for row in diff["removed"]:
+        base[row["symbol"]] = row
+    for c in diff["changed"]:
+        base[c["symbol"]] = c["before"]
+    return base
+
+
+def save_diff(diff: dict, diff_id: str, previous: dict[str, dict], current: dict[str, dict]) -> dict:
+    """Write the diff from `previous` to `current`, folded into a pending one. Returns the diff written."""
+    pending = load_diff()
+    if pending is not None and not set(CONSUMERS) <= set(_consumed(pending["id"])):
+        merged = pending.get("merged", []) + [pending["id"]]
+        diff = dict(diff_universe(undo_diff(pending, previous), current), merged=merged)
+    diff = dict(diff, id=diff_id)
+    OutputWriter().write_bytes(DIFF_PATH, json.dumps(diff, indent=1).encode())
+    return diff
+
+
+def load_diff() -> dict | None:
+    if not os.path.exists(DIFF_PATH):
+        return None
+    with open(DIFF_PATH, "r") as f:
+        return json.load(f)
+
+
+def _consumed(diff_id: str) -> list[str]:
+    if os.path.exists(CONSUMED_PATH):
+        with open(CONSUMED_PATH, "r") as f:
+            consumed = json.load(f)
+        if consumed.get("id") == diff_id:
+            return consumed["steps"]
+    return []
+
+
+def pending_diff(step: str) -> dict | None:
+    """The latest diff if `step` has not acted on it yet."""
+    diff = load_diff()
+    if diff is None or step in _consumed(diff["id"]):
+        return None
+    return diff
+
+
+def mark_consumed(step: str, diff: dict):
+    steps = _consumed(diff["id"])
+    if step not in steps:
+        OutputWriter().write_json(CONSUMED_PATH, {"id": diff["id"], "steps": sorted(steps + [step])})
+
+
+def describe(diff: dict) -> str:
+    return (
+        f"{len(diff['added'])} added, {len(diff['removed'])} removed, "
+        f"{len(diff['changed'])} changed, {len(diff['renamed'])} renamed"
+    )
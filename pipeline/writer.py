@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+"""
+Atomic output writes that leave unchanged files alone.
+
+Every output is serialized in memory first. If a file of the same size
+already exists, its content is compared with the payload, and an identical
+file is skipped: its bytes and mtime stay as they are, so rsync/CDN syncs and
+the mtime-based incremental steps only see files whose content changed. A
+changed file is written to a temp file next to the target and renamed over
+it, so a crash never leaves a half-written file.
+
+Usage:
+  writer = OutputWriter()
+  writer.write_json(path, {"symbol": symbol, "data": rows})
+  print(f"[02] {writer.summary()}")
+"""
+
+import json
+import os
+
+import instrument
+
+
+class OutputWriter:
+    """Writes files atomically and counts written vs. unchanged files and bytes."""
+
+    def __init__(self):
+        self.written = 0
+        self.skipped = 0
+        self.bytes_written = 0
+        self.bytes_skipped = 0
+
+    def write_bytes(self, path: str, payload: bytes) -> bool:
+        """Write `payload` to `path` unless it already holds exactly that. Returns True if written."""
+        with instrument.timer("write.file") as t:
+            try:
+                if os.path.getsize(path) == len(payload):
+                    with open(path, "rb") as f:
+                        t.bytes_in = len(payload)
+                        if f.read() == payload:
+                            self.skipped += 1
+                            self.bytes_skipped += len(payload)
+                            instrument.count("write.unchanged")
+                            return False
+            except FileNotFoundError:
+                pass
+
+            tmp_path = f"{path}.tmp{os.getpid()}"
+            try:
+                with open(tmp_path, "wb") as f:
+                    f.write(payload)
+                os.replace(tmp_path, path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            t.bytes_out = len(payload)
+            self.written += 1
+            self.bytes_written += len(payload)
+            return True
+
+    def write_json(self, path: str, obj) -> bool:
+        """Compact JSON (same bytes as json.dump(obj, f, separators=(",", ":")))."""
+        with instrument.timer("serialize") as t:
+            payload = json.dumps(obj, separators=(",", ":")).encode()
+            t.bytes_out = len(payload)
+        return self.write_bytes(path, payload)
+
+    def add(self, other: OutputWriter):
+        """Fold in the counters of another writer (e.g. one used in a worker process)."""
+        self.written += other.written
+        self.skipped += other.skipped
+        self.bytes_written += other.bytes_written
+        self.bytes_skipped += other.bytes_skipped
+
+    def summary(self) -> str:
+        return (
+            f"{self.written} files written ({self.bytes_written / 1024 / 1024:.1f} MB), "
+            f"{self.skipped} unchanged ({self.bytes_skipped / 1024 / 1024:.1f} MB)"
+        )
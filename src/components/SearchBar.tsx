@@ -3,7 +3,7 @@ import type { ManifestTicker } from '../types';
 
 interface SearchBarProps {
   onSelect: (ticker: ManifestTicker) => void;
-  search: (query: string) => ManifestTicker[];
+  search: (query: string) => Promise<ManifestTicker[]>;
   loading: boolean;
   selectedSymbols?: string[];
   maxReached?: boolean;
@@ -18,15 +18,19 @@ export function SearchBar({ onSelect, search, loading, selectedSymbols = [], max
   const inputRef = useRef<HTMLInputElement>(null);
   const containerRef = useRef<HTMLDivElement>(null);
   const debounceRef = useRef<ReturnType<typeof setTimeout>>(undefined);
+  const latestQueryRef = useRef('');
 
   const doSearch = useCallback(
-    (q: string) => {
+    async (q: string) => {
+      latestQueryRef.current = q;
       if (!q.trim()) {
         setResults([]);
         setIsOpen(false);
         return;
       }
-      const matches = search(q.trim());
+      const matches = await search(q.trim()).catch(() => []);
+      // Ignore answers to queries the user has already typed past
+      if (latestQueryRef.current !== q) return;
       setResults(matches);
       setIsOpen(matches.length > 0);
       setActiveIndex(-1);
@@ -42,6 +46,7 @@ export function SearchBar({ onSelect, search, loading, selectedSymbols = [], max
 
   const handleSelect = (ticker: ManifestTicker) => {
     if (selectedSymbols.includes(ticker.s)) return;
+    latestQueryRef.current = '';
     setQuery('');
     setIsOpen(false);
     setResults([]);
@@ -1,19 +1,43 @@
-import { useState, useEffect, useMemo, useCallback } from 'react';
-import type { Manifest, ManifestTicker } from '../types';
+import { useState, useEffect, useCallback } from 'react';
+import type { ManifestTicker, SearchIndex } from '../types';
+
+// Prefix shards already fetched, keyed by shard key (shared across mounts)
+const shardCache = new Map<string, Promise<ManifestTicker[]>>();
+
+// Mirrors searchindex.shard_name: characters outside [a-z0-9] become "_" + hex
+function shardName(key: string): string {
+  return Array.from(key)
+    .map((c) => (/[a-z0-9]/.test(c) ? c : `_${c.charCodeAt(0).toString(16).padStart(2, '0')}`))
+    .join('');
+}
+
+function loadShard(key: string): Promise<ManifestTicker[]> {
+  let shard = shardCache.get(key);
+  if (!shard) {
+    shard = fetch(`/data/search/${shardName(key)}.json`).then((res) => {
+      if (!res.ok) throw new Error(`Failed to load search shard: ${res.status}`);
+      return res.json();
+    });
+    // Drop failed loads so the next keystroke retries
+    shard.catch(() => shardCache.delete(key));
+    shardCache.set(key, shard);
+  }
+  return shard;
+}
 
 export function useManifest() {
-  const [manifest, setManifest] = useState<Manifest | null>(null);
+  const [index, setIndex] = useState<SearchIndex | null>(null);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
 
   useEffect(() => {
-    fetch('/data/manifest.json')
+    fetch('/data/search/index.json')
       .then((res) => {
-        if (!res.ok) throw new Error(`Failed to load manifest: ${res.status}`);
+        if (!res.ok) throw new Error(`Failed to load search index: ${res.status}`);
         return res.json();
       })
-      .then((data: Manifest) => {
-        setManifest(data);
+      .then((data: SearchIndex) => {
+        setIndex(data);
         setLoading(false);
       })
       .catch((err) => {
@@ -22,49 +46,38 @@ export function useManifest() {
       });
   }, []);
 
-  const tickerMap = useMemo(() => {
-    if (!manifest) return new Map<string, ManifestTicker>();
-    const map = new Map<string, ManifestTicker>();
-    for (const t of manifest.tickers) {
-      map.set(t.s, t);
-    }
-    return map;
-  }, [manifest]);
-
   const search = useCallback(
-    (query: string): ManifestTicker[] => {
-      if (!manifest || !query) return [];
-      const q = query.toUpperCase();
-      const results: ManifestTicker[] = [];
+    async (query: string): Promise<ManifestTicker[]> => {
+      if (!index || !query) return [];
+      const q = query.toLowerCase();
+      const key = q.slice(0, 2);
+      if (!index.keys.includes(key)) return [];
 
-      // Symbol prefix matches first
-      for (const t of manifest.tickers) {
-        if (t.s.startsWith(q)) {
-          results.push(t);
-          if (results.length >= 50) return results;
-        }
-      }
+      const shard = await loadShard(key);
+      // Shards are pre-ranked for their own key
+      if (q.length <= 2) return shard.slice(0, index.limit);
 
-      // Then name prefix matches
-      const qLower = query.toLowerCase();
-      for (const t of manifest.tickers) {
-        if (t.n.toLowerCase().startsWith(qLower) && !t.s.startsWith(q)) {
-          results.push(t);
-          if (results.length >= 50) return results;
+      // Symbol prefix matches first, then name prefix, then later words in the name
+      const filler = new Set(index.filler);
+      const rank = (t: ManifestTicker): number => {
+        if (t.s.toLowerCase().startsWith(q)) return 0;
+        const name = t.n.toLowerCase();
+        if (name.startsWith(q)) return 1;
+        for (let pos = name.indexOf(' ' + q); pos !== -1; pos = name.indexOf(' ' + q, pos + 1)) {
+          if (!filler.has(name.slice(pos + 1).split(' ', 1)[0])) return 2;
         }
-      }
-
-      return results;
-    },
-    [manifest]
-  );
+        return -1;
+      };
 
-  const getTicker = useCallback(
-    (symbol: string): ManifestTicker | undefined => {
-      return tickerMap.get(symbol);
+      return shard
+        .map((t) => ({ t, r: rank(t) }))
+        .filter(({ r }) => r >= 0)
+        .sort((a, b) => a.r - b.r || (a.t.s < b.t.s ? -1 : a.t.s > b.t.s ? 1 : 0))
+        .slice(0, index.limit)
+        .map(({ t }) => t);
     },
-    [tickerMap]
+    [index]
   );
 
-  return { manifest, loading, error, search, getTicker };
+  return { updated: index?.updated ?? null, loading, error, search };
 }
@@ -4,6 +4,23 @@ import type { TickerData } from '../types';
 const cache = new Map<string, TickerData>();
 const MAX_CACHE_SIZE = 50;
 
+// Bars since the last compaction live in a small tail file next to the
+// long-cached base file; tickers without recent bars have no tail (404).
+function fetchRecent(symbol: string, signal: AbortSignal): Promise<TickerData | null> {
+  return fetch(`/data/tickers/recent/${symbol}.json`, { signal }).then((res) =>
+    res.ok ? res.json() : null,
+  );
+}
+
+function mergeRecent(base: TickerData, recent: TickerData | null): TickerData {
+  if (!recent || recent.data.length === 0) return base;
+  // Tail rows replace base rows from their first timestamp on
+  const first = recent.data[0][0];
+  let end = base.data.length;
+  while (end > 0 && base.data[end - 1][0] >= first) end--;
+  return { symbol: base.symbol, data: base.data.slice(0, end).concat(recent.data) };
+}
+
 function evictOldest() {
   if (cache.size >= MAX_CACHE_SIZE) {
     const firstKey = cache.keys().next().value;
@@ -41,12 +58,15 @@ export function useTickerData(symbol: string | null) {
     setLoading(true);
     setError(null);
 
-    fetch(`/data/tickers/${symbol}.json`, { signal: controller.signal })
-      .then((res) => {
+    Promise.all([
+      fetch(`/data/tickers/${symbol}.json`, { signal: controller.signal }).then((res) => {
         if (!res.ok) throw new Error(`Failed to load ${symbol}: ${res.status}`);
-        return res.json();
-      })
-      .then((tickerData: TickerData) => {
+        return res.json() as Promise<TickerData>;
+      }),
+      fetchRecent(symbol, controller.signal),
+    ])
+      .then(([base, recent]) => {
+        const tickerData = mergeRecent(base, recent);
         evictOldest();
         cache.set(symbol, tickerData);
         setData(tickerData);
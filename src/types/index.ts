@@ -17,6 +17,13 @@ export interface Manifest {
   updated: string;
 }
 
+export interface SearchIndex {
+  updated: string;
+  limit: number;  // max results per query
+  filler: string[]; // words not indexed after the start of a name
+  keys: string[]; // lowercased 1-2 character prefixes that have a shard
+}
+
 export type Timeframe = 'daily' | 'weekly' | 'monthly';
 
 export interface DateRange {